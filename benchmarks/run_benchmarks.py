@@ -0,0 +1,635 @@
+import os
+import sys
+import re
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_PATH, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_corpus import generate_corpus
+
+try:
+    from memory_profiler import memory_usage
+except ImportError:
+    memory_usage = None
+
+def measure(function, *args):
+    """Runs the function and returns (elapsed seconds, peak memory in MB or None, result)."""
+    def timed():
+        start = time.perf_counter()
+        result = function(*args)
+        return time.perf_counter() - start, result
+
+    if memory_usage is None:
+        elapsed, result = timed()
+        return elapsed, None, result
+
+    peak_memory, (elapsed, result) = memory_usage((timed, (), {}), max_usage=True, retval=True, interval=0.05)
+    return elapsed, peak_memory, result
+
+def get_relative_pdf_paths(context):
+    # The parser opens the files relative to the data folder
+    pdfs_folder = context["corpus"]["pdfs_folder"]
+    return [os.path.relpath(os.path.join(pdfs_folder, name), 'data') for name in sorted(os.listdir(pdfs_folder))]
+
+def bench_pdf_parse(context):
+    import fitz
+    from utils.articles_parser import get_full_text_from_file
+
+    pdf_paths = get_relative_pdf_paths(context)
+    pages = sum(fitz.open(os.path.join('data', path)).page_count for path in pdf_paths)
+
+    def parse():
+        return { os.path.basename(path).replace(".pdf", ""): get_full_text_from_file(path) for path in pdf_paths }
+
+    elapsed, peak_memory, parsed = measure(parse)
+    # The parsed texts are reused by the next benchmarks
+    context["texts"] = { file_id: full_text for file_id, (full_text, _) in parsed.items() }
+    context["keywords"] = { file_id: [concept_id for _, concept_id in concepts] for file_id, (_, concepts) in parsed.items() }
+
+    return { "files": len(pdf_paths), "pages": pages, "seconds": elapsed, "pages_per_second": pages / elapsed, "peak_memory_mb": peak_memory }
+
+def bench_pdf_extraction(context):
+    import fitz
+    from utils.articles_parser import get_full_text_from_file
+    from utils.keywords_extractor import KeywordsExtractor
+    from utils.pdf_extraction import ExtractionProfile, KEYWORDS_MODES
+
+    # The corpus with a figure in the pages of the middle, as the real articles have
+    corpus = generate_corpus(os.path.join(context["work_folder"], "figures"), files=context["files"], pages=context["pages"], figures=True)
+    pdf_paths = get_relative_pdf_paths({ "corpus": corpus })
+    pages = sum(fitz.open(os.path.join('data', path)).page_count for path in pdf_paths)
+
+    profiles = {
+        "images": ExtractionProfile(flags=fitz.TEXTFLAGS_DICT),
+        "text": ExtractionProfile(),
+        "clipped": ExtractionProfile(clip_margins=True),
+    }
+    results = { "files": len(pdf_paths), "pages": pages }
+    texts = {}
+    for name, extraction in profiles.items():
+        elapsed, peak_memory, texts[name] = measure(lambda: [get_full_text_from_file(path, extraction=extraction) for path in pdf_paths])
+        results[f"{name}_pages_per_second"] = pages / elapsed
+        results[f"{name}_peak_memory_mb"] = peak_memory
+    # Texts equal to the ones extracted with the images
+    results["text_equal_texts"] = sum(text == original for text, original in zip(texts["text"], texts["images"]))
+    results["clipped_equal_texts"] = sum(text == original for text, original in zip(texts["clipped"], texts["images"]))
+
+    keywords = {}
+    for mode in KEYWORDS_MODES:
+        extractor = KeywordsExtractor(extraction=ExtractionProfile(keywords_mode=mode))
+        elapsed, _, keywords[mode] = measure(lambda: [extractor.extract_from_file(os.path.join('data', path)) for path in pdf_paths])
+        results[f"{mode}_keywords_files_per_second"] = len(pdf_paths) / elapsed
+    results["blocks_equal_keywords"] = sum(ids == original for ids, original in zip(keywords["blocks"], keywords["text"]))
+
+    return results
+
+def add_pdf_artifacts(text, generator):
+    """Adds the artifacts of the text extracted from the real articles: split ligatures ("pro ﬁ le"), apostrophes ("author ’ s") and word breaks."""
+    words = []
+    for word in text.split(" "):
+        if "fi" in word or "fl" in word:
+            word = word.replace("fi", " ﬁ ").replace("fl", " ﬂ ")
+        elif len(word) > 6 and generator.random() < 0.05:
+            word = word[:4] + "- " + word[4:]
+        elif generator.random() < 0.02:
+            word += " ’ s"
+        words.append(word)
+    return " ".join(words)
+
+def clean_legacy_plain_text(text, bold_text):
+    # The previous clean_plain_text: every step over the full text, and the headers removed with an alternation of the matches
+    from utils import articles_parser
+
+    text = articles_parser.replace_special_characters(text)
+    text = articles_parser.join_apostrophes(text)
+    sections = [
+        re.escape(match.group(0)) for match in articles_parser.HEADER_PATTERN.finditer(text)
+        if "Unified Astronomy Thesaurus concepts" not in match.group(0)
+    ]
+    if sections:
+        text = re.sub("|".join(sections), ".", text)
+    text = articles_parser.clean_orcidIds_from_text(text)
+    text = articles_parser.clean_authors_from_text(text, bold_text)
+    text = articles_parser.clean_references_from_text(text)
+    text = articles_parser.clean_erratum_from_text(text)
+    return re.sub(r'(\w+)-\s+(\w+)', r'\1\2', text)
+
+def bench_plain_text(context):
+    import fitz
+    from utils.articles_parser import get_text_from_page, clean_plain_text
+
+    # The texts of the pages before clean_plain_text, with the artifacts of the real articles
+    generator = random.Random(42)
+    articles = []
+    for path in get_relative_pdf_paths(context):
+        pdf_document = fitz.open(os.path.join('data', path))
+        pages = [get_text_from_page(page, True) for page in pdf_document]
+        pdf_document.close()
+        text = add_pdf_artifacts("".join(text for text, _, _ in pages), generator)
+        articles.append((text, [bold for _, bold_texts, _ in pages for bold in bold_texts]))
+
+    legacy_elapsed, _, legacy_texts = measure(lambda: [clean_legacy_plain_text(text, bold_text) for text, bold_text in articles])
+    elapsed, _, texts = measure(lambda: [clean_plain_text(text, bold_text) for text, bold_text in articles])
+    characters = sum(len(text) for text, _ in articles)
+
+    return {
+        "files": len(articles),
+        "characters_per_second": characters / elapsed,
+        "legacy_characters_per_second": characters / legacy_elapsed,
+        "speedup": legacy_elapsed / elapsed,
+        "equal_texts": sum(text == legacy_text for text, legacy_text in zip(texts, legacy_texts)),
+    }
+
+def get_legacy_keywords(text):
+    # The previous extraction: every number between "concepts:" and "1. Introduction"
+    start = text.find("concepts:")
+    end = text.find("1. Introduction", start)
+    return re.findall(r'\d+', text[start:end]) if start != -1 and end != -1 else []
+
+def get_precision_recall(extracted, expected):
+    true_positives = sum(len(set(extracted[file_id]) & set(expected[file_id])) for file_id in expected)
+    extracted_count = sum(len(set(ids)) for ids in extracted.values())
+    expected_count = sum(len(set(ids)) for ids in expected.values())
+    return true_positives / extracted_count if extracted_count else 0, true_positives / expected_count if expected_count else 0
+
+def bench_keywords(context):
+    import fitz
+    from UATMapper import UATMapper
+    from utils.keywords_extractor import KeywordsExtractor
+
+    extractor = KeywordsExtractor(UATMapper(context["corpus"]["thesaurus_path"]).map_to_thesaurus())
+    pdfs_folder = context["corpus"]["pdfs_folder"]
+    file_paths = { name.replace(".pdf", ""): os.path.join(pdfs_folder, name) for name in sorted(os.listdir(pdfs_folder)) }
+    expected = context["corpus"]["keywords"]
+
+    def extract():
+        return { file_id: extractor.extract_from_file(path) for file_id, path in file_paths.items() }
+
+    def extract_legacy():
+        extracted = {}
+        for file_id, path in file_paths.items():
+            pdf_document = fitz.open(path)
+            extracted[file_id] = get_legacy_keywords(" ".join(page.get_text() for page in pdf_document))
+            pdf_document.close()
+        return extracted
+
+    elapsed, _, extracted = measure(extract)
+    legacy_elapsed, _, legacy_extracted = measure(extract_legacy)
+    precision, recall = get_precision_recall(extracted, expected)
+    legacy_precision, legacy_recall = get_precision_recall(legacy_extracted, expected)
+
+    return {
+        "files": len(file_paths),
+        "files_per_second": len(file_paths) / elapsed,
+        "precision": precision,
+        "recall": recall,
+        "legacy_files_per_second": len(file_paths) / legacy_elapsed,
+        "legacy_precision": legacy_precision,
+        "legacy_recall": legacy_recall,
+    }
+
+def bench_summarization(context):
+    try:
+        from InputCreators.SummarizeInputCreator import SummarizeInputCreator
+        summarizer = SummarizeInputCreator()
+    except Exception as e:
+        return { "skipped": f"Summarizer not available: {e}" }
+
+    texts = list(context["texts"].values())
+
+    def summarize():
+        return [summarizer.summarize_text(text, 0.25, max_sentences=100, additional_stopwords={"specific", "unnecessary", "technical"}) for text in texts]
+
+    elapsed, peak_memory, summaries = measure(summarize)
+    context["summaries"] = dict(zip(context["texts"].keys(), summaries))
+    return { "docs": len(texts), "seconds": elapsed, "docs_per_second": len(texts) / elapsed, "peak_memory_mb": peak_memory }
+
+def bench_thesaurus(context):
+    from UATMapper import UATMapper
+
+    load_elapsed, peak_memory, thesaurus = measure(lambda: UATMapper("./data/UAT-filtered.json").map_to_thesaurus())
+
+    generator = random.Random(42)
+    term_ids = sorted(thesaurus.get_terms().keys())
+    pairs = [(generator.choice(term_ids), generator.choice(term_ids)) for _ in range(context["path_queries"])]
+    start = time.perf_counter()
+    for start_id, end_id in pairs:
+        thesaurus.find_shortest_path(start_id, end_id)
+    path_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    thesaurus.get_branch_children("1")
+    branch_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for term_id in term_ids:
+        thesaurus.get_ancestors(term_id)
+    ancestors_elapsed = time.perf_counter() - start
+
+    return {
+        "terms": thesaurus.get_size(),
+        "load_seconds": load_elapsed,
+        "load_peak_memory_mb": peak_memory,
+        "shortest_path_ms": path_elapsed / len(pairs) * 1000,
+        "root_branch_children_ms": branch_elapsed * 1000,
+        "ancestors_closure_ms": ancestors_elapsed * 1000,
+    }
+
+def bench_db_ingest(context):
+    from Database.Database import Database
+    from Database.DatabaseModels import Base
+    from Database.File import File
+    from Database.Keyword import Keyword
+    from Database.TermFile import TermFile
+    from UATMapper import UATMapper
+
+    thesaurus = UATMapper(context["corpus"]["thesaurus_path"]).map_to_thesaurus()
+    db_url = context["db_url"] or f"sqlite:///{os.path.join(context['work_folder'], 'ingest.db')}"
+    database = Database(db_url)
+    Base.metadata.drop_all(database.get_engine())
+    Base.metadata.create_all(database.get_engine())
+    file_db, keyword_db, term_file_db = File(database), Keyword(database), TermFile(database, thesaurus)
+
+    def ingest():
+        for file_id, full_text in context["texts"].items():
+            file_db.add(file_id=file_id, abstract=full_text[:1500], full_text=full_text)
+            for keyword in context["keywords"][file_id]:
+                keyword_db.add(file_id=file_id, keyword_id=keyword, order=1)
+            term_file_db.add_file(file_id, context["keywords"][file_id])
+
+    elapsed, peak_memory, _ = measure(ingest)
+    database.close()
+    files = len(context["texts"])
+    return { "backend": database.get_engine().dialect.name, "files": files, "seconds": elapsed, "files_per_second": files / elapsed, "peak_memory_mb": peak_memory }
+
+def bench_near_duplicates(context, change_every=40):
+    from Database.Database import Database
+    from Database.DatabaseModels import Base
+    from Database.File import File
+    from Database.FileSignature import FileSignature
+    from utils.near_duplicates import MinHasher, DEFAULT_THRESHOLD, get_similarity
+
+    # Every other text is ingested again as a new version, with 1 of change_every words changed
+    generator = random.Random(42)
+    texts = dict(context["texts"])
+    expected = {}
+    for index, (file_id, text) in enumerate(list(context["texts"].items())):
+        if index % 2 == 0:
+            words = text.split(" ")
+            for position in range(generator.randrange(change_every), len(words), change_every):
+                words[position] = generator.choice(words)
+            texts[f"{file_id}-v2"] = " ".join(words)
+            expected[f"{file_id}-v2"] = file_id
+
+    db_url = context["db_url"] or f"sqlite:///{os.path.join(context['work_folder'], 'near_duplicates.db')}"
+    database = Database(db_url)
+    Base.metadata.drop_all(database.get_engine())
+    Base.metadata.create_all(database.get_engine())
+    file_db, file_signature_db = File(database), FileSignature(database)
+    for file_id in texts:
+        file_db.add(file_id=file_id, abstract=None, full_text=None)
+
+    min_hasher = MinHasher()
+    sign_elapsed, _, signatures = measure(lambda: { file_id: min_hasher.get_signature(text) for file_id, text in texts.items() })
+
+    # The lookups are timed apart from saving the signatures (A commit per file, as the rest of the ingest)
+    def detect():
+        found = {}
+        lookup_seconds = 0.0
+        for file_id, signature in signatures.items():
+            start = time.perf_counter()
+            duplicate_of, similarity = file_signature_db.find_duplicate(file_id, signature, DEFAULT_THRESHOLD)
+            lookup_seconds += time.perf_counter() - start
+            file_signature_db.add(file_id, signature, duplicate_of, similarity)
+            if duplicate_of is not None:
+                found[file_id] = duplicate_of
+        return found, lookup_seconds
+
+    detect_elapsed, _, (found, lookup_seconds) = measure(detect)
+    database.close()
+
+    # Every file compared with all the previous ones, as without the LSH index
+    def compare_all():
+        file_ids = list(signatures.keys())
+        return sum(
+            get_similarity(signatures[file_id], signatures[other_id]) >= DEFAULT_THRESHOLD
+            for index, file_id in enumerate(file_ids) for other_id in file_ids[:index]
+        )
+    pairwise_elapsed, _, _ = measure(compare_all)
+
+    true_positives = sum(found.get(file_id) == original_id for file_id, original_id in expected.items())
+    return {
+        "files": len(texts),
+        "near_duplicates": len(expected),
+        "sign_files_per_second": len(texts) / sign_elapsed,
+        "detect_files_per_second": len(texts) / detect_elapsed,
+        "lookup_ms": lookup_seconds / len(texts) * 1000,
+        "pairwise_comparisons_seconds": pairwise_elapsed,
+        "precision": true_positives / len(found) if found else 1.0,
+        "recall": true_positives / len(expected) if expected else 1.0,
+    }
+
+def get_recall_by_label(term_trainer):
+    return { label: scores["r"] for label, scores in (term_trainer.test_scores.get("cats_f_per_type") or {}).items() }
+
+def bench_training(context):
+    try:
+        from TermTrainer import TermTrainer
+    except Exception as e:
+        return { "skipped": f"spaCy not available: {e}" }
+
+    from UATMapper import UATMapper
+    from Corpus.CorpusSource import CorpusSource
+
+    thesaurus = UATMapper(context["corpus"]["thesaurus_path"]).map_to_thesaurus()
+    texts = context.get("summaries") or context["texts"]
+
+    class InMemoryCorpusSource(CorpusSource):
+        def get_texts_by_file_ids(self, projection, file_ids):
+            return { file_id: texts[file_id] for file_id in file_ids if file_id in texts }
+
+        def get_file_ids_by_term_id(self, term_id):
+            return [
+                file_id for file_id, keywords in context["keywords"].items()
+                if any(term_id == keyword or term_id in thesaurus.get_ancestors(keyword) for keyword in keywords)
+            ]
+
+    class BenchmarkInputCreator:
+        def get_folder_name(self):
+            return 'benchmark'
+
+        def get_files_data_input(self, file_ids):
+            return corpus_source.get_texts_by_file_ids("summarized_text", file_ids)
+
+    corpus_source = InMemoryCorpusSource()
+    input_creator = BenchmarkInputCreator()
+    children = thesaurus.get_by_id("1").get_children()
+    term_trainer = TermTrainer(thesaurus, None, corpus_source=corpus_source, epochs=context["epochs"])
+
+    training_data = term_trainer.prepare_training_data(children, input_creator)
+    train_data, test_data = term_trainer.split_data(training_data)
+    elapsed, peak_memory, _ = measure(term_trainer.train, train_data, children, input_creator)
+    accuracy = term_trainer.test_model(test_data, input_creator)
+
+    # The trained model is reused by the packing benchmark, the datasets by the sampling one
+    context["model"] = term_trainer.nlp
+    context["test_texts"] = [text for text in texts.values() if text]
+    context["training"] = {
+        "thesaurus": thesaurus, "corpus_source": corpus_source, "input_creator": input_creator, "children": children,
+        "train_data": train_data, "test_data": test_data, "recall_by_label": get_recall_by_label(term_trainer),
+    }
+
+    docs = train_data.get_size() * context["epochs"]
+    return { "train_docs": train_data.get_size(), "epochs": context["epochs"], "seconds": elapsed, "docs_per_second": docs / elapsed, "peak_memory_mb": peak_memory, "cats_score": accuracy }
+
+def bench_training_sampling(context, negative_ratio=2.0):
+    """Trains the root again on a sample of its files (Each child capped at half of its mean positives) and compares the recall of each child."""
+    if "training" not in context:
+        return { "skipped": "The training benchmark didn't run" }
+
+    from TermTrainer import TermTrainer
+    from utils.training_sampling import TrainingSampling
+
+    training = context["training"]
+    train_data = training["train_data"]
+    positives = train_data.get_label_matrix().sum(axis=0)
+    max_files_per_label = max(int(positives[positives > 0].mean() / 2), 1) if positives.any() else 1
+    sampling = TrainingSampling(max_files_per_label, negative_ratio)
+
+    term_trainer = TermTrainer(training["thesaurus"], None, corpus_source=training["corpus_source"], epochs=context["epochs"], sampling=sampling)
+    start = time.perf_counter()
+    sampled = sampling.apply("1", train_data)
+    sample_seconds = time.perf_counter() - start
+    elapsed, peak_memory, _ = measure(term_trainer.train, sampled, training["children"], training["input_creator"])
+    accuracy = term_trainer.test_model(training["test_data"], training["input_creator"])
+
+    recall_by_label = get_recall_by_label(term_trainer)
+    full_recall_by_label = training["recall_by_label"]
+    return {
+        "max_files_per_label": max_files_per_label,
+        "negative_ratio": negative_ratio,
+        "train_docs": sampled.get_size(),
+        "full_train_docs": train_data.get_size(),
+        "sample_seconds": sample_seconds,
+        "seconds": elapsed,
+        "peak_memory_mb": peak_memory,
+        "cats_score": accuracy,
+        "recall_by_label": recall_by_label,
+        "recall_change_by_label": { label: recall - full_recall_by_label.get(label, 0.0) for label, recall in recall_by_label.items() },
+    }
+
+def bench_training_warm_start(context):
+    """Trains the widest child of the root from scratch and from the tok2vec of the root model (Frozen and fine-tuned)."""
+    if "training" not in context:
+        return { "skipped": "The training benchmark didn't run" }
+
+    from TermTrainer import TermTrainer
+    from utils.warm_start import WarmStart
+
+    training = context["training"]
+    thesaurus = training["thesaurus"]
+    candidates = [
+        (len(training["corpus_source"].get_file_ids_by_term_id(child_id)), child_id) for child_id in training["children"]
+        if thesaurus.get_by_id(child_id).get_children()
+    ]
+    if not candidates:
+        return { "skipped": "No child of the root has children" }
+    term_id = max(candidates)[1]
+    children = thesaurus.get_by_id(term_id).get_children()
+
+    results = { "term_id": term_id }
+    epochs = context["epochs"]
+    runs = [("scratch", WarmStart(), epochs), ("freeze", WarmStart("freeze"), epochs), ("finetune", WarmStart("finetune"), epochs)]
+    runs.append((f"finetune_{max(epochs // 2, 1)}_epochs", WarmStart("finetune"), max(epochs // 2, 1)))
+    with tempfile.TemporaryDirectory(prefix="warm_start_") as models_dir:
+        parent_model_path = os.path.join(models_dir, "1")
+        context["model"].to_disk(parent_model_path)
+
+        for name, warm_start, run_epochs in runs:
+            term_trainer = TermTrainer(thesaurus, None, corpus_source=training["corpus_source"], epochs=run_epochs, warm_start=warm_start)
+            train_data, test_data = term_trainer.split_data(term_trainer.prepare_training_data(children, training["input_creator"]))
+            elapsed, _, _ = measure(term_trainer.train, train_data, children, training["input_creator"], parent_model_path if warm_start.is_enabled() else None)
+            results[name] = {
+                "epochs": run_epochs,
+                "train_docs": train_data.get_size(),
+                "seconds": elapsed,
+                "cats_score": term_trainer.test_model(test_data, training["input_creator"]),
+            }
+
+    return results
+
+def bench_training_incremental(context, new_fraction=0.2):
+    """Trains the root without a fraction of its files, then compares updating it with them against training it again."""
+    if "training" not in context:
+        return { "skipped": "The training benchmark didn't run" }
+
+    import spacy
+    import numpy as np
+    from TermTrainer import TermTrainer
+    from models.TrainingManifest import TrainingManifest
+    from utils.incremental_training import IncrementalTraining
+
+    training = context["training"]
+    train_data, test_data = training["train_data"], training["test_data"]
+    is_new = train_data.get_ranks("new") % 1000 < new_fraction * 1000
+    old_data = train_data.subset(np.flatnonzero(~is_new))
+    incremental = IncrementalTraining(True, epochs=max(context["epochs"] // 2, 1))
+
+    def create_term_trainer():
+        return TermTrainer(training["thesaurus"], None, corpus_source=training["corpus_source"], epochs=context["epochs"], incremental=incremental)
+
+    with tempfile.TemporaryDirectory(prefix="incremental_") as models_dir:
+        old_trainer = create_term_trainer()
+        old_trainer.train(old_data, training["children"], training["input_creator"])
+        model_path = os.path.join(models_dir, "1")
+        old_trainer.nlp.to_disk(model_path)
+        old_score = old_trainer.test_model(test_data, training["input_creator"])
+
+        update_trainer = create_term_trainer()
+        update_data, new_files = incremental.get_update_data(TrainingManifest(training["children"], old_data.get_file_ids()), train_data)
+        update_trainer.nlp = spacy.load(model_path)
+        update_seconds, _, _ = measure(update_trainer.update, update_data, training["input_creator"])
+        update_score = update_trainer.test_model(test_data, training["input_creator"])
+
+    retrain_trainer = create_term_trainer()
+    retrain_seconds, _, _ = measure(retrain_trainer.train, train_data, training["children"], training["input_creator"])
+    retrain_score = retrain_trainer.test_model(test_data, training["input_creator"])
+
+    return {
+        "new_files": new_files,
+        "old_cats_score": old_score,
+        "update": { "docs": update_data.get_size(), "epochs": incremental.epochs, "seconds": update_seconds, "cats_score": update_score },
+        "retrain": { "docs": train_data.get_size(), "epochs": context["epochs"], "seconds": retrain_seconds, "cats_score": retrain_score },
+    }
+
+def bench_model_packing(context, models=5):
+    if "model" not in context:
+        return { "skipped": "No trained model (The training benchmark didn't run)" }
+
+    import spacy
+    from utils.model_packager import pack_models, PackedModels, WEIGHT_DTYPES
+
+    # The same model saved for some terms, as the training saves one model per term
+    models_folder = os.path.join(context["work_folder"], "models")
+    term_ids = [str(term_id) for term_id in range(models)]
+    os.makedirs(models_folder, exist_ok=True)
+    for term_id in term_ids:
+        context["model"].to_disk(os.path.join(models_folder, term_id))
+
+    start = time.perf_counter()
+    original_models = [spacy.load(os.path.join(models_folder, term_id)) for term_id in term_ids]
+    original_load_seconds = time.perf_counter() - start
+    original_scores = [doc.cats for doc in original_models[0].pipe(context["test_texts"])]
+
+    results = { "models": models, "original_load_seconds": original_load_seconds }
+    for dtype in WEIGHT_DTYPES:
+        packed_folder = os.path.join(context["work_folder"], f"models-{dtype}")
+        summary = pack_models(models_folder, packed_folder, dtype)
+
+        start = time.perf_counter()
+        packed = PackedModels(packed_folder)
+        packed_models = [packed.load(term_id) for term_id in term_ids]
+        load_seconds = time.perf_counter() - start
+
+        scores = [doc.cats for doc in packed_models[0].pipe(context["test_texts"])]
+        differences = [abs(score[label] - original[label]) for score, original in zip(scores, original_scores) for label in original]
+        changed = sum((score[label] >= 0.5) != (original[label] >= 0.5) for score, original in zip(scores, original_scores) for label in original)
+
+        results["original_size_mb"] = summary["size_before_mb"]
+        results[f"{dtype}_size_mb"] = summary["size_after_mb"]
+        results[f"{dtype}_load_seconds"] = load_seconds
+        results[f"{dtype}_max_score_difference"] = max(differences, default=0.0)
+        results[f"{dtype}_changed_predictions"] = changed
+
+    return results
+
+# Ordered: the first benchmarks leave in the context the data used by the next ones
+BENCHMARKS = {
+    "pdf_parse": bench_pdf_parse,
+    "pdf_extraction": bench_pdf_extraction,
+    "plain_text": bench_plain_text,
+    "keywords": bench_keywords,
+    "summarization": bench_summarization,
+    "thesaurus": bench_thesaurus,
+    "db_ingest": bench_db_ingest,
+    "near_duplicates": bench_near_duplicates,
+    "training": bench_training,
+    "training_sampling": bench_training_sampling,
+    "training_warm_start": bench_training_warm_start,
+    "training_incremental": bench_training_incremental,
+    "model_packing": bench_model_packing,
+}
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT_PATH, text=True).strip()
+    except Exception:
+        return None
+
+def compare_results(results, baseline):
+    """Prints the ratio between each numeric metric and the same metric of the baseline run."""
+    for name, metrics in results["benchmarks"].items():
+        baseline_metrics = baseline["benchmarks"].get(name, {})
+        for metric, value in metrics.items():
+            baseline_value = baseline_metrics.get(metric)
+            if isinstance(value, (int, float)) and isinstance(baseline_value, (int, float)) and baseline_value:
+                print(f"{name}.{metric}: {baseline_value:.4g} -> {value:.4g} ({value / baseline_value:.2f}x)", file=sys.stderr)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the end-to-end benchmarks over a synthetic corpus and prints the results as JSON")
+    parser.add_argument("--files", type=int, default=20, help="Synthetic PDFs to generate")
+    parser.add_argument("--pages", type=int, default=8, help="Pages of each synthetic PDF")
+    parser.add_argument("--epochs", type=int, default=2, help="Epochs of the training benchmark")
+    parser.add_argument("--path-queries", type=int, default=200, help="Shortest path queries of the thesaurus benchmark")
+    parser.add_argument("--db-url", default=None, help="Database for the ingest benchmark (A temporary SQLite by default). Its tables are dropped")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS.keys()), help="Benchmarks to run (pdf_parse always runs, the rest use its texts)")
+    parser.add_argument("--output", help="File where the JSON results are saved")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    args = parser.parse_args()
+
+    # The application paths (data/, logs/, config.cfg) are relative to the root of the repository
+    os.chdir(ROOT_PATH)
+
+    with tempfile.TemporaryDirectory(prefix="uat_benchmarks_") as work_folder:
+        context = {
+            "work_folder": work_folder,
+            "corpus": generate_corpus(work_folder, files=args.files, pages=args.pages),
+            "files": args.files,
+            "pages": args.pages,
+            "db_url": args.db_url,
+            "epochs": args.epochs,
+            "path_queries": args.path_queries,
+        }
+
+        results = {
+            "commit": get_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "corpus": { "files": args.files, "pages": args.pages },
+            "benchmarks": {},
+        }
+        selected = set(args.only or BENCHMARKS.keys()) | { "pdf_parse" }
+        for name, benchmark in BENCHMARKS.items():
+            if name in selected:
+                print(f"Running benchmark: {name}", file=sys.stderr, flush=True)
+                results["benchmarks"][name] = benchmark(context)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare_results(results, json.load(file))
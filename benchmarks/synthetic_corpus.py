@@ -0,0 +1,168 @@
+import os
+import json
+import random
+import argparse
+import fitz
+import numpy as np
+
+# Sizes and layout of the AAS journals (ApJ, AJ, ApJS), as the parser expects them
+TITLE_SIZE = 13.947600364685059
+BODY_SIZE = 9.962599754333496
+HEADER_SIZE = 7.970200061798096
+PAGE_RECT = fitz.Rect(0, 0, 612, 792)
+BODY_RECT = fitz.Rect(54, 70, 558, 740)
+
+FILLER_WORDS = [
+    "the", "of", "and", "we", "observed", "emission", "spectra", "measured", "model", "sample", "data", "luminosity",
+    "distribution", "mass", "velocity", "profile", "radius", "temperature", "density", "redshift", "flux", "survey",
+    "analysis", "results", "evidence", "population", "formation", "evolution", "structure", "simulation",
+]
+
+def get_thesaurus_subset(thesaurus_path, term_id, max_terms=None):
+    """
+    Returns the UAT json entries of a branch of the thesaurus (The term and all of its descendants),
+    in the same format read by UATMapper.
+    """
+    with open(thesaurus_path, encoding='utf-8') as file:
+        json_data = json.load(file)
+
+    terms_by_id = { key.split("/")[-1]: key for key in json_data.keys() }
+    narrower_key = "http://www.w3.org/2004/02/skos/core#narrower"
+
+    branch_ids = []
+    pending = [term_id]
+    while pending and (max_terms is None or len(branch_ids) < max_terms):
+        current_id = pending.pop(0)
+        if current_id in branch_ids or current_id not in terms_by_id:
+            continue
+        branch_ids.append(current_id)
+        for narrower in json_data[terms_by_id[current_id]].get(narrower_key, []):
+            pending.append(narrower["value"].split("/")[-1])
+
+    return { terms_by_id[branch_id]: json_data[terms_by_id[branch_id]] for branch_id in branch_ids }
+
+def get_term_names(thesaurus_subset):
+    names = {}
+    for key, value in thesaurus_subset.items():
+        labels = value.get("http://www.w3.org/2004/02/skos/core#prefLabel")
+        if labels:
+            names[key.split("/")[-1]] = labels[0]["value"]
+    return names
+
+def get_sentence(generator, vocabulary, words=18):
+    sentence = " ".join(generator.choice(vocabulary) for _ in range(words))
+    return sentence.capitalize() + "."
+
+def get_paragraph(generator, vocabulary, sentences=6):
+    paragraph = " ".join(get_sentence(generator, vocabulary) for _ in range(sentences))
+    # Citations like the ones removed by the parser
+    return paragraph + f" This agrees with previous works (Author et al. {generator.randint(1990, 2023)})."
+
+def insert_text(page, top, text, fontsize=BODY_SIZE, fontname="Times-Roman"):
+    """Inserts the text below top (Growing the box until it fits) and returns the top of the next block."""
+    height = fontsize * 2
+    while top + height <= PAGE_RECT.y1:
+        rect = fitz.Rect(BODY_RECT.x0, top, BODY_RECT.x1, top + height)
+        remaining = page.insert_textbox(rect, text, fontsize=fontsize, fontname=fontname)
+        if remaining >= 0:
+            return top + height - remaining + fontsize / 2
+        height += fontsize
+    return top
+
+def get_figure_pixmap(width=1200, height=600):
+    """RGB image like the plots of the articles (Lines over a light background), the same for every figure."""
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.full((height, width, 3), 245, dtype=np.uint8)
+    for index, frequency in enumerate((0.01, 0.023, 0.037)):
+        curve = height / 2 + height / 3 * np.sin(x * frequency + index)
+        image[np.abs(y - curve) < 2 + index] = (40 * index, 90, 200 - 60 * index)
+    return fitz.Pixmap(fitz.csRGB, width, height, image.tobytes(), False)
+
+def create_pdf(file_path, generator, term_names, pages=8, figure=None):
+    """
+    Creates a PDF that resembles an AAS article: header, title, abstract, UAT concepts,
+    sections with citations and a references list at the end.
+
+    :param figure: Pixmap inserted at the top of the pages between the first and the last one (No figures if None)
+    """
+    vocabulary = FILLER_WORDS + [word.lower() for name in term_names.values() for word in name.split()]
+    keyword_ids = generator.sample(list(term_names.keys()), k=min(len(term_names), generator.randint(2, 6)))
+    title = " ".join(generator.choice(vocabulary) for _ in range(8)).title()
+
+    document = fitz.open()
+    for page_number in range(pages):
+        page = document.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+        insert_text(page, 30, f"The Astrophysical Journal, {generator.randint(800, 990)}:{page_number + 1} (10pp), 2023 January 1", HEADER_SIZE)
+        top = BODY_RECT.y0
+
+        if page_number == 0:
+            top = insert_text(page, top, title, TITLE_SIZE, "Times-Bold")
+            top = insert_text(page, top, "Author One, Author Two, and Author Three")
+            top = insert_text(page, top, "Abstract", BODY_SIZE, "Times-Bold")
+            top = insert_text(page, top, get_paragraph(generator, vocabulary, 7))
+            concepts = "; ".join(f"{term_names[keyword_id]} ({keyword_id})" for keyword_id in keyword_ids)
+            top = insert_text(page, top, f"Unified Astronomy Thesaurus concepts: {concepts}")
+            # Numbers near the concepts, like the ones of the real articles (Keyword extraction must ignore them)
+            top = insert_text(page, top, f"Original content from this work may be used under the terms of the Creative Commons Attribution 4.0 licence. Received {generator.randint(2019, 2023)} March {generator.randint(1, 28)}.", HEADER_SIZE)
+            top = insert_text(page, top, "1. Introduction", BODY_SIZE, "Times-Bold")
+
+        if figure is not None and 0 < page_number < pages - 1:
+            page.insert_image(fitz.Rect(BODY_RECT.x0, top, BODY_RECT.x1, top + 250), pixmap=figure)
+            top += 260
+
+        if page_number == pages - 1:
+            references = "\n".join(f"Author, A. {generator.randint(1990, 2023)}, ApJ, {generator.randint(100, 999)}, {generator.randint(1, 99)}" for _ in range(20))
+            top = insert_text(page, top, get_paragraph(generator, vocabulary, 3))
+            top = insert_text(page, top, "References", BODY_SIZE, "Times-Bold")
+            insert_text(page, top, references)
+        else:
+            while top + 120 < BODY_RECT.y1:
+                top = insert_text(page, top, get_paragraph(generator, vocabulary, 5))
+
+        page.insert_text((300, 765), str(page_number + 1), fontsize=BODY_SIZE, fontname="Times-Roman")
+
+    document.save(file_path)
+    document.close()
+    return keyword_ids
+
+def generate_corpus(output_folder, thesaurus_path="./data/UAT-filtered.json", files=20, pages=8, term_id="1", max_terms=400, seed=42, figures=False):
+    """
+    Generates synthetic PDFs and the thesaurus subset they're labeled with.
+    With figures, the pages between the first and the last one have a figure (An image) at the top.
+
+    :return: { "pdfs_folder": ..., "thesaurus_path": ..., "keywords": { file_id: [keyword_id, ...] } }
+    """
+    generator = random.Random(seed)
+    pdfs_folder = os.path.join(output_folder, "PDFs")
+    os.makedirs(pdfs_folder, exist_ok=True)
+
+    thesaurus_subset = get_thesaurus_subset(thesaurus_path, term_id, max_terms)
+    subset_path = os.path.join(output_folder, "UAT-subset.json")
+    with open(subset_path, 'w', encoding='utf-8') as file:
+        json.dump(thesaurus_subset, file)
+
+    # The root term is not used as keyword
+    term_names = { key: name for key, name in get_term_names(thesaurus_subset).items() if key != term_id }
+
+    figure = get_figure_pixmap() if figures else None
+    keywords = {}
+    for index in range(files):
+        file_id = f"synthetic-{index:05d}"
+        keywords[file_id] = create_pdf(os.path.join(pdfs_folder, f"{file_id}.pdf"), generator, term_names, pages, figure)
+
+    corpus = { "pdfs_folder": pdfs_folder, "thesaurus_path": subset_path, "keywords": keywords }
+    with open(os.path.join(output_folder, "corpus.json"), 'w') as file:
+        json.dump(corpus, file, indent=2)
+
+    return corpus
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic corpus of AAS-style PDFs")
+    parser.add_argument("output_folder")
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--figures", action="store_true", help="Add a figure to the pages between the first and the last one")
+    args = parser.parse_args()
+
+    generate_corpus(args.output_folder, files=args.files, pages=args.pages, seed=args.seed, figures=args.figures)
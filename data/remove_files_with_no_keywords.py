@@ -1,58 +1,95 @@
 import os
-import re
+import csv
+import argparse
 import fitz  # PyMuPDF
 import logging
+from concurrent.futures import ProcessPoolExecutor
 
 # Configure logging
 logging.basicConfig(filename='logs/no_keyword_files_deleted.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Define the folder path and regex pattern
-root_folder_path = os.getenv('DATA_PATH')
-regex = r'Uniﬁed Astronomy Thesaurus concepts:\s*((?:[^;)]+\(\d+\);\s*)+[^;)]+\(\d+\))'
+# Phrase to check for (The PDFs usually have the "fi" ligature)
+phrases_to_check = ("Uniﬁed Astronomy Thesaurus concepts:", "Unified Astronomy Thesaurus concepts:")
 
-# Compile the regex pattern for efficiency
-pattern = re.compile(regex)
-
-# Phrase to check for
-phrase_to_check = "Uniﬁed Astronomy Thesaurus concepts:"
-
-def file_contains_regex(file_path, pattern, phrase):
-    """Check if the file contains the regex pattern in its text."""
+def find_phrase(file_path, pages=1):
+    """
+    Checks if the phrase is in the first pages of the file (It's always on the first page of the articles).
+    Returns (file_path, status, page, error). status is "kept", "dropped" or "error".
+    """
     try:
-        # Open the PDF file
         pdf_document = fitz.open(file_path)
-        text = ""
-        # Extract text from each page
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document.load_page(page_num)
-            text += page.get_text()
-        pdf_document.close()
-        
-        # Check if the text matches the regex pattern
-        return phrase in text
-        #return pattern.search(text) is not None
+        try:
+            for page_num in range(min(pages, pdf_document.page_count)):
+                text = pdf_document.load_page(page_num).get_text()
+                # Stop at the first page with the phrase
+                if any(phrase in text for phrase in phrases_to_check):
+                    return file_path, "kept", page_num + 1, ""
+        finally:
+            pdf_document.close()
+        return file_path, "dropped", "", ""
     except Exception as e:
-        logging.error(f"Error processing file {file_path}: {e}")
-        return False
+        return file_path, "error", "", str(e)
 
-def process_folder(folder_path):
-    """Process all PDF files in the given folder and its subdirectories."""
+def find_pdf_files(folder_path):
+    """All the PDF files in the given folder and its subdirectories."""
     for root, dirs, files in os.walk(folder_path):
-        deleted_count = 0  # Initialize count for deleted files in this folder
         for filename in files:
             if filename.lower().endswith('.pdf'):
-                file_path = os.path.join(root, filename)
-                if not file_contains_regex(file_path, pattern, phrase_to_check):
-                    # If the regex does not match, delete the file
-                    try:
-                        os.remove(file_path)
-                        logging.info(f"Deleted: {file_path}")
-                        deleted_count += 1  # Increment count
-                    except Exception as e:
-                        logging.error(f"Error deleting file {file_path}: {e}")
-        
-        # Log the number of deleted files in the current folder
-        logging.info(f"Deleted {deleted_count} file(s) in folder: {root}")
+                yield os.path.join(root, filename)
+
+def process_folder(folder_path, manifest_path, pages=1, workers=None):
+    """
+    Checks all PDF files in the folder in a process pool and writes a CSV manifest with the kept and dropped files
+    (path, status, page where the phrase was found, error). No file is deleted.
+
+    :return: { status: quantity of files }
+    """
+    counts = { "kept": 0, "dropped": 0, "error": 0 }
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(manifest_path, 'w', newline='') as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow(["path", "status", "page", "error"])
+        file_paths = list(find_pdf_files(folder_path))
+        pages_by_file = [pages] * len(file_paths)
+        for file_path, status, page, error in executor.map(find_phrase, file_paths, pages_by_file, chunksize=64):
+            writer.writerow([file_path, status, page, error])
+            counts[status] += 1
+            if status == "error":
+                logging.error(f"Error processing file {file_path}: {error}")
+
+    logging.info(f"Checked {sum(counts.values())} file(s) in folder {folder_path}: {counts}")
+    return counts
+
+def delete_dropped_files(manifest_path):
+    """Deletes the files marked as dropped in a manifest (Files with errors are kept to be checked)."""
+    deleted_count = 0
+    with open(manifest_path, newline='') as manifest:
+        for row in csv.DictReader(manifest):
+            if row["status"] != "dropped":
+                continue
+            try:
+                os.remove(row["path"])
+                logging.info(f"Deleted: {row['path']}")
+                deleted_count += 1
+            except Exception as e:
+                logging.error(f"Error deleting file {row['path']}: {e}")
+
+    logging.info(f"Deleted {deleted_count} file(s) from manifest: {manifest_path}")
+    return deleted_count
 
 if __name__ == "__main__":
-    process_folder(root_folder_path)
+    parser = argparse.ArgumentParser(description="Finds the PDFs without Unified Astronomy Thesaurus concepts and writes a manifest of kept and dropped files")
+    parser.add_argument("folder", nargs="?", default=os.getenv('DATA_PATH'), help="Folder with the PDFs (DATA_PATH by default)")
+    parser.add_argument("--manifest", default="logs/no_keyword_files_manifest.csv", help="CSV file where the manifest is written")
+    parser.add_argument("--pages", type=int, default=1, help="First pages where the phrase is searched")
+    parser.add_argument("--workers", type=int, default=None, help="Processes checking files (One per CPU by default)")
+    parser.add_argument("--delete", action="store_true", help="Delete the dropped files after writing the manifest")
+    parser.add_argument("--delete-from", metavar="MANIFEST", help="Only delete the dropped files of an existing manifest")
+    args = parser.parse_args()
+
+    if args.delete_from:
+        print(f"Deleted {delete_dropped_files(args.delete_from)} file(s)")
+    else:
+        counts = process_folder(args.folder, args.manifest, args.pages, args.workers)
+        print(f"Kept: {counts['kept']}, dropped: {counts['dropped']}, errors: {counts['error']}. Manifest: {args.manifest}")
+        if args.delete:
+            print(f"Deleted {delete_dropped_files(args.manifest)} file(s)")
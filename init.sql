@@ -1,7 +1,31 @@
 CREATE TABLE IF NOT EXISTS files (
+    file_id VARCHAR(255) PRIMARY KEY
+);
+
+-- Each text representation of a file lives in its own table, so reading one doesn't pull the others.
+-- length and hash are cheap metadata to compare texts without reading them
+CREATE TABLE IF NOT EXISTS file_abstracts (
+    file_id VARCHAR(255) PRIMARY KEY,
+    text TEXT COMPRESSION lz4,
+    length INT,
+    hash CHAR(64),
+    FOREIGN KEY (file_id) REFERENCES files(file_id)
+);
+
+CREATE TABLE IF NOT EXISTS file_full_texts (
+    file_id VARCHAR(255) PRIMARY KEY,
+    text TEXT COMPRESSION lz4,
+    length INT,
+    hash CHAR(64),
+    FOREIGN KEY (file_id) REFERENCES files(file_id)
+);
+
+CREATE TABLE IF NOT EXISTS file_summaries (
     file_id VARCHAR(255) PRIMARY KEY,
-    abstract TEXT,
-    full_text TEXT
+    text TEXT COMPRESSION lz4,
+    length INT,
+    hash CHAR(64),
+    FOREIGN KEY (file_id) REFERENCES files(file_id)
 );
 
 CREATE TABLE IF NOT EXISTS keywords (
@@ -12,3 +36,66 @@ CREATE TABLE IF NOT EXISTS keywords (
 );
 
 CREATE INDEX IF NOT EXISTS idx_keywords_file_id ON keywords(file_id);
+
+CREATE INDEX IF NOT EXISTS idx_keywords_keyword_id ON keywords(keyword_id);
+
+-- Materialized term -> files index. Each file is rolled up to every ancestor of its keywords
+CREATE TABLE IF NOT EXISTS term_files (
+    term_id INT NOT NULL,
+    file_id VARCHAR(255) NOT NULL,
+    PRIMARY KEY (term_id, file_id),
+    FOREIGN KEY (file_id) REFERENCES files(file_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_term_files_file_id ON term_files(file_id);
+
+-- Progress of the generate mode, one row per PDF. Not linked to files: a PDF that failed has no file
+CREATE TABLE IF NOT EXISTS ingestion_ledger (
+    file_id VARCHAR(255) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL,
+    content_hash CHAR(64),
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+-- MinHash signature of the full text of each file. A near-duplicate of a file ingested before has duplicate_of set,
+-- it's not rolled up to term_files (So it's not used for training)
+CREATE TABLE IF NOT EXISTS file_signatures (
+    file_id VARCHAR(255) PRIMARY KEY,
+    signature BYTEA NOT NULL,
+    duplicate_of VARCHAR(255),
+    similarity DOUBLE PRECISION,
+    FOREIGN KEY (file_id) REFERENCES files(file_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_file_signatures_duplicate_of ON file_signatures(duplicate_of);
+
+-- LSH index of the signatures: the hash of each band of the signature of the files that aren't duplicates
+CREATE TABLE IF NOT EXISTS file_lsh_buckets (
+    band INT NOT NULL,
+    bucket BIGINT NOT NULL,
+    file_id VARCHAR(255) NOT NULL,
+    PRIMARY KEY (band, bucket, file_id),
+    FOREIGN KEY (file_id) REFERENCES files(file_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_file_lsh_buckets_file_id ON file_lsh_buckets(file_id);
+
+-- Queue of the models to train, shared by the training workers of every node. The jobs are claimed with
+-- SELECT ... FOR UPDATE SKIP LOCKED, and a running job whose heartbeat is older than the lease is claimed again
+CREATE TABLE IF NOT EXISTS training_jobs (
+    term_id VARCHAR(255) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL,
+    priority INT NOT NULL DEFAULT 0,
+    depends_on VARCHAR(255),
+    attempts INT NOT NULL DEFAULT 0,
+    worker_id VARCHAR(255),
+    heartbeat_at TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    error TEXT,
+    metrics TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_training_jobs_status_priority ON training_jobs(status, priority);
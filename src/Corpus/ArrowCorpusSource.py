@@ -0,0 +1,50 @@
+import os
+import numpy as np
+import pyarrow as pa
+from Corpus.CorpusSource import CorpusSource
+
+def read_arrow_file(path):
+    """Memory-maps an Arrow IPC file. The columns point to the mapped pages, nothing is copied until it's used."""
+    source = pa.memory_map(path, 'r')
+    return pa.ipc.open_file(source).read_all()
+
+class ArrowCorpusSource(CorpusSource):
+    def __init__(self, folder):
+        """
+        Reads the corpus from the Arrow files generated by utils/corpus_exporter.py (MODE=export),
+        so training doesn't need a database.
+
+        :param folder: Folder with the exported files
+        """
+        self.folder = folder
+        # { projection: (texts table, { file_id: row }) }, loaded the first time each projection is used
+        self.text_tables = {}
+
+        # The exporter sorts term_files by term_id, so the files of a term are a contiguous slice
+        term_files = read_arrow_file(os.path.join(folder, "term_files.arrow"))
+        self.term_ids = term_files.column("term_id").to_numpy()
+        self.term_file_ids = term_files.column("file_id")
+
+    def get_text_table(self, projection):
+        if projection not in self.text_tables:
+            table = read_arrow_file(os.path.join(self.folder, f"files_{projection}.arrow"))
+            rows = { file_id: row for row, file_id in enumerate(table.column("file_id").to_pylist()) }
+            self.text_tables[projection] = (table, rows)
+
+        return self.text_tables[projection]
+
+    def get_texts_by_file_ids(self, projection, file_ids):
+        table, rows = self.get_text_table(projection)
+        found_file_ids = [file_id for file_id in file_ids if file_id in rows]
+        if not found_file_ids:
+            return {}
+
+        # Only the requested strings are decoded from the mapped buffers
+        texts = table.column("text").take([rows[file_id] for file_id in found_file_ids]).to_pylist()
+        return dict(zip(found_file_ids, texts))
+
+    def get_file_ids_by_term_id(self, term_id):
+        term_id = int(term_id)
+        start = np.searchsorted(self.term_ids, term_id, side="left")
+        end = np.searchsorted(self.term_ids, term_id, side="right")
+        return self.term_file_ids.slice(start, end - start).to_pylist()
@@ -0,0 +1,17 @@
+class CorpusSource:
+    """
+    Source of the data used for training: the texts of the files and the files under each term.
+    Input creators and the TermTrainer read from a CorpusSource, so they don't depend on where the corpus is stored.
+    """
+
+    def get_texts_by_file_ids(self, projection, file_ids):
+        """Get one text projection ("abstract", "full_text" or "summarized_text") of a group of files, as { file_id: text }."""
+        raise NotImplementedError
+
+    def get_file_ids_by_term_id(self, term_id):
+        """Get all file_ids under a term (Files with the term or any of its descendants as keyword)."""
+        raise NotImplementedError
+
+    def get_file_ids_by_term_ids(self, term_ids):
+        """Get the file_ids under each term, as { term_id: [file_id, ...] } (Sources can override it with a single query)."""
+        return { term_id: self.get_file_ids_by_term_id(term_id) for term_id in term_ids }
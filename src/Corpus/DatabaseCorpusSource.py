@@ -0,0 +1,18 @@
+from Corpus.CorpusSource import CorpusSource
+from Database.File import File
+from Database.TermFile import TermFile
+
+class DatabaseCorpusSource(CorpusSource):
+    def __init__(self, database):
+        """Reads the corpus from the database."""
+        self.file_db = File(database)
+        self.term_file_db = TermFile(database)
+
+    def get_texts_by_file_ids(self, projection, file_ids):
+        return self.file_db.get_texts_by_file_ids(projection, file_ids)
+
+    def get_file_ids_by_term_id(self, term_id):
+        return self.term_file_db.get_file_ids_by_term_id(term_id)
+
+    def get_file_ids_by_term_ids(self, term_ids):
+        return self.term_file_db.get_file_ids_by_term_ids(term_ids)
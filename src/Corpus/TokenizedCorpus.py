@@ -0,0 +1,93 @@
+import os
+import numpy as np
+from spacy.tokens import DocBin
+
+from utils import instrumentation
+
+class TokenizedCorpus:
+    def __init__(self, nlp, cache_dir, chunk_size=256):
+        """
+        Corpus that is fetched and tokenized only once, and then shared by the models of a branch of the hierarchy.
+        The docs are saved in DocBin chunks, the file at position p is in chunk p // chunk_size.
+        The training datasets are views of the corpus (Arrays of positions), see TrainingDataset.from_positions_by_label.
+
+        :param nlp: spaCy pipeline whose tokenizer is used (The docs are only tokenized, every model runs its own pipeline)
+        :param cache_dir: Folder where the chunks are saved
+        :param chunk_size: Quantity of files fetched and tokenized at a time (And docs per chunk)
+        """
+        self.nlp = nlp
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.file_ids = np.asarray([], dtype=str)
+        self.has_text = np.asarray([], dtype=bool)
+        self.chunk_paths = []
+
+    def build(self, file_ids, input_creator):
+        """Fetches the texts of the files with the input creator and tokenizes them. The files are sorted by id."""
+        self.file_ids = np.unique(np.asarray(file_ids, dtype=str))
+        self.has_text = np.zeros(len(self.file_ids), dtype=bool)
+        self.chunk_paths = []
+
+        for chunk_start in range(0, len(self.file_ids), self.chunk_size):
+            chunk_file_ids = [str(file_id) for file_id in self.file_ids[chunk_start:chunk_start + self.chunk_size]]
+            texts_by_file_id = input_creator.get_files_data_input(chunk_file_ids)
+
+            # Files without text keep an empty doc, so the position in the chunk is the position in the corpus
+            doc_bin = DocBin()
+            with instrumentation.span("training.tokenize"):
+                texts = [texts_by_file_id.get(file_id) or "" for file_id in chunk_file_ids]
+                for offset, doc in enumerate(self.nlp.tokenizer.pipe(texts)):
+                    doc_bin.add(doc)
+                    self.has_text[chunk_start + offset] = bool(texts[offset])
+
+            chunk_path = os.path.join(self.cache_dir, f"corpus_{len(self.chunk_paths)}.spacy")
+            doc_bin.to_disk(chunk_path)
+            self.chunk_paths.append(chunk_path)
+
+        return self
+
+    def get_file_ids(self):
+        return self.file_ids
+
+    def get_size(self):
+        return len(self.file_ids)
+
+    def get_positions(self, file_ids):
+        """Positions of the files in the corpus (Files not in the corpus are ignored)."""
+        file_ids = np.asarray(file_ids, dtype=str)
+        positions = np.searchsorted(self.file_ids, file_ids)
+        found = positions < len(self.file_ids)
+        found[found] = self.file_ids[positions[found]] == file_ids[found]
+        return np.unique(positions[found])
+
+    def iter_docs(self, positions, vocab):
+        """
+        Yields (index, doc) for the given positions, index being the place of the position in the array.
+        Only the chunks with some of the positions are read, and each one once. Files without text are skipped.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        order = np.argsort(positions, kind="stable")
+        chunk_indexes = positions[order] // self.chunk_size
+
+        for chunk_index in np.unique(chunk_indexes):
+            chunk_order = order[chunk_indexes == chunk_index]
+            with instrumentation.span("training.cache_read"):
+                docs = list(DocBin().from_disk(self.chunk_paths[chunk_index]).get_docs(vocab))
+            for index in chunk_order:
+                position = positions[index]
+                if self.has_text[position]:
+                    yield int(index), docs[position - chunk_index * self.chunk_size]
+
+    def iter_chunks(self, dataset, vocab, chunk_size=256):
+        """Yields the docs of a dataset (A view of this corpus) in chunks of (docs, categories)."""
+        docs = []
+        categories = []
+        for index, doc in self.iter_docs(dataset.get_positions(), vocab):
+            docs.append(doc)
+            categories.append(dataset.get_categories(index))
+            if len(docs) == chunk_size:
+                yield docs, categories
+                docs, categories = [], []
+
+        if docs:
+            yield docs, categories
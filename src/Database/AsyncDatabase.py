@@ -0,0 +1,78 @@
+from contextlib import asynccontextmanager
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from Database.Database import instrument_engine
+
+def get_async_connection_string(connection_string):
+    """Maps the sync DB_URL to the async driver (asyncpg for Postgres, aiosqlite for SQLite)."""
+    if connection_string.startswith("postgresql://"):
+        return connection_string.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if connection_string.startswith("sqlite://"):
+        return connection_string.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return connection_string
+
+class AsyncDatabase:
+    def __init__(self, connection_string, pool_size=5, max_overflow=10, pool_pre_ping=True, pool_recycle=1800):
+        """
+        Async counterpart of Database. Every operation opens its own session from the pool,
+        so many coroutines can run queries concurrently.
+
+        :param connection_string: Database URL (The sync one is also accepted, it's mapped to the async driver)
+        """
+        connection_string = get_async_connection_string(connection_string)
+        engine_options = { "pool_pre_ping": pool_pre_ping, "pool_recycle": pool_recycle }
+        if not connection_string.startswith("sqlite"):
+            engine_options["pool_size"] = pool_size
+            engine_options["max_overflow"] = max_overflow
+
+        self.engine = create_async_engine(connection_string, **engine_options)
+        # The events are only available in the sync engine that runs under the async one
+        instrument_engine(self.engine.sync_engine)
+        self.Session = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    @asynccontextmanager
+    async def session_scope(self):
+        """Unit of work: commits at the end and rollbacks on error."""
+        async with self.Session() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    def insert(self, model):
+        """Returns the insert statement of the engine dialect (Needed for the upserts)."""
+        if self.engine.dialect.name == "sqlite":
+            return sqlite.insert(model)
+        return postgresql.insert(model)
+
+    async def query(self, query):
+        """Runs a select and returns all the rows (The session is closed before returning)."""
+        async with self.Session() as session:
+            result = await session.execute(query)
+            return result.all()
+
+    async def add(self, instance):
+        try:
+            async with self.session_scope() as session:
+                session.add(instance)
+            return True
+        except Exception as e:
+            print(f"Error adding instance: {e}")
+            return False
+
+    async def execute(self, statement, params=None):
+        try:
+            async with self.session_scope() as session:
+                await session.execute(statement, params)
+            return True
+        except Exception as e:
+            print(f"Error executing statement: {e}")
+            return False
+
+    async def close(self):
+        await self.engine.dispose()
+
+    def get_engine(self):
+        return self.engine
@@ -0,0 +1,119 @@
+from sqlalchemy import select
+from Database.DatabaseModels import FileModel, FileSignatureModel, TEXT_MODELS
+from Database.File import build_text_row
+
+class AsyncFile():
+    def __init__(self, database=None):
+        """Initialize the AsyncFile instance with an AsyncDatabase. Mirrors the File API with coroutines."""
+        self.database = database
+
+    async def get_abstract_by_file_id(self, file_id):
+        """Get a file abstract by its file_id."""
+        return await self.get_text_by_file_id("abstract", file_id)
+
+    async def get_full_text_by_file_id(self, file_id):
+        """Get a file full_text by its file_id."""
+        return await self.get_text_by_file_id("full_text", file_id)
+
+    async def get_summarized_text_by_file_id(self, file_id):
+        """Get a file summarized_text by its file_id."""
+        return await self.get_text_by_file_id("summarized_text", file_id)
+
+    async def get_text_by_file_id(self, projection, file_id):
+        text_model = TEXT_MODELS[projection]
+        query = select(text_model.text).where(text_model.file_id == file_id)
+        results = await self.database.query(query)
+        return results[0][0] if results else None
+
+    async def get_abstracts_by_file_ids(self, file_ids):
+        """Get the abstracts of a group of files in a single query, as { file_id: abstract }."""
+        return await self.get_texts_by_file_ids("abstract", file_ids)
+
+    async def get_full_texts_by_file_ids(self, file_ids):
+        """Get the full_texts of a group of files in a single query, as { file_id: full_text }."""
+        return await self.get_texts_by_file_ids("full_text", file_ids)
+
+    async def get_summarized_texts_by_file_ids(self, file_ids):
+        """Get the summarized_texts of a group of files in a single query, as { file_id: summarized_text }."""
+        return await self.get_texts_by_file_ids("summarized_text", file_ids)
+
+    async def get_texts_by_file_ids(self, projection, file_ids):
+        """Get one text projection ("abstract", "full_text" or "summarized_text") of a group of files, as { file_id: text }."""
+        text_model = TEXT_MODELS[projection]
+        query = select(text_model.file_id, text_model.text).where(text_model.file_id.in_(file_ids))
+        results = await self.database.query(query)
+        return { file_id: value for file_id, value in results }
+
+    async def iter_texts_in_chunks(self, projection, chunk_size=100, skip_duplicates=False):
+        """
+        Yields one text projection of all the files as lists of (file_id, text), chunk_size files at a time.
+        Paginates by file_id, so only one chunk is in memory at a time.
+
+        :param skip_duplicates: Leave out the near-duplicates of other files (See FileSignatureModel)
+        """
+        text_model = TEXT_MODELS[projection]
+        last_file_id = None
+        while True:
+            query = select(text_model.file_id, text_model.text).order_by(text_model.file_id).limit(chunk_size)
+            if skip_duplicates:
+                query = query.outerjoin(FileSignatureModel, FileSignatureModel.file_id == text_model.file_id).where(FileSignatureModel.duplicate_of.is_(None))
+            if last_file_id is not None:
+                query = query.where(text_model.file_id > last_file_id)
+
+            results = await self.database.query(query)
+            if not results:
+                break
+
+            yield [(file_id, value) for file_id, value in results]
+            last_file_id = results[-1][0]
+
+    async def get_all(self):
+        """Get all files from the database (Only the ids)."""
+        results = await self.database.query(select(FileModel))
+        return [result[0] for result in results]
+
+    async def add(self, file_id, abstract, full_text):
+        """Create a new file in the database with its abstract and full_text."""
+        return await self.upsert_many([{ "file_id": file_id, "abstract": abstract, "full_text": full_text }])
+
+    async def upsert_many(self, files):
+        """
+        Create or update a group of files in a single transaction.
+
+        :param files: List of dictionaries with the file_id and the texts to set, e.g. { "file_id": "1", "abstract": "..." }
+        """
+        if not files:
+            return True
+
+        try:
+            async with self.database.session_scope() as session:
+                statement = self.database.insert(FileModel).on_conflict_do_nothing(index_elements=[FileModel.file_id])
+                await session.execute(statement, [{ "file_id": file["file_id"] } for file in files])
+
+                for projection, text_model in TEXT_MODELS.items():
+                    rows = [build_text_row(file["file_id"], file[projection]) for file in files if projection in file]
+                    if rows:
+                        await session.execute(self.get_text_upsert(text_model), rows)
+            return True
+        except Exception as e:
+            print(f"Error upserting files: {e}")
+            return False
+
+    async def update_summaries(self, summaries):
+        """
+        Create or replace the summarized_text of a group of files in a single round-trip.
+
+        :param summaries: { file_id: summary }
+        """
+        if not summaries:
+            return True
+
+        rows = [build_text_row(file_id, summary) for file_id, summary in summaries.items()]
+        return await self.database.execute(self.get_text_upsert(TEXT_MODELS["summarized_text"]), rows)
+
+    def get_text_upsert(self, text_model):
+        statement = self.database.insert(text_model)
+        return statement.on_conflict_do_update(
+            index_elements=[text_model.file_id],
+            set_={ "text": statement.excluded.text, "length": statement.excluded.length, "hash": statement.excluded.hash }
+        )
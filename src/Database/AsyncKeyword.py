@@ -0,0 +1,73 @@
+from sqlalchemy import delete, func, insert, select
+from Database.DatabaseModels import AbstractModel, KeywordModel
+
+class AsyncKeyword():
+    def __init__(self, database):
+        """Initialize the AsyncKeyword instance with an AsyncDatabase. Mirrors the Keyword API with coroutines."""
+        self.database = database
+
+    async def add(self, keyword_id, file_id, order):
+        """Create a new keyword in the database."""
+        new_keyword = KeywordModel(keyword_id=keyword_id, file_id=file_id, order=order)
+        return await self.database.add(new_keyword)
+
+    async def get_all(self):
+        """Get all keywords from the database."""
+        results = await self.database.query(select(KeywordModel))
+        return [result[0] for result in results]
+
+    async def get_by_keyword_id(self, keyword_id):
+        """Get a keyword by its keyword_id."""
+        query = select(KeywordModel).where(KeywordModel.keyword_id == keyword_id).limit(1)
+        results = await self.database.query(query)
+        return results[0] if results else None
+
+    async def get_count_by_keyword_id(self, keyword_id):
+        """Get the number of keywords associated with a given keyword_id."""
+        query = select(func.count()).select_from(KeywordModel).filter(KeywordModel.keyword_id == keyword_id)
+        results = await self.database.query(query)
+        return results[0][0]
+
+    async def get_abstracts_by_keyword_id(self, keyword_ids):
+        """Get all abstracts associated with a given keyword_ids."""
+        query = (
+            select(AbstractModel.text)
+            .join(KeywordModel, AbstractModel.file_id == KeywordModel.file_id)
+            .where(KeywordModel.keyword_id.in_(keyword_ids))
+        )
+        results = await self.database.query(query)
+        return [result[0] for result in results]
+
+    async def get_file_ids_by_keyword_ids(self, keyword_ids):
+        """Get all file_ids associated with a given keyword_ids."""
+        query = select(KeywordModel.file_id).where(KeywordModel.keyword_id.in_(keyword_ids))
+        results = await self.database.query(query)
+        return [result[0] for result in results if result[0] is not None]
+
+    async def get_keyword_ids_by_file_ids(self, file_ids):
+        """Get the keywords of a group of files in a single query, as { file_id: [keyword_id, ...] }."""
+        query = select(KeywordModel.file_id, KeywordModel.keyword_id).where(KeywordModel.file_id.in_(file_ids))
+        keyword_ids_by_file = { file_id: [] for file_id in file_ids }
+        for file_id, keyword_id in await self.database.query(query):
+            keyword_ids_by_file[file_id].append(keyword_id)
+        return keyword_ids_by_file
+
+    async def upsert_many(self, keywords):
+        """
+        Replace the keywords of a group of files in a single transaction.
+        The keywords table has no primary key, so the rows of the files are deleted and inserted again.
+
+        :param keywords: List of dictionaries like { "keyword_id": 661, "file_id": "1", "order": 1 }
+        """
+        if not keywords:
+            return True
+
+        file_ids = list({ keyword["file_id"] for keyword in keywords })
+        try:
+            async with self.database.session_scope() as session:
+                await session.execute(delete(KeywordModel.__table__).where(KeywordModel.__table__.c.file_id.in_(file_ids)))
+                await session.execute(insert(KeywordModel.__table__), keywords)
+            return True
+        except Exception as e:
+            print(f"Error upserting keywords: {e}")
+            return False
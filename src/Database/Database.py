@@ -1,18 +1,104 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+import time
+import asyncio
+import threading
+import weakref
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import text
+from utils import instrumentation
 
 Base = declarative_base()
 
-def get_db_session(engine):
-    Session = sessionmaker(bind=engine)
-    return Session()
+def get_session_scope():
+    """Sessions are scoped by asyncio task when called inside a running loop, and by thread otherwise."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task if task is not None else threading.get_ident()
+
+def get_pool_config_from_env():
+    """Reads the connection pool settings from the environment (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE)."""
+    return {
+        "pool_size": int(os.getenv('DB_POOL_SIZE', 5)),
+        "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        "pool_pre_ping": os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+
+def instrument_engine(engine):
+    """Records every round-trip of the engine as the stage db.<statement> (e.g. db.select, db.insert)."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "statement"
+        instrumentation.metrics.record(f"db.{operation}", elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # A failed statement doesn't reach after_cursor_execute, its start is discarded
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
+
+def dispose_after_fork(database_ref):
+    database = database_ref()
+    if database is not None:
+        database.dispose_after_fork()
 
 class Database:
-    def __init__(self, connection_string):
-        self.engine = create_engine(connection_string)
-        self.session = get_db_session(self.engine)
+    def __init__(self, connection_string, pool_size=5, max_overflow=10, pool_pre_ping=True, pool_recycle=1800):
+        """
+        Initializes the engine with a connection pool and a registry of sessions, one per thread (or asyncio task).
+
+        :param connection_string: Database URL
+        :param pool_size: Connections kept open in the pool
+        :param max_overflow: Extra connections allowed when the pool is exhausted
+        :param pool_pre_ping: Checks each connection before using it (Avoids errors with dropped connections)
+        :param pool_recycle: Seconds after which a connection is replaced
+        """
+        engine_options = { "pool_pre_ping": pool_pre_ping, "pool_recycle": pool_recycle }
+        if not connection_string.startswith("sqlite"):
+            engine_options["pool_size"] = pool_size
+            engine_options["max_overflow"] = max_overflow
+
+        self.engine = create_engine(connection_string, **engine_options)
+        instrument_engine(self.engine)
+        self.Session = scoped_session(sessionmaker(bind=self.engine), scopefunc=get_session_scope)
+
+        # The pooled connections can't be shared with a forked child, it has to open its own ones
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=lambda database_ref=weakref.ref(self): dispose_after_fork(database_ref))
+
+    @property
+    def session(self):
+        """Session of the current thread (or asyncio task)."""
+        return self.Session()
+
+    @contextmanager
+    def session_scope(self):
+        """Unit of work: commits at the end, rollbacks on error and releases the session of the current scope."""
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.Session.remove()
+
+    def dispose_after_fork(self):
+        # Drop the parent connections and sessions without closing them (They're still used by the parent)
+        self.engine.dispose(close=False)
+        self.Session.registry.clear()
 
     def init_db(self):
         Base.metadata.create_all(self.engine)
@@ -30,15 +116,25 @@ class Database:
             return False
 
 
+    def execute(self, statement, params=None):
+        try:
+            self.session.execute(statement, params)
+            self.session.commit()
+            return True
+        except Exception as e:
+            self.session.rollback()
+            print(f"Error executing statement: {e}")
+            return False
+
     def close(self):
-        self.session.close()
+        self.Session.remove()
 
     def get_engine(self):
         return self.engine
     
     def get_all_files(self):
         try:
-            query = text("SELECT file_id, full_text FROM public.files;")
+            query = text("SELECT file_id, text AS full_text FROM public.file_full_texts;")
             result = self.session.execute(query).fetchall()
             # Convertir los resultados a una lista de diccionarios
             files = [{"file_id": row.file_id, "full_text": row.full_text} for row in result]
@@ -49,7 +145,11 @@ class Database:
 
     def update_file_summary(self, file_id, summary):
             try:
-                query = text("UPDATE public.files SET summarized_text = :summary WHERE file_id = :file_id;")
+                query = text(
+                    "INSERT INTO public.file_summaries (file_id, text, length, hash) "
+                    "VALUES (:file_id, :summary, length(:summary), encode(sha256(convert_to(:summary, 'UTF8')), 'hex')) "
+                    "ON CONFLICT (file_id) DO UPDATE SET text = EXCLUDED.text, length = EXCLUDED.length, hash = EXCLUDED.hash;"
+                )
                 self.session.execute(query, {"summary": summary, "file_id": file_id})
                 self.session.commit()
                 print(f"Updated summarized_text for file_id {file_id}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, LargeBinary, DateTime, ForeignKey, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -7,14 +7,96 @@ Base = declarative_base()
 class FileModel(Base):
     __tablename__ = 'files'
     file_id = Column(String(255), primary_key=True)
-    abstract = Column(Text)
-    full_text = Column(Text)
-    summarized_text = Column(Text)
     keywords = relationship("KeywordModel", back_populates="file")
 
+# Each text representation of a file lives in its own table, so reading one doesn't pull the others.
+# length and hash are cheap metadata to compare texts without reading them
+class AbstractModel(Base):
+    __tablename__ = 'file_abstracts'
+    file_id = Column(String(255), ForeignKey('files.file_id'), primary_key=True)
+    text = Column(Text)
+    length = Column(Integer)
+    hash = Column(String(64))
+
+class FullTextModel(Base):
+    __tablename__ = 'file_full_texts'
+    file_id = Column(String(255), ForeignKey('files.file_id'), primary_key=True)
+    text = Column(Text)
+    length = Column(Integer)
+    hash = Column(String(64))
+
+class SummarizedTextModel(Base):
+    __tablename__ = 'file_summaries'
+    file_id = Column(String(255), ForeignKey('files.file_id'), primary_key=True)
+    text = Column(Text)
+    length = Column(Integer)
+    hash = Column(String(64))
+
+# Text projections that can be requested from File
+TEXT_MODELS = {
+    "abstract": AbstractModel,
+    "full_text": FullTextModel,
+    "summarized_text": SummarizedTextModel,
+}
+
 class KeywordModel(Base):
     __tablename__ = 'keywords'
-    keyword_id = Column(Integer, primary_key=True)
+    keyword_id = Column(Integer, nullable=False)
     file_id = Column(String(255), ForeignKey('files.file_id'))
     order = Column(Integer, name="order")
     file = relationship("FileModel", back_populates="keywords")
+    # The table has no primary key (A keyword can be saved without a file), the ORM identifies the rows by both ids
+    __mapper_args__ = { "primary_key": [keyword_id, file_id] }
+    __table_args__ = (Index('idx_keywords_file_id', 'file_id'), Index('idx_keywords_keyword_id', 'keyword_id'))
+
+# Materialized term -> files index. Each file is rolled up to every ancestor of its keywords
+class TermFileModel(Base):
+    __tablename__ = 'term_files'
+    term_id = Column(Integer, primary_key=True)
+    file_id = Column(String(255), ForeignKey('files.file_id'), primary_key=True)
+    __table_args__ = (Index('idx_term_files_file_id', 'file_id'),)
+
+# Progress of the generate mode, one row per PDF. Not linked to files: a PDF that failed has no file
+class IngestionLedgerModel(Base):
+    __tablename__ = 'ingestion_ledger'
+    file_id = Column(String(255), primary_key=True)
+    status = Column(String(20), nullable=False)
+    content_hash = Column(String(64))
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+# MinHash signature of the full text of each file (See utils/near_duplicates.py). A near-duplicate of a file ingested before
+# has duplicate_of set: it's kept in files and keywords, but not rolled up to term_files (So it's not used for training)
+class FileSignatureModel(Base):
+    __tablename__ = 'file_signatures'
+    file_id = Column(String(255), ForeignKey('files.file_id'), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+    duplicate_of = Column(String(255))
+    similarity = Column(Float)
+    __table_args__ = (Index('idx_file_signatures_duplicate_of', 'duplicate_of'),)
+
+# LSH index of the signatures: the hash of each band of the signature of the files that aren't duplicates
+class FileLshBucketModel(Base):
+    __tablename__ = 'file_lsh_buckets'
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    file_id = Column(String(255), ForeignKey('files.file_id'), primary_key=True)
+    __table_args__ = (Index('idx_file_lsh_buckets_file_id', 'file_id'),)
+
+# Queue of the models to train, shared by the training workers of every node (See Database/TrainingJob.py).
+# A running job whose heartbeat is older than the lease belongs to a dead worker and can be claimed again
+class TrainingJobModel(Base):
+    __tablename__ = 'training_jobs'
+    term_id = Column(String(255), primary_key=True)
+    status = Column(String(20), nullable=False)
+    priority = Column(Integer, nullable=False, default=0)
+    depends_on = Column(String(255))
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String(255))
+    heartbeat_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    error = Column(Text)
+    metrics = Column(Text)
+    __table_args__ = (Index('idx_training_jobs_status_priority', 'status', 'priority'),)
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, String, Text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from sqlalchemy import select
-from Database.DatabaseModels import FileModel
+import hashlib
+from sqlalchemy import select, delete
+from Database.DatabaseModels import FileModel, TEXT_MODELS
 
-Base = declarative_base()
+def build_text_row(file_id, text):
+    """Builds the row of a text table, with the length and hash of the text."""
+    return {
+        "file_id": file_id,
+        "text": text,
+        "length": len(text) if text is not None else None,
+        "hash": hashlib.sha256(text.encode("utf-8")).hexdigest() if text is not None else None,
+    }
 
 class File():
     def __init__(self, database=None):
@@ -13,25 +18,75 @@ class File():
 
     def get_abstract_by_file_id(self, file_id):
         """Get a file abstract by its file_id."""
-        query = select(FileModel.abstract).where(FileModel.file_id == file_id)
-        result = self.database.query(query).first()
-        return result[0]
-    
+        return self.get_text_by_file_id("abstract", file_id)
+
     def get_full_text_by_file_id(self, file_id):
-        """Get a file abstract by its file_id."""
-        query = select(FileModel.full_text).where(FileModel.file_id == file_id)
-        result = self.database.query(query).first()
-        return result[0]
-    
+        """Get a file full_text by its file_id."""
+        return self.get_text_by_file_id("full_text", file_id)
+
     def get_summarized_text_by_file_id(self, file_id):
         """Get a file summarized_text by its file_id."""
-        query = select(FileModel.summarized_text).where(FileModel.file_id == file_id)
+        return self.get_text_by_file_id("summarized_text", file_id)
+
+    def get_text_by_file_id(self, projection, file_id):
+        text_model = TEXT_MODELS[projection]
+        query = select(text_model.text).where(text_model.file_id == file_id)
         result = self.database.query(query).first()
-        return result[0]
+        return result[0] if result else None
+
+    def get_abstracts_by_file_ids(self, file_ids):
+        """Get the abstracts of a group of files in a single query, as { file_id: abstract }."""
+        return self.get_texts_by_file_ids("abstract", file_ids)
+
+    def get_full_texts_by_file_ids(self, file_ids):
+        """Get the full_texts of a group of files in a single query, as { file_id: full_text }."""
+        return self.get_texts_by_file_ids("full_text", file_ids)
 
-    def get_all(self): 
+    def get_summarized_texts_by_file_ids(self, file_ids):
+        """Get the summarized_texts of a group of files in a single query, as { file_id: summarized_text }."""
+        return self.get_texts_by_file_ids("summarized_text", file_ids)
+
+    def get_texts_by_file_ids(self, projection, file_ids):
+        """Get one text projection ("abstract", "full_text" or "summarized_text") of a group of files, as { file_id: text }."""
+        text_model = TEXT_MODELS[projection]
+        query = select(text_model.file_id, text_model.text).where(text_model.file_id.in_(file_ids))
+        results = self.database.query(query)
+
+        return { file_id: value for file_id, value in results }
+
+    def get_texts(self, file_ids, projection=("summarized_text",), metadata_only=False):
+        """
+        Get several text projections of a group of files in a single query. Only the requested tables are read.
+
+        :param file_ids: List of file ids
+        :param projection: Names of the texts to read ("abstract", "full_text", "summarized_text")
+        :param metadata_only: If True, only the length and hash of each text are read, not the text itself
+        :return: { file_id: { "summarized_text": ... } } or { file_id: { "summarized_text": (length, hash) } }
+        """
+        columns = [FileModel.file_id]
+        query_from = FileModel.__table__
+        for name in projection:
+            text_model = TEXT_MODELS[name]
+            if metadata_only:
+                columns += [text_model.length.label(f"{name}_length"), text_model.hash.label(f"{name}_hash")]
+            else:
+                columns.append(text_model.text.label(name))
+            query_from = query_from.outerjoin(text_model.__table__, text_model.file_id == FileModel.file_id)
+
+        query = select(*columns).select_from(query_from).where(FileModel.file_id.in_(file_ids))
+        texts = {}
+        for row in self.database.query(query):
+            values = row._mapping
+            if metadata_only:
+                texts[row.file_id] = { name: (values[f"{name}_length"], values[f"{name}_hash"]) for name in projection }
+            else:
+                texts[row.file_id] = { name: values[name] for name in projection }
+
+        return texts
+
+    def get_all(self):
+        """Get all files from the database (Only the ids, the texts must be requested with get_texts)."""
         files = []
-        """Get all keywords from the database."""
         query = select(FileModel)
         results = self.database.query(query)
 
@@ -42,12 +97,29 @@ class File():
         return files
 
     def add(self, file_id, abstract, full_text):
-        """Create a new file in the database."""
-        new_file = FileModel(file_id=file_id, abstract=abstract, full_text=full_text)
+        """
+        Create a file in the database with its abstract and full_text.
+        If the file already exists its texts are replaced (So a file can be ingested again).
+        """
         try:
-            result = self.database.add(new_file)
-            return result
+            with self.database.session_scope() as session:
+                session.merge(FileModel(file_id=file_id))
+                session.flush()
+                session.merge(TEXT_MODELS["abstract"](**build_text_row(file_id, abstract)))
+                session.merge(TEXT_MODELS["full_text"](**build_text_row(file_id, full_text)))
+            return True
         except Exception as e:
-            self.session.rollback()
             print(f"Error adding file: {e}")
-    
\ No newline at end of file
+            return False
+
+    def set_text(self, projection, file_id, text):
+        """Create or replace one text projection of a file (e.g. the summarized_text)."""
+        text_model = TEXT_MODELS[projection]
+        try:
+            with self.database.session_scope() as session:
+                session.execute(delete(text_model).where(text_model.file_id == file_id))
+                session.add(text_model(**build_text_row(file_id, text)))
+            return True
+        except Exception as e:
+            print(f"Error updating {projection} for file_id {file_id}: {e}")
+            return False
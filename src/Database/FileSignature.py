@@ -0,0 +1,97 @@
+from sqlalchemy import and_, delete, insert, or_, select, update
+from Database.DatabaseModels import FileSignatureModel, FileLshBucketModel
+from utils.near_duplicates import DEFAULT_THRESHOLD, get_band_hashes, get_similarity, signature_from_bytes, signature_to_bytes
+
+class FileSignature():
+    def __init__(self, database):
+        """Initialize the FileSignature instance. Keeps the MinHash signatures of the files and their LSH index."""
+        self.database = database
+
+    def find_duplicate(self, file_id, signature, threshold=DEFAULT_THRESHOLD):
+        """
+        Finds the file most similar to the signature among the ones that share a band with it (Not the file itself).
+
+        :return: (file_id, similarity) of the most similar file, or (None, None) if none reaches the threshold
+        """
+        band_hashes = get_band_hashes(signature)
+        query = select(FileLshBucketModel.file_id).where(
+            or_(*(and_(FileLshBucketModel.band == band, FileLshBucketModel.bucket == bucket) for band, bucket in enumerate(band_hashes))),
+            FileLshBucketModel.file_id != file_id
+        ).distinct()
+        candidate_ids = [result[0] for result in self.database.query(query)]
+        if not candidate_ids:
+            return None, None
+
+        query = select(FileSignatureModel.file_id, FileSignatureModel.signature).where(FileSignatureModel.file_id.in_(candidate_ids))
+        best_id, best_similarity = None, None
+        for candidate_id, candidate_signature in self.database.query(query):
+            similarity = get_similarity(signature, signature_from_bytes(candidate_signature))
+            if similarity >= threshold and (best_similarity is None or similarity > best_similarity):
+                best_id, best_similarity = candidate_id, similarity
+
+        return best_id, best_similarity
+
+    def add(self, file_id, signature, duplicate_of=None, similarity=None):
+        """
+        Create or replace the signature of a file. Only the files that aren't duplicates are added to the LSH index,
+        so every duplicate points to a file that isn't one (The duplicates of a file that becomes one point to its original).
+        """
+        try:
+            with self.database.session_scope() as session:
+                session.execute(delete(FileLshBucketModel).where(FileLshBucketModel.file_id == file_id))
+                session.merge(FileSignatureModel(
+                    file_id=file_id, signature=signature_to_bytes(signature), duplicate_of=duplicate_of, similarity=similarity
+                ))
+                if duplicate_of is None:
+                    rows = [{ "band": band, "bucket": bucket, "file_id": file_id } for band, bucket in enumerate(get_band_hashes(signature))]
+                    session.execute(insert(FileLshBucketModel), rows)
+                else:
+                    session.execute(
+                        update(FileSignatureModel).where(FileSignatureModel.duplicate_of == file_id).values(duplicate_of=duplicate_of)
+                    )
+            return True
+        except Exception as e:
+            print(f"Error adding the signature of file_id {file_id}: {e}")
+            return False
+
+    def remove(self, file_id):
+        """
+        Remove the signature of a file and its rows of the LSH index (e.g. it's ingested again without a signature).
+        The first of its duplicates takes its place in the index, and the others point to it.
+
+        :return: (True, file_id of the duplicate that isn't one anymore, or None), or (False, None) on error
+        """
+        try:
+            with self.database.session_scope() as session:
+                session.execute(delete(FileLshBucketModel).where(FileLshBucketModel.file_id == file_id))
+                session.execute(delete(FileSignatureModel).where(FileSignatureModel.file_id == file_id))
+                query = select(FileSignatureModel.file_id, FileSignatureModel.signature).where(
+                    FileSignatureModel.duplicate_of == file_id
+                ).order_by(FileSignatureModel.file_id).limit(1)
+                first = session.execute(query).first()
+                if first is None:
+                    return True, None
+
+                original_id, signature = first
+                session.execute(
+                    update(FileSignatureModel).where(FileSignatureModel.file_id == original_id).values(duplicate_of=None, similarity=None)
+                )
+                session.execute(
+                    update(FileSignatureModel).where(FileSignatureModel.duplicate_of == file_id).values(duplicate_of=original_id)
+                )
+                rows = [
+                    { "band": band, "bucket": bucket, "file_id": original_id }
+                    for band, bucket in enumerate(get_band_hashes(signature_from_bytes(signature)))
+                ]
+                session.execute(insert(FileLshBucketModel), rows)
+            return True, original_id
+        except Exception as e:
+            print(f"Error removing the signature of file_id {file_id}: {e}")
+            return False, None
+
+    def get_duplicates(self):
+        """Get the near-duplicates as { file_id: (duplicate_of, similarity) }."""
+        query = select(FileSignatureModel.file_id, FileSignatureModel.duplicate_of, FileSignatureModel.similarity).where(
+            FileSignatureModel.duplicate_of.is_not(None)
+        )
+        return { file_id: (duplicate_of, similarity) for file_id, duplicate_of, similarity in self.database.query(query) }
@@ -0,0 +1,63 @@
+from sqlalchemy import select
+from Database.DatabaseModels import IngestionLedgerModel
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+class IngestionLedger():
+    def __init__(self, database):
+        """Initialize the IngestionLedger instance. Keeps the status of every PDF processed by the generate mode."""
+        self.database = database
+
+    def get_all(self):
+        """Get the ledger as { file_id: (status, content_hash, attempts) }."""
+        query = select(IngestionLedgerModel.file_id, IngestionLedgerModel.status, IngestionLedgerModel.content_hash, IngestionLedgerModel.attempts)
+        return { file_id: (status, content_hash, attempts) for file_id, status, content_hash, attempts in self.database.query(query) }
+
+    def get_pending(self, file_ids, max_attempts=3, content_hashes=None):
+        """
+        Get the file_ids that still have to be processed: the new ones and the failed ones with attempts left.
+
+        :param file_ids: All the file_ids found
+        :param max_attempts: Failed files are not retried after this quantity of attempts
+        :param content_hashes: Optional { file_id: content_hash }. Done files whose PDF changed are processed again
+        """
+        ledger = self.get_all()
+        pending = []
+        for file_id in file_ids:
+            if file_id not in ledger:
+                pending.append(file_id)
+                continue
+
+            status, content_hash, attempts = ledger[file_id]
+            if status == STATUS_DONE:
+                if content_hashes is not None and content_hashes.get(file_id) != content_hash:
+                    pending.append(file_id)
+            elif attempts < max_attempts:
+                pending.append(file_id)
+
+        return pending
+
+    def mark_done(self, file_id, content_hash):
+        return self.record(file_id, STATUS_DONE, content_hash)
+
+    def mark_failed(self, file_id, content_hash, error):
+        return self.record(file_id, STATUS_FAILED, content_hash, str(error))
+
+    def record(self, file_id, status, content_hash, error=None):
+        """Create or update the row of a file, counting one more attempt."""
+        try:
+            with self.database.session_scope() as session:
+                entry = session.get(IngestionLedgerModel, file_id)
+                if entry is None:
+                    entry = IngestionLedgerModel(file_id=file_id, attempts=0)
+                    session.add(entry)
+
+                entry.status = status
+                entry.content_hash = content_hash
+                entry.error = error
+                entry.attempts += 1
+            return True
+        except Exception as e:
+            print(f"Error updating the ingestion ledger for file_id {file_id}: {e}")
+            return False
@@ -1,4 +1,4 @@
-from sqlalchemy import func, select
+from sqlalchemy import delete, func, insert, select
 from Database.DatabaseModels import KeywordModel
 
 class Keyword():
@@ -15,6 +15,28 @@ class Keyword():
         except Exception as e:
             print(f"Error adding keyword: {e}")
 
+    def set_by_file_id(self, file_id, keywords):
+        """
+        Replace the keywords of a file in a single transaction (So a file can be ingested again without duplicates).
+
+        :param keywords: List of (keyword_id, order)
+        """
+        rows = [{ "keyword_id": keyword_id, "file_id": file_id, "order": order } for keyword_id, order in keywords]
+        try:
+            with self.database.session_scope() as session:
+                session.execute(delete(KeywordModel.__table__).where(KeywordModel.__table__.c.file_id == file_id))
+                if rows:
+                    session.execute(insert(KeywordModel.__table__), rows)
+            return True
+        except Exception as e:
+            print(f"Error setting keywords of file_id {file_id}: {e}")
+            return False
+
+    def get_keyword_ids_by_file_id(self, file_id):
+        """Get the keyword_ids of a file."""
+        query = select(KeywordModel.keyword_id).where(KeywordModel.file_id == file_id)
+        return [result[0] for result in self.database.query(query)]
+
     def get_all(self): 
         """Get all keywords from the database."""
         keywords = []
@@ -44,11 +66,11 @@ class Keyword():
     
     def get_abstracts_by_keyword_id(self, keyword_ids):
         """Get all abstracts associated with a given keyword_ids."""
-        from Database.DatabaseModels import FileModel
+        from Database.DatabaseModels import AbstractModel
         abstracts = []
         query = (
-            select(FileModel.abstract)
-            .join(KeywordModel, FileModel.file_id == KeywordModel.file_id)
+            select(AbstractModel.text)
+            .join(KeywordModel, AbstractModel.file_id == KeywordModel.file_id)
             .where(KeywordModel.keyword_id.in_(keyword_ids))
         )
 
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from sqlalchemy import delete, insert, select
+from Database.DatabaseModels import KeywordModel, TermFileModel, FileSignatureModel
+
+class TermFile():
+    def __init__(self, database, thesaurus=None):
+        """
+        Initialize the TermFile instance. The thesaurus is needed to roll up the files to the ancestors of their keywords
+        (Only for writing, the lookups don't need it).
+        """
+        self.database = database
+        self.thesaurus = thesaurus
+
+    def get_file_ids_by_term_id(self, term_id):
+        """Get all file_ids under a term (Files with the term or any of its descendants as keyword)."""
+        query = select(TermFileModel.file_id).where(TermFileModel.term_id == term_id)
+        results = self.database.query(query)
+
+        return [result[0] for result in results]
+
+    def get_file_ids_by_term_ids(self, term_ids):
+        """Get the file_ids under each term in a single query, as { term_id: [file_id, ...] }."""
+        file_ids_by_term = { str(term_id): [] for term_id in term_ids }
+        query = select(TermFileModel.term_id, TermFileModel.file_id).where(TermFileModel.term_id.in_([int(term_id) for term_id in term_ids]))
+        for term_id, file_id in self.database.query(query):
+            file_ids_by_term[str(term_id)].append(file_id)
+
+        return file_ids_by_term
+
+    def get_term_ids_with_ancestors(self, keyword_ids):
+        """Get the keyword_ids together with all of their ancestors in the thesaurus."""
+        term_ids = set()
+        for keyword_id in keyword_ids:
+            keyword_id = str(keyword_id)
+            term_ids.add(keyword_id)
+            term_ids |= self.thesaurus.get_ancestors(keyword_id)
+
+        return term_ids
+
+    def add_file(self, file_id, keyword_ids):
+        """Refresh the rows of a single file in a single transaction (Used on ingest, after the keywords of the file are saved)."""
+        rows = [
+            { "term_id": int(term_id), "file_id": file_id }
+            for term_id in self.get_term_ids_with_ancestors(keyword_ids)
+        ]
+
+        try:
+            with self.database.session_scope() as session:
+                session.execute(delete(TermFileModel).where(TermFileModel.file_id == file_id))
+                if rows:
+                    session.execute(insert(TermFileModel), rows)
+            return True
+        except Exception as e:
+            print(f"Error adding the terms of file_id {file_id}: {e}")
+            return False
+
+    def rebuild(self, batch_size=10000):
+        """
+        Rebuild the whole table from the keywords table (e.g. after importing a dump or changing the thesaurus).
+        The near-duplicates are left out, as on ingest. The table is replaced in a single transaction,
+        so the training never reads it half built, and it's left as it was if any insert fails.
+        """
+        keyword_ids_by_file = defaultdict(set)
+        duplicate_ids = select(FileSignatureModel.file_id).where(FileSignatureModel.duplicate_of.is_not(None))
+        query = select(KeywordModel.keyword_id, KeywordModel.file_id).where(KeywordModel.file_id.is_not(None), KeywordModel.file_id.not_in(duplicate_ids))
+        for keyword_id, file_id in self.database.query(query):
+            keyword_ids_by_file[file_id].add(keyword_id)
+
+        try:
+            with self.database.session_scope() as session:
+                session.execute(delete(TermFileModel))
+
+                rows = []
+                for file_id, keyword_ids in keyword_ids_by_file.items():
+                    for term_id in self.get_term_ids_with_ancestors(keyword_ids):
+                        rows.append({ "term_id": int(term_id), "file_id": file_id })
+
+                    if len(rows) >= batch_size:
+                        session.execute(insert(TermFileModel), rows)
+                        rows = []
+
+                if rows:
+                    session.execute(insert(TermFileModel), rows)
+            return True
+        except Exception as e:
+            print(f"Error rebuilding the term files: {e}")
+            return False
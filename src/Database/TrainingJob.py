@@ -0,0 +1,138 @@
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, case, exists, func, or_, select, update
+from sqlalchemy.orm import aliased
+from Database.DatabaseModels import TrainingJobModel
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+def get_now():
+    """UTC time of the node, naive like the columns. The lease is minutes long, so the clocks of the nodes only need to be roughly in sync."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class TrainingJob():
+    def __init__(self, database, lease_seconds=300, max_attempts=3):
+        """
+        Initialize the TrainingJob instance. Queue of the models to train, shared by the workers of every node.
+
+        :param lease_seconds: A running job whose heartbeat is older than this belongs to a dead worker and is claimed again
+        :param max_attempts: A job that failed (or whose worker died) this many times isn't claimed again
+        """
+        self.database = database
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def enqueue(self, jobs, reset=False):
+        """
+        Adds the jobs that aren't in the queue. The failed ones are queued again with their attempts reset.
+
+        :param jobs: List of (term_id, depends_on, priority). A job isn't claimed while the job it depends on is pending or running,
+        and the jobs with lower priority are claimed first
+        :param reset: Also queue again the jobs that are done (True for all of them, or the term ids of the ones to queue again)
+        :return: Quantity of jobs queued
+        """
+        queued = 0
+        reset_term_ids = None if isinstance(reset, bool) else set(reset)
+        with self.database.session_scope() as session:
+            for term_id, depends_on, priority in jobs:
+                job = session.get(TrainingJobModel, term_id)
+                if job is None:
+                    job = TrainingJobModel(term_id=term_id)
+                    session.add(job)
+                elif job.status == STATUS_PENDING or job.status == STATUS_RUNNING:
+                    continue
+                elif job.status == STATUS_DONE and not (reset if reset_term_ids is None else term_id in reset_term_ids):
+                    continue
+
+                job.status = STATUS_PENDING
+                job.depends_on = depends_on
+                job.priority = priority
+                job.attempts = 0
+                job.worker_id = None
+                job.error = None
+                queued += 1
+
+        return queued
+
+    def claim(self, worker_id):
+        """
+        Claims the next job: a pending one, or a running one whose worker stopped sending heartbeats.
+        The row is locked with FOR UPDATE SKIP LOCKED, so the workers of every node claim different jobs without waiting for each other.
+        The running jobs of dead workers without attempts left are marked as failed first.
+
+        :return: The term id of the job, or None if there's none to claim now
+        """
+        now = get_now()
+        lease_expired = and_(TrainingJobModel.status == STATUS_RUNNING, TrainingJobModel.heartbeat_at < now - timedelta(seconds=self.lease_seconds))
+        parent = aliased(TrainingJobModel)
+        blocked = exists().where(parent.term_id == TrainingJobModel.depends_on, parent.status.in_([STATUS_PENDING, STATUS_RUNNING]))
+
+        with self.database.session_scope() as session:
+            session.execute(
+                update(TrainingJobModel).where(lease_expired, TrainingJobModel.attempts >= self.max_attempts)
+                .values(status=STATUS_FAILED, error="The worker stopped sending heartbeats", finished_at=now)
+            )
+            query = (
+                select(TrainingJobModel)
+                .where(or_(TrainingJobModel.status == STATUS_PENDING, lease_expired), TrainingJobModel.attempts < self.max_attempts, ~blocked)
+                .order_by(TrainingJobModel.priority, TrainingJobModel.term_id)
+                .limit(1)
+                .with_for_update(skip_locked=True, of=TrainingJobModel)
+            )
+            job = session.execute(query).scalar_one_or_none()
+            if job is None:
+                return None
+
+            job.status = STATUS_RUNNING
+            job.worker_id = worker_id
+            job.attempts += 1
+            job.heartbeat_at = now
+            job.started_at = now
+            job.finished_at = None
+            job.error = None
+            return job.term_id
+
+    def heartbeat(self, term_id, worker_id):
+        """Renews the lease of a running job. Returns False if the job isn't the worker's anymore (Its lease expired and it was claimed again)."""
+        with self.database.session_scope() as session:
+            result = session.execute(
+                update(TrainingJobModel)
+                .where(TrainingJobModel.term_id == term_id, TrainingJobModel.worker_id == worker_id, TrainingJobModel.status == STATUS_RUNNING)
+                .values(heartbeat_at=get_now())
+            )
+            return result.rowcount > 0
+
+    def mark_done(self, term_id, worker_id, metrics=None):
+        return self.finish(term_id, worker_id, STATUS_DONE, metrics=metrics)
+
+    def mark_failed(self, term_id, worker_id, error, metrics=None):
+        """The job is queued again while it has attempts left."""
+        status = case((TrainingJobModel.attempts >= self.max_attempts, STATUS_FAILED), else_=STATUS_PENDING)
+        return self.finish(term_id, worker_id, status, str(error), metrics)
+
+    def finish(self, term_id, worker_id, status, error=None, metrics=None):
+        """Updates a running job of the worker (Not if it was claimed by another worker meanwhile). Returns if it was updated."""
+        try:
+            with self.database.session_scope() as session:
+                result = session.execute(
+                    update(TrainingJobModel)
+                    .where(TrainingJobModel.term_id == term_id, TrainingJobModel.worker_id == worker_id, TrainingJobModel.status == STATUS_RUNNING)
+                    .values(status=status, error=error, metrics=json.dumps(metrics) if metrics is not None else None, finished_at=get_now())
+                )
+                return result.rowcount > 0
+        except Exception as e:
+            print(f"Error finishing the training job of term {term_id}: {e}")
+            return False
+
+    def get_status_counts(self):
+        """Get the quantity of jobs as { status: jobs }."""
+        query = select(TrainingJobModel.status, func.count()).group_by(TrainingJobModel.status)
+        return { status: count for status, count in self.database.query(query) }
+
+    def has_unfinished(self):
+        """If there are jobs pending or running (Maybe claimable later, when their dependency or their lease ends)."""
+        query = select(func.count()).where(TrainingJobModel.status.in_([STATUS_PENDING, STATUS_RUNNING]))
+        return self.database.query(query).scalar() > 0
@@ -0,0 +1,171 @@
+import os
+import logging
+import tempfile
+from spacy.util import load_config, load_model_from_config
+
+from TermTrainer import TermTrainer, get_models_folder
+from Corpus.DatabaseCorpusSource import DatabaseCorpusSource
+from Corpus.TokenizedCorpus import TokenizedCorpus
+from models.TrainingDataset import TrainingDataset
+from models.TrainingManifest import TrainingManifest
+from utils.training_sampling import NO_SAMPLING
+from utils.warm_start import NO_WARM_START
+from utils.incremental_training import NO_INCREMENTAL
+
+class HierarchyTrainer:
+    def __init__(self, thesaurus, database, input_creator, corpus_source=None, config_path="config.cfg", chunk_size=256, epochs=30, sampling=NO_SAMPLING, warm_start=NO_WARM_START, incremental=NO_INCREMENTAL):
+        """
+        Trains the models of a branch of the thesaurus walking the hierarchy from the root term.
+        The files of the root term are fetched and tokenized once (The files of every term are a subset of them),
+        and each model trains on a view of that corpus (The positions of its files).
+
+        :param input_creator: Input creator used to fetch the texts of the files
+        :param corpus_source: Source of the files of each term (The database by default, or an exported corpus)
+        :param sampling: TrainingSampling of the train split of each model. The corpus only has the sampled files
+        and the test files of the models
+        :param warm_start: WarmStart of the models from the model of their parent (Trained before them in the walk)
+        :param incremental: IncrementalTraining of the trained models. Only the ones with new files are updated,
+        and the corpus only has the files of their update
+        """
+        self.thesaurus = thesaurus
+        self.database = database
+        self.input_creator = input_creator
+        self.corpus_source = corpus_source or DatabaseCorpusSource(database)
+        self.config_path = config_path
+        self.chunk_size = chunk_size
+        self.epochs = epochs
+        self.sampling = sampling
+        self.warm_start = warm_start
+        self.incremental = incremental
+
+        logging.basicConfig(filename='logs/trainer.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+        self.log = logging.getLogger('my_logger')
+
+    def get_branch_term_ids(self, root_term_id, max_depth=None):
+        """Term ids of the branch with their depth, in depth-first order (Parents before their children)."""
+        term_ids = []
+        visited = set()
+        pending = [(root_term_id, 0)]
+        while pending:
+            term_id, depth = pending.pop()
+            if term_id in visited or self.thesaurus.get_by_id(term_id) is None:
+                continue
+            visited.add(term_id)
+            term_ids.append((term_id, depth))
+
+            if max_depth is None or depth < max_depth:
+                children = self.thesaurus.get_by_id(term_id).get_children()
+                pending.extend((child_id, depth + 1) for child_id in reversed(children))
+
+        return term_ids
+
+    def get_model_path(self, term_id):
+        return f"{get_models_folder(self.input_creator.get_folder_name())}/{term_id}"
+
+    def is_trained(self, term_id):
+        return os.path.exists(self.get_model_path(term_id))
+
+    def split_term_data(self, term_id, file_ids_by_term):
+        children = self.thesaurus.get_by_id(term_id).get_children()
+        return TrainingDataset.from_file_ids_by_label(children, file_ids_by_term).split(test_size=0.15)
+
+    def needs_update(self, term_id, file_ids_by_term):
+        """If the trained model of the term has new files in its train split, or its children changed (Models without manifest are kept)."""
+        manifest = TrainingManifest.from_disk(self.get_model_path(term_id))
+        if manifest is None:
+            return False
+        if not manifest.has_labels(self.thesaurus.get_by_id(term_id).get_children()):
+            return True
+
+        train_data, _ = self.split_term_data(term_id, file_ids_by_term)
+        return len(self.incremental.get_new_positions(manifest, train_data)) > 0
+
+    def get_corpus_file_ids(self, to_train, file_ids_by_term, root_file_ids):
+        """
+        Files of the corpus of the branch: the files of the root, or only the ones each model uses
+        (After the sampling, or the files of the update of the trained models).
+
+        :return: (file ids, { term_id: train split }). The train splits are prepared on all the files of each term
+        (As the terms strategy does), so the models don't sample again the view of the corpus, that has the files of other terms.
+        Empty if the models train on their whole train split
+        """
+        to_update = { term_id for term_id in to_train if self.is_trained(term_id) }
+        if not self.sampling.is_enabled() and not to_update:
+            return root_file_ids, {}
+
+        file_ids = set()
+        train_splits = {}
+        for term_id in to_train:
+            train_data, test_data = self.split_term_data(term_id, file_ids_by_term)
+            manifest = TrainingManifest.from_disk(self.get_model_path(term_id)) if term_id in to_update else None
+            if manifest is not None and manifest.has_labels(self.thesaurus.get_by_id(term_id).get_children()):
+                train_data, _ = self.incremental.get_update_data(manifest, train_data)
+            else:
+                train_data = self.sampling.apply(term_id, train_data)
+            train_splits[term_id] = train_data
+            file_ids.update(train_data.get_file_ids().tolist())
+            file_ids.update(test_data.get_file_ids().tolist())
+
+        return [file_id for file_id in root_file_ids if file_id in file_ids], train_splits
+
+    def train(self, root_term_id, max_depth=None):
+        """
+        Trains the model of the root term and of its descendants (Up to max_depth levels below the root).
+        Terms without children or already trained are skipped (With incremental training, the trained ones
+        with new files are updated).
+
+        :return: Term ids of the trained or updated models
+        """
+        branch = self.get_branch_term_ids(root_term_id, max_depth)
+        to_train = [
+            term_id for term_id, depth in branch
+            if self.thesaurus.get_by_id(term_id).get_children() and (self.incremental.enabled or not self.is_trained(term_id))
+        ]
+        if not to_train:
+            self.log.info(f"Every model of the branch {root_term_id} is already trained")
+            return []
+
+        # The files of every term of the branch in a single lookup. The files of the root are the corpus
+        labels = { child_id for term_id in to_train for child_id in self.thesaurus.get_by_id(term_id).get_children() }
+        file_ids_by_term = self.corpus_source.get_file_ids_by_term_ids(sorted(labels | { root_term_id }))
+        to_train = [term_id for term_id in to_train if not self.is_trained(term_id) or self.needs_update(term_id, file_ids_by_term)]
+        if not to_train:
+            self.log.info(f"Every model of the branch {root_term_id} is up to date")
+            return []
+
+        root_file_ids = file_ids_by_term[root_term_id]
+        corpus_file_ids, train_splits = self.get_corpus_file_ids(to_train, file_ids_by_term, root_file_ids)
+        self.log.info(f"Branch {root_term_id}: {len(to_train)} models, {len(corpus_file_ids)} of {len(root_file_ids)} files")
+
+        # Only the tokenizer is used, so a pipeline created from the same config is enough
+        nlp = load_model_from_config(load_config(self.config_path))
+        trained = []
+        with tempfile.TemporaryDirectory(prefix="corpus_cache_") as cache_dir:
+            corpus = TokenizedCorpus(nlp, cache_dir, self.chunk_size).build(corpus_file_ids, self.input_creator)
+            print(f"Corpus of the branch {root_term_id}: {corpus.get_size()} files", flush=True)
+            positions_by_term = { term_id: corpus.get_positions(file_ids) for term_id, file_ids in file_ids_by_term.items() }
+
+            for term_id in to_train:
+                children = self.thesaurus.get_by_id(term_id).get_children()
+                training_data = TrainingDataset.from_positions_by_label(children, corpus.get_file_ids(), positions_by_term)
+
+                self.log.info(f"---------------------------------")
+                self.log.info(f"Started training for term ID: {term_id} ({training_data.get_size()} files)")
+                print(f"Files for the term {term_id}: {training_data.get_size()}", flush=True)
+
+                term_trainer = TermTrainer(
+                    self.thesaurus, self.database, config_path=self.config_path, chunk_size=self.chunk_size,
+                    corpus_source=self.corpus_source, epochs=self.epochs, tokenized_corpus=corpus,
+                    sampling=self.sampling, warm_start=self.warm_start, incremental=self.incremental
+                )
+                # The corpus may only have some of the files of the term, the manifest of the model has all of them
+                dataset_file_ids = TrainingDataset.from_file_ids_by_label(children, file_ids_by_term).get_file_ids()
+                train_split = train_splits[term_id].to_view(corpus.get_file_ids()) if term_id in train_splits else None
+                if self.is_trained(term_id):
+                    term_trainer.update_group(term_id, children, self.input_creator, training_data, dataset_file_ids, train_split)
+                else:
+                    term_trainer.train_group(term_id, children, self.input_creator, training_data, dataset_file_ids, train_split)
+                trained.append(term_id)
+                del term_trainer
+
+        return trained
@@ -1,12 +1,19 @@
+import logging
 from Database.File import File
+from Corpus.DatabaseCorpusSource import DatabaseCorpusSource
+
+log = logging.getLogger('my_logger')
 
 class AbstractInputCreator:
-    def __init__(self, database = None):
-        self.folder_name = 'abstract'
+    folder_name = 'abstract'
+
+    def __init__(self, database = None, corpus_source = None):
         
         # Database connection
         self.database = database
         self.file_db = File(database)
+        # Source of the texts used for training (The database, or an exported corpus)
+        self.corpus_source = corpus_source or DatabaseCorpusSource(database)
 
     def get_folder_name(self):
         return self.folder_name
@@ -16,6 +23,11 @@ class AbstractInputCreator:
             return self.file_db.get_abstract_by_file_id(file_id)
         except:
             print("Error trying to load file with path: ", file_id)
-    
-        
-    
\ No newline at end of file
+
+    def get_files_data_input(self, file_ids):
+        # A failed fetch is raised, so its files aren't taken as files without text
+        try:
+            return self.corpus_source.get_texts_by_file_ids("abstract", file_ids)
+        except Exception as e:
+            log.error(f"Error trying to load the files {file_ids[:5]} ({len(file_ids)} files): {e}")
+            raise
@@ -1,23 +1,32 @@
+import logging
 from Database.File import File
+from Corpus.DatabaseCorpusSource import DatabaseCorpusSource
 import spacy
 from spacy.lang.en.stop_words import STOP_WORDS
 from string import punctuation
 from heapq import nlargest
 from collections import Counter
 from utils.articles_parser import clean_summarized_text
+from utils.instrumentation import instrumented
+
+log = logging.getLogger('my_logger')
 
 class SummarizeInputCreator:
-    def __init__(self, database = None):
-        self.folder_name = 'summarize'
+    folder_name = 'summarize'
+
+    def __init__(self, database = None, corpus_source = None):
         self.nlp = spacy.load('en_core_web_md')
 
         # Database connection
         self.database = database
         self.file_db = File(database)
+        # Source of the texts used for training (The database, or an exported corpus)
+        self.corpus_source = corpus_source or DatabaseCorpusSource(database)
 
     def get_folder_name(self):
         return self.folder_name
     
+    @instrumented("summarization.summarize_text")
     def summarize_text(self, text, percentage=0.15, max_sentences=10, additional_stopwords=None):
         """
         Summarizes a scientific article, ensuring clarity, conciseness, and coherent starting points.
@@ -125,4 +134,12 @@ class SummarizeInputCreator:
             summarized_text = self.file_db.get_summarized_text_by_file_id(file_id)
             return summarized_text
         except:
-            print("Error trying to load file with path: ", file_id)
\ No newline at end of file
+            print("Error trying to load file with path: ", file_id)
+
+    def get_files_data_input(self, file_ids):
+        # A failed fetch is raised, so its files aren't taken as files without text
+        try:
+            return self.corpus_source.get_texts_by_file_ids("summarized_text", file_ids)
+        except Exception as e:
+            log.error(f"Error trying to load the files {file_ids[:5]} ({len(file_ids)} files): {e}")
+            raise
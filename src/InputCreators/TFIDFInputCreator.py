@@ -2,11 +2,11 @@ from Database.File import File
 from utils.articles_parser import get_tf_idf_words_from_file
 
 class TFIDFInputCreator:
+    folder_name = 'tf-idf'
 
-    def __init__(self, database = None):
+    def __init__(self, database = None, corpus_source = None):
         self.COMMON_WORDS = ['et', 'al', 'in', 'be', 'at', 'has', 'that', 'can', 'was', 'its', 'both', 'may', 'we', 'not', 'will', 'or', 'it', 'they', 'than', 'these', 'however', 'co', 'from', 'an', 'ah', 'for', "by", "would", "also", "to", 'and', 'the', 'this', "of", "the", "on", "as", "with", "our", "are", "is"]
         self.keywords_by_word = []
-        self.folder_name = 'tf-idf'
 
         # Database connection
         self.database = database
@@ -26,18 +26,20 @@ class TFIDFInputCreator:
     def create_input_arrays(self, files_input, keywords):
         texts = []
         keywords_by_text = []
+        # The texts already added, to drop the duplicates without searching the list
+        seen_texts = set()
         # self.parse_keywords(keywords)
 
         for file_path, file_input in files_input.items():
             try:
                 text_modified = get_tf_idf_words_from_file(file_path, self.keywords_by_word)
                 
-                if text_modified[0] not in texts:
+                if text_modified[0] not in seen_texts:
+                    seen_texts.add(text_modified[0])
                     texts.append(text_modified[0])
                     keywords_by_text.append(file_input)
             except:
                 print("Error trying to load file with path: ", file_path)
 
-        # TODO: Delete duplicates from texts, keep consistency in keywords_by_text
         return texts, keywords_by_text
     
\ No newline at end of file
@@ -1,18 +1,28 @@
 import os
 import spacy
+import shutil
 import random
 import logging
+import tempfile
 from spacy.util import load_config, load_model_from_config
-from sklearn.model_selection import train_test_split
 from spacy.training import Example
 from spacy.tokens import DocBin
 from spacy.pipeline.textcat_multilabel import Config
 
-from Database.Keyword import Keyword
-from models.FileInputData import FileInputData
+from Corpus.DatabaseCorpusSource import DatabaseCorpusSource
+from models.TrainingDataset import TrainingDataset
+from models.TrainingManifest import TrainingManifest
+from utils import instrumentation
+from utils.training_sampling import NO_SAMPLING
+from utils.warm_start import NO_WARM_START
+from utils.incremental_training import NO_INCREMENTAL
+
+def get_models_folder(folder_name):
+    """Folder of the models trained with an input creator (Its folder name)."""
+    return f"./models/{folder_name}"
 
 class TermTrainer:
-    def __init__(self, thesaurus, database, config_path="config.cfg"):
+    def __init__(self, thesaurus, database, config_path="config.cfg", chunk_size=256, corpus_source=None, epochs=30, tokenized_corpus=None, sampling=NO_SAMPLING, warm_start=NO_WARM_START, incremental=NO_INCREMENTAL):
         """
         Initializes the TermTrainer class by loading an existing spaCy model and
         setting up the thesaurus and database.
@@ -20,119 +30,217 @@ class TermTrainer:
         :param thesaurus: Object that contains terms and their relationships
         :param database: Database connection to retrieve keywords and store results
         :param config_path: The path to the spaCy configuration file
+        :param chunk_size: Quantity of texts fetched from the database and tokenized at a time
+        :param corpus_source: Source of the files of each term (The database by default, or an exported corpus)
+        :param epochs: Quantity of epochs of the training
+        :param tokenized_corpus: TokenizedCorpus already loaded (By HierarchyTrainer). The datasets are views of it,
+        so the texts are not fetched nor tokenized again
+        :param sampling: TrainingSampling of the train split (Caps the files of each child and subsamples the negatives)
+        :param warm_start: WarmStart of the model from the saved model of a parent term
+        :param incremental: IncrementalTraining of the models that already exist (Updated with the files added since they were saved)
         """
         self.thesaurus = thesaurus
         self.database = database
         config = load_config(config_path)
         self.nlp = load_model_from_config(config)
+        self.chunk_size = chunk_size
+        self.corpus_source = corpus_source or DatabaseCorpusSource(database)
+        self.epochs = epochs
+        self.tokenized_corpus = tokenized_corpus
+        self.sampling = sampling
+        self.warm_start = warm_start
+        self.incremental = incremental
         # self.nlp = spacy.blank('en')
 
         # Quantity of models created
         self.models_created = 0
+        # Scores of the last evaluation (test_model)
+        self.test_scores = None
         
         # Logging, change log level if needed
         logging.basicConfig(filename='logs/trainer.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
         self.log = logging.getLogger('my_logger')
 
-    def train_group(self, term_id, children, input_creator):
+    def train_group(self, term_id, children, input_creator, training_data=None, dataset_file_ids=None, train_split=None):
         """
         Trains a spaCy model for a group of terms.
         :param term_id: ID of the term for which the model is being trained
         :param children: List of term objects that are children of the term
         :param input_creator: Input creator responsible for generating data for training
+        :param training_data: TrainingDataset already prepared (e.g. a view of the tokenized corpus)
+        :param dataset_file_ids: Every file of the term, saved in the manifest of the model (The files of training_data by default,
+        a view of the corpus may not have all of them)
+        :param train_split: Train split already sampled on all the files of the term (By HierarchyTrainer), so it isn't sampled again
+        on a view of the corpus that has the files of other terms
         """
-        # Prepare training data (training_data: { 'file_path': FileInputData(file_categories , text_input) })
-        training_data = self.prepare_training_data(children, input_creator)
-
-        if training_data:
-            first_file_path = next(iter(training_data))  # Obtener la primera clave del diccionario
-            first_file_data = training_data[first_file_path]  # Obtener el valor correspondiente
-            print(f"Text input for the first file: {first_file_data.get_text_input()}", flush=True)
+        # Prepare training data (Only file ids and their categories, the texts are fetched lazily)
+        if training_data is None:
+            training_data = self.prepare_training_data(children, input_creator)
+        print(f"Files for the term {term_id}: {training_data.get_size()}", flush=True)
 
         # Split data into train and test sets
         train_data, test_data = self.split_data(training_data)
+        train_data = self.sampling.apply(term_id, train_data) if train_split is None else train_split
 
-        # Train the model with the training data
-        self.train(train_data, children)
+        # Train the model with the training data (Starting from the model of the parent term if there's one)
+        parent_model_path = self.warm_start.get_parent_model_path(self.thesaurus, term_id, input_creator.get_folder_name())
+        self.train(train_data, children, input_creator, parent_model_path)
         print("Model trained", flush=True)
         # Evaluate the model using the test set
-        accuracy = self.test_model(test_data)
+        accuracy = self.test_model(test_data, input_creator)
         print(f"Model accuracy: {accuracy}")
         self.log.info(f"Model accuracy: {accuracy}")
 
-        # Saved trained model
-        self.save_trained_model(term_id, input_creator.get_folder_name())
+        # Saved trained model, with the files of its dataset
+        self.save_trained_model(term_id, input_creator.get_folder_name(), TrainingManifest(children, training_data.get_file_ids() if dataset_file_ids is None else dataset_file_ids))
 
         # Chequear como hacer si el modelo no tiene ninguna categoria con "1"
         # if len(keywords_by_text):
         #     self.generate_model_for_group_of_terms(texts, keywords_by_text, term_id, training_input_creator)
         #     self.models_created += 1
     
+    def update_group(self, term_id, children, input_creator, training_data=None, dataset_file_ids=None, train_split=None):
+        """
+        Updates the saved model of a term with the files added since it was trained (See IncrementalTraining).
+        If the children of the term changed, the model is trained again from scratch.
+
+        :param training_data: TrainingDataset already prepared (e.g. a view of the tokenized corpus)
+        :param dataset_file_ids: Every file of the term, added to the manifest of the model (The files of training_data by default)
+        :param train_split: Train split already prepared on all the files of the term (By HierarchyTrainer): the files of the update,
+        or the sampled train split if the model is trained again
+        :return: True if the model was updated or trained again
+        """
+        model_path = self.get_model_path(term_id, input_creator.get_folder_name())
+        manifest = TrainingManifest.from_disk(model_path)
+        if manifest is None:
+            self.log.info(f"Model for term {term_id} has no manifest of its files, it can't be updated (Remove it to train it again)")
+            return False
+        if not manifest.has_labels(children):
+            self.log.info(f"The children of the term {term_id} changed, training the model again")
+            self.train_group(term_id, children, input_creator, training_data, dataset_file_ids, train_split)
+            return True
+
+        if training_data is None:
+            training_data = self.prepare_training_data(children, input_creator)
+        train_data, test_data = self.split_data(training_data)
+        if train_split is None:
+            update_data, new_files = self.incremental.get_update_data(manifest, train_data)
+        else:
+            update_data, new_files = train_split, len(self.incremental.get_new_positions(manifest, train_split))
+        if new_files == 0:
+            self.log.info(f"Model for term {term_id} is up to date")
+            return False
+
+        print(f"Updating the model of the term {term_id} with {new_files} new files ({update_data.get_size() - new_files} rehearsed)", flush=True)
+        self.log.info(f"Updating the model of the term {term_id} with {new_files} new files ({update_data.get_size() - new_files} rehearsed)")
+        self.nlp = spacy.load(model_path)
+        self.update(update_data, input_creator)
+        accuracy = self.test_model(test_data, input_creator)
+        print(f"Model accuracy: {accuracy}")
+        self.log.info(f"Model accuracy: {accuracy}")
+
+        manifest.add_file_ids(training_data.get_file_ids() if dataset_file_ids is None else dataset_file_ids)
+        self.save_trained_model(term_id, input_creator.get_folder_name(), manifest)
+        return True
+
     def split_data(self, training_data):
         """
-        Splits the training data into training and testing sets.
+        Splits the training data into training and testing sets (Deterministic, by file id hash).
         """
-        file_paths = list(training_data.keys())
-        train_paths, test_paths = train_test_split(file_paths, test_size=0.15, random_state=42)
-        
-        train_data = {fp: training_data[fp] for fp in train_paths}
-        test_data = {fp: training_data[fp] for fp in test_paths}
-        
-        return train_data, test_data
+        return training_data.split(test_size=0.15)
     
     def prepare_training_data(self, children, training_input_creator):
-        keyword_table_db = Keyword(self.database)
-        # training_files_input: { 'file_path': FileInputData(file_categories , text_input) }. The categories dictionaty of 0s and 1s represents the keywords for the file
-        # file_categories: {'102': 0, '1129': 0, '1393': 0, '661': 1}
-        # text_input: "e.g. abstract from an article"
-        training_files_input = {}
+        # training_data: TrainingDataset with the file ids and a label matrix (files x children) of 0s and 1s
+        # A row is expanded to the categories dictionary only at the spaCy boundary: {'102': 0, '1129': 0, '1393': 0, '661': 1}
+        file_ids_by_child = {}
 
         for child in children:
-            # Get all children recursively from the child term (To associate all child files to the term child)
-            term_children = self.thesaurus.get_branch_children(child)
-            term_children_ids = [term.get_id() for term in term_children]
-            term_children_ids.insert(0, child)
-
-            files_paths = keyword_table_db.get_file_ids_by_keyword_ids(term_children_ids)
-            self.log.info(f"Child: {child} has {len(term_children_ids)} children and {len(files_paths)} files")
-            for file_path in files_paths:
-                # If the file_path is not in files_input dictionary, creates a new item with the path as the key and an input array filled with 0s
-                if file_path not in training_files_input:
-                    file_categories = { child: 0 for child in children }
-                    text_input = training_input_creator.get_file_data_input(file_path)
-                    training_files_input[file_path] = FileInputData(file_categories, text_input)
-                
-                # Set the child as category with 1 insted of 0
-                training_files_input[file_path].set_category(child)
-
-        return training_files_input
-
-    def test_model(self, test_data):
+            # The term -> files index already associates every file of the branch to the child term
+            files_paths = self.corpus_source.get_file_ids_by_term_id(child)
+            self.log.info(f"Child: {child} has {len(files_paths)} files")
+            file_ids_by_child[child] = files_paths
+
+        training_data = TrainingDataset.from_file_ids_by_label(children, file_ids_by_child)
+
+        for child, (positives, positive_rate) in training_data.get_label_statistics().items():
+            self.log.info(f"Child: {child} is positive in {positives} files ({positive_rate:.2%})")
+
+        return training_data
+
+    def test_model(self, test_data, input_creator):
         """
         Evaluates the model on the test set and returns the accuracy.
         """
         examples = []
-        for _, file_input_data in test_data.items():
-            text_input = file_input_data.get_text_input()
-            categories = file_input_data.get_categories()
-            doc = self.nlp.make_doc(text_input)
-            example = Example.from_dict(doc, {"cats": categories})
-            examples.append(example)
+        if self.tokenized_corpus is not None:
+            for docs, categories_list in self.tokenized_corpus.iter_chunks(test_data, self.nlp.vocab, self.chunk_size):
+                for doc, categories in zip(docs, categories_list):
+                    examples.append(Example.from_dict(doc, {"cats": categories}))
+        else:
+            for texts, categories_list in test_data.iter_chunks(input_creator, self.chunk_size):
+                with instrumentation.span("training.test_tokenize"):
+                    for doc, categories in zip(self.nlp.pipe(texts), categories_list):
+                        examples.append(Example.from_dict(doc, {"cats": categories}))
 
-        scorer = self.nlp.evaluate(examples)
+        with instrumentation.span("training.evaluate"):
+            scorer = self.nlp.evaluate(examples)
+        self.test_scores = scorer
 
         for key, value in scorer.items():
             print(f"{key}: {value}")
             self.log.info(f"{key}: {value}")
 
+        # The recall of each child on the test split, to see what the sampling of the training files costs
+        statistics = test_data.get_label_statistics()
+        for label, scores in (scorer.get("cats_f_per_type") or {}).items():
+            positives = statistics.get(label, (0, 0))[0]
+            print(f"Child {label}: recall {scores['r']:.3f}, precision {scores['p']:.3f} ({positives} positives in the test split)")
+            self.log.info(f"Child {label}: recall {scores['r']:.3f}, precision {scores['p']:.3f} ({positives} positives in the test split)")
+
         return scorer["cats_score"]  # Return the accuracy of the model
 
-    def train(self, train_data, categories):
+    def tokenize_to_cache(self, train_data, input_creator, cache_dir):
+        """
+        Tokenizes the training data chunk by chunk and saves each chunk as a DocBin in the cache folder,
+        so the texts are fetched and tokenized only once and the epochs read the docs from disk.
+
+        :return: List of paths of the DocBin files
+        """
+        chunk_paths = []
+        total_docs = 0
+        for docs, categories_list in self.iter_training_docs(train_data, input_creator):
+            doc_bin = DocBin(store_user_data=True)
+            with instrumentation.span("training.tokenize"):
+                for doc, categories in zip(docs, categories_list):
+                    doc.cats = categories  # Assign categories to the doc
+                    doc_bin.add(doc)  # Add the doc to the DocBin
+
+            chunk_path = os.path.join(cache_dir, f"chunk_{len(chunk_paths)}.spacy")
+            with instrumentation.span("training.cache_write"):
+                doc_bin.to_disk(chunk_path)
+            chunk_paths.append(chunk_path)
+            total_docs += len(doc_bin)
+
+        print(f"Total documents: {total_docs}", flush=True)
+        return chunk_paths
+
+    def iter_training_docs(self, train_data, input_creator):
+        """Yields the docs of the training data in chunks of (docs, categories), from the tokenized corpus if there's one."""
+        if self.tokenized_corpus is not None:
+            yield from self.tokenized_corpus.iter_chunks(train_data, self.nlp.vocab, self.chunk_size)
+            return
+
+        for texts, categories_list in train_data.iter_chunks(input_creator, self.chunk_size):
+            yield self.nlp.pipe(texts), categories_list
+
+    def train(self, train_data, categories, input_creator, parent_model_path=None):
         """
         Fine-tunes the existing spaCy model by updating it with new training data.
 
-        :param examples: List of Example objects containing the training data (text and annotations)
-        :param model_output: Path where the fine-tuned model will be saved
+        :param train_data: TrainingDataset with the files used for training
+        :param categories: List of categories (term ids) of the model
+        :param input_creator: Input creator used to fetch the texts of the training files
+        :param parent_model_path: Saved model of the parent term, its tok2vec is the start of this one (See WarmStart)
         """
         # Get or add the 'textcat_multilabel' component for multilabel text classification
         if "textcat_multilabel" not in self.nlp.pipe_names:
@@ -147,53 +255,79 @@ class TermTrainer:
                 textcat.add_label(category)
 
         optimizer = self.nlp.initialize()
+        epochs = self.epochs
+        if parent_model_path is not None:
+            optimizer = self.warm_start.apply(self.nlp, parent_model_path, optimizer)
+            epochs = self.warm_start.epochs or self.epochs
 
         print("PIPELINE: ", self.nlp.pipe_names)
+        self.train_epochs(train_data, input_creator, optimizer, epochs)
 
-        doc_bin = DocBin(store_user_data=True)
-        texts = [file_input_data.get_text_input() for _, file_input_data in train_data.items()]
-        categories_list = [file_input_data.get_categories() for _, file_input_data in train_data.items()]
-
-        # Batch processing the texts
-        for doc, categories in zip(self.nlp.pipe(texts), categories_list):
-            doc.cats = categories  # Assign categories to the doc
-            doc_bin.add(doc)  # Add the doc to the DocBin
-
-        print(f"Total documents: {len(doc_bin)}", flush=True)
-        print(f"---------------------------", flush=True)
-    
-        # Train the model for a specified number of epochs
-        # optimizer = self.nlp.resume_training() # Inicializa correctamente el optimizador
-        batch_size = 128
-        for i in range(30):  # Adjust necessary epochs
-            try: 
-                print("Starting epoch: ", i + 1, flush=True)
-                losses = {}
+    def update(self, update_data, input_creator):
+        """
+        Resumes the training of the loaded model (The optimizer starts from its current weights) with the update data.
+        """
+        optimizer = self.nlp.resume_training()
+        self.train_epochs(update_data, input_creator, optimizer, self.incremental.epochs)
+
+    def train_epochs(self, train_data, input_creator, optimizer, epochs):
+        """Tokenizes the training data to a cache and trains the pipeline with it for the given epochs."""
+        with tempfile.TemporaryDirectory(prefix="docs_cache_") as cache_dir:
+            chunk_paths = self.tokenize_to_cache(train_data, input_creator, cache_dir)
+            print(f"---------------------------", flush=True)
         
-                docs = list(doc_bin.get_docs(self.nlp.vocab))
-                random.shuffle(docs)
-                
-                for batch_start in range(0, len(docs), batch_size):
-                    batch_docs = docs[batch_start:batch_start + batch_size]
-                    examples = [Example.from_dict(doc, {"cats": doc.cats}) for doc in batch_docs]
+            # Train the model for a specified number of epochs
+            batch_size = 128
+            for i in range(epochs):
+                try: 
+                    print("Starting epoch: ", i + 1, flush=True)
+                    losses = {}
+
+                    # Only one chunk of docs is loaded at a time, the chunks and the docs inside them are shuffled
+                    random.shuffle(chunk_paths)
+                    for chunk_path in chunk_paths:
+                        with instrumentation.span("training.cache_read"):
+                            docs = list(DocBin().from_disk(chunk_path).get_docs(self.nlp.vocab))
+                        random.shuffle(docs)
                     
-                    try:
-                        self.nlp.update(examples, sgd=optimizer, losses=losses)
-                    except Exception as e:
-                        print("Error en la actualización:", e, flush=True)
-                
-                print(f"Epoch {i + 1} - Losses: {losses}", flush=True)
-            except Exception as e:
-                print("Error: ", e, flush=True)
-                continue
-
-    def save_trained_model(self, term_id, folder_name):
+                        for batch_start in range(0, len(docs), batch_size):
+                            batch_docs = docs[batch_start:batch_start + batch_size]
+                            # The cats were set once when tokenizing, so the doc is its own reference
+                            examples = [Example(doc, doc) for doc in batch_docs]
+                            
+                            try:
+                                with instrumentation.span("training.update"):
+                                    self.nlp.update(examples, sgd=optimizer, losses=losses)
+                                instrumentation.count("training.updated_docs", len(examples))
+                            except Exception as e:
+                                print("Error en la actualización:", e, flush=True)
+                    
+                    print(f"Epoch {i + 1} - Losses: {losses}", flush=True)
+                except Exception as e:
+                    print("Error: ", e, flush=True)
+                    continue
+
+    def get_model_path(self, term_id, folder_name):
+        return f"{get_models_folder(folder_name)}/{term_id}"
+
+    def save_trained_model(self, term_id, folder_name, manifest=None):
         # Create folder if it doesn't exist
         if not os.path.exists('./models/' + folder_name):
             os.makedirs('./models/' +  folder_name)
 
-        model_save_path = f"./models/{folder_name}/{term_id}"
-        self.nlp.to_disk(model_save_path)
+        # Written next to its folder and renamed, so a worker of another node (Shared models folder) never reads it half written
+        model_save_path = self.get_model_path(term_id, folder_name)
+        temp_path = f"{model_save_path}.tmp-{os.getpid()}"
+        self.nlp.to_disk(temp_path)
+        if manifest is not None:
+            manifest.to_disk(temp_path)
+        if os.path.exists(model_save_path):
+            old_path = f"{model_save_path}.old-{os.getpid()}"
+            os.rename(model_save_path, old_path)
+            os.rename(temp_path, model_save_path)
+            shutil.rmtree(old_path)
+        else:
+            os.rename(temp_path, model_save_path)
 
         self.log.info(f"Model saved at: {model_save_path}")
 
@@ -224,6 +358,8 @@ class TermTrainer:
             self.log.info(f"Term {term_id} has no children")
             return
         
-        # Train the model if it hasn't been trained yet
+        # Train the model if it hasn't been trained yet, or update it with the new files
         if (not term_is_trained):
-            self.train_group(term_id, term_children, input_creator)
\ No newline at end of file
+            self.train_group(term_id, term_children, input_creator)
+        elif self.incremental.enabled:
+            self.update_group(term_id, term_children, input_creator)
\ No newline at end of file
@@ -1,29 +1,55 @@
 import gc
 import json
 import os
-from TermTrainer import TermTrainer
+from TermTrainer import TermTrainer, get_models_folder
+from HierarchyTrainer import HierarchyTrainer
 
 from InputCreators.NormalInputCreator import NormalInputCreator
 from InputCreators.AbstractInputCreator import AbstractInputCreator
 from InputCreators.TFIDFInputCreator import TFIDFInputCreator
 from InputCreators.SummarizeInputCreator import SummarizeInputCreator
+from utils.training_sampling import NO_SAMPLING
+from utils.warm_start import NO_WARM_START
+from utils.incremental_training import NO_INCREMENTAL
+
+# Input creators of the models trained (A model per term for each one)
+INPUT_CREATORS = [
+    # NormalInputCreator,
+    # TFIDFInputCreator,
+    # AbstractInputCreator
+    SummarizeInputCreator
+]
+
+def get_models_folders():
+    """Folders of the models of the input creators, without loading them (As TermTrainer.get_model_path builds the paths)."""
+    return [get_models_folder(input_creator.folder_name) for input_creator in INPUT_CREATORS]
 
 class Trainer:
-    def __init__(self, thesaurus, database):
+    def __init__(self, thesaurus, database, corpus_source=None, sampling=NO_SAMPLING, warm_start=NO_WARM_START, incremental=NO_INCREMENTAL):
         self.thesaurus = thesaurus
         self.database = database
-        self.input_creators = [
-            # NormalInputCreator(), 
-            # TFIDFInputCreator(database), 
-            # AbstractInputCreator(database)
-            SummarizeInputCreator(database)
-        ]
+        self.corpus_source = corpus_source
+        self.sampling = sampling
+        self.warm_start = warm_start
+        self.incremental = incremental
+        self.input_creators = [input_creator(database, corpus_source) for input_creator in INPUT_CREATORS]
 
     # Entrypoint method
     def train_by_term_id(self, term_id):
         for input_creator in self.input_creators:
-            term_trainer = TermTrainer(self.thesaurus, self.database)
+            term_trainer = TermTrainer(self.thesaurus, self.database, corpus_source=self.corpus_source, sampling=self.sampling, warm_start=self.warm_start, incremental=self.incremental)
             term_trainer.train_model(term_id, input_creator)
 
             del term_trainer
             gc.collect()
+
+    def train_branch(self, root_term_id, max_depth=None):
+        """Trains the models of the branch of the root term, fetching and tokenizing its files only once (See HierarchyTrainer)."""
+        for input_creator in self.input_creators:
+            hierarchy_trainer = HierarchyTrainer(self.thesaurus, self.database, input_creator, corpus_source=self.corpus_source, sampling=self.sampling, warm_start=self.warm_start,
+                incremental=self.incremental
+            )
+            hierarchy_trainer.train(root_term_id, max_depth)
+
+            del hierarchy_trainer
+            gc.collect()
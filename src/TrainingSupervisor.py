@@ -0,0 +1,186 @@
+import gc
+import os
+import time
+import queue
+import logging
+import multiprocessing
+import psutil
+from datetime import datetime
+
+from utils import instrumentation
+from utils.memory_guard import MemoryMonitor, get_rss_mb, write_memory_report
+
+log = logging.getLogger('my_logger')
+
+def create_trainer():
+    """
+    Creates the Trainer from the environment. The training data is read from the database,
+    or from the corpus exported with MODE=export (No database needed).
+
+    :return: (trainer, database), database is None when training from the corpus
+    """
+    from dotenv import load_dotenv
+    from Trainer import Trainer
+    from UATMapper import UATMapper
+    from Database.Database import Database, get_pool_config_from_env
+    from Corpus.ArrowCorpusSource import ArrowCorpusSource
+    from utils.training_sampling import get_training_sampling_from_env
+    from utils.warm_start import get_warm_start_from_env
+    from utils.incremental_training import get_incremental_training_from_env
+
+    load_dotenv() # Load environment variables
+    database = None
+    corpus_source = None
+    if os.getenv('TRAINING_SOURCE') == "corpus":
+        corpus_source = ArrowCorpusSource(os.getenv('CORPUS_PATH', './data/corpus'))
+    else:
+        database = Database(os.getenv('DB_URL'), **get_pool_config_from_env())
+        database.init_db()
+
+    # This term (modified a bit on the json) has 11 children that covers the whole thesaurus
+    mapper = UATMapper("./data/UAT-filtered.json")
+    thesaurus = mapper.map_to_thesaurus()
+
+    return Trainer(thesaurus, database, corpus_source, get_training_sampling_from_env(), get_warm_start_from_env(), get_incremental_training_from_env()), database
+
+def training_worker(task_queue, result_queue, max_terms, recycle_mb, soft_limit_mb, sample_seconds):
+    """
+    Runs in a worker process. Trains the terms received from the queue until it gets None,
+    or until it has to be recycled (After max_terms terms, or when its RSS reaches recycle_mb).
+    A result with the memory used is sent back for every term.
+    """
+    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+    trainer, database = create_trainer()
+    trained_terms = 0
+
+    with MemoryMonitor(soft_limit_mb=soft_limit_mb, sample_seconds=sample_seconds) as monitor:
+        while True:
+            term_id = task_queue.get()
+            if term_id is None:
+                break
+
+            monitor.reset_peak()
+            rss_start_mb = get_rss_mb()
+            start = time.perf_counter()
+            status, error = "done", None
+            try:
+                trainer.train_by_term_id(term_id)
+            except Exception as e:
+                status, error = "failed", str(e)
+
+            gc.collect()
+            monitor.sample()
+            instrumentation.write_metrics(f"train-{term_id}")
+            instrumentation.metrics.reset()
+
+            trained_terms += 1
+            rss_end_mb = get_rss_mb()
+            recycle = trained_terms >= max_terms or (recycle_mb is not None and rss_end_mb >= recycle_mb)
+            result_queue.put({
+                "term_id": term_id,
+                "status": status,
+                "error": error,
+                "seconds": time.perf_counter() - start,
+                "rss_start_mb": rss_start_mb,
+                "rss_end_mb": rss_end_mb,
+                "peak_rss_mb": monitor.peak_mb,
+                "recycle": recycle,
+            })
+            if recycle:
+                break
+
+    if database is not None:
+        database.close()
+
+class TrainingSupervisor:
+    def __init__(self, max_terms_per_worker=10, recycle_mb=None, soft_limit_mb=None, hard_limit_mb=None, sample_seconds=5, report_path='logs/memory_report.jsonl'):
+        """
+        Trains the terms in a worker process that is recycled after max_terms_per_worker terms, or when its RSS
+        reaches recycle_mb after a term. The worker RSS is sampled while it trains: over the hard limit it's killed
+        (The term is reported as killed and the next one starts in a new worker).
+
+        :param soft_limit_mb: The worker logs a warning and collects the garbage over this RSS
+        :param hard_limit_mb: The worker is killed over this RSS
+        :param report_path: File where the memory of every term is appended (One JSON per line)
+        """
+        self.max_terms_per_worker = max_terms_per_worker
+        self.recycle_mb = recycle_mb
+        self.soft_limit_mb = soft_limit_mb
+        self.hard_limit_mb = hard_limit_mb
+        self.sample_seconds = sample_seconds
+        self.report_path = report_path
+        # The worker starts from a clean interpreter (Nothing of the parent is inherited)
+        self.context = multiprocessing.get_context("spawn")
+        self.worker = None
+
+    def start_worker(self):
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        self.worker = self.context.Process(
+            target=training_worker,
+            args=(self.task_queue, self.result_queue, self.max_terms_per_worker, self.recycle_mb, self.soft_limit_mb, self.sample_seconds),
+        )
+        self.worker.start()
+        log.info(f"Started training worker {self.worker.pid}")
+
+    def stop_worker(self, kill=False):
+        if self.worker is None:
+            return
+        if kill:
+            self.worker.kill()
+        else:
+            self.task_queue.put(None)
+        self.worker.join()
+        self.worker = None
+
+    def wait_for_result(self, term_id):
+        """Waits for the result of the term, sampling the worker RSS. Returns the result, or a failure if the worker died or was killed."""
+        monitor = MemoryMonitor(hard_limit_mb=self.hard_limit_mb, pid=self.worker.pid)
+        start = time.perf_counter()
+        while True:
+            try:
+                return self.result_queue.get(timeout=self.sample_seconds)
+            except queue.Empty:
+                pass
+
+            status = None
+            if not self.worker.is_alive():
+                status = f"crashed (exit code {self.worker.exitcode})"
+            else:
+                try:
+                    monitor.sample()
+                except psutil.NoSuchProcess:
+                    continue
+                if monitor.hard_limit_exceeded:
+                    status = "killed"
+
+            if status is not None:
+                return { "term_id": term_id, "status": status, "error": None, "seconds": time.perf_counter() - start, "peak_rss_mb": monitor.peak_mb, "recycle": True }
+
+    def train(self, term_ids, stop=True):
+        """
+        Trains the terms in order. Returns the results (With the memory used) of every term.
+
+        :param stop: Stop the worker at the end. Otherwise it's kept for the next call (Until it's recycled or stop_worker is called)
+        """
+        results = []
+        for term_id in term_ids:
+            if self.worker is None:
+                self.start_worker()
+
+            self.task_queue.put(term_id)
+            result = self.wait_for_result(term_id)
+            result.update({ "date": datetime.now().isoformat(), "worker_pid": self.worker.pid })
+            write_memory_report(result, self.report_path)
+            results.append(result)
+
+            print(f"Term {term_id}: {result['status']} in {result['seconds']:.0f}s, peak RSS {result['peak_rss_mb']:.0f} MB", flush=True)
+            log.info(f"Term {term_id}: {result}")
+
+            if result["recycle"]:
+                # A worker that didn't finish the term (crashed or killed) can't be asked to stop
+                self.stop_worker(kill=result["status"] not in ("done", "failed"))
+
+        if stop:
+            self.stop_worker()
+        return results
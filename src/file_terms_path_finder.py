@@ -1,4 +1,3 @@
-import gc
 from UATMapper import UATMapper
 
 def calculate_distances(predicted_ids, original_ids):
@@ -21,7 +20,6 @@ def calculate_distances(predicted_ids, original_ids):
     return distances
 
 if __name__ == '__main__':
-    gc.set_debug(gc.DEBUG_SAVEALL)
     predicted_ids = ["104",
         "1145",
         "1476",
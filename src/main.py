@@ -1,15 +1,29 @@
-import gc
-import subprocess
-import sys
+import asyncio
 import os
-from InputCreators.SummarizeInputCreator import SummarizeInputCreator
 from dotenv import load_dotenv
 from UATMapper import UATMapper
-from Database.Database import Database
+from Database.Database import Database, get_pool_config_from_env
+from Database.AsyncDatabase import AsyncDatabase
+from Database.TermFile import TermFile
 from utils.pdfs_terms_parser import upload_data 
+from utils.summaries_regenerator import regenerate_summaries
+from utils.corpus_exporter import export_corpus
+from utils.model_packager import pack_models
+from utils.instrumentation import write_metrics
+from utils.memory_guard import get_memory_limits_from_env
+from utils.pdf_extraction import get_extraction_profile_from_env
+from utils.duplicates_indexer import index_near_duplicates
+from utils.near_duplicates import get_duplicate_threshold_from_env
+from utils.training_sampling import get_training_sampling_from_env
+from utils.warm_start import get_warm_start_from_env
+from utils.incremental_training import get_incremental_training_from_env
+from utils.thesaurus_diff import diff_thesaurus_files, invalidate_models, write_thesaurus_diff
+from TrainingSupervisor import TrainingSupervisor
+from Database.TrainingJob import TrainingJob
+from training_worker import get_branch_jobs, get_reset_term_ids, run_worker_from_env
+from Trainer import Trainer, get_models_folders
 
 if __name__ == '__main__':
-    gc.set_debug(gc.DEBUG_SAVEALL)
     os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
     
     load_dotenv() # Load environment variables
@@ -21,18 +35,27 @@ if __name__ == '__main__':
     # print("Is built with CUDA:", tf.test.is_built_with_cuda())
     # print("GPU devices:", tf.config.experimental.list_physical_devices('GPU'))
 
+    database = None
     try:
         # Initialize database
-        database = Database(db_url)
-        engine = database.get_engine()
-        connection = engine.connect()
+        database = Database(db_url, **get_pool_config_from_env())
         database.init_db()
 
         pdf_directory = "./data/PDFs"
         mapper = UATMapper("./data/UAT-filtered.json")
         thesaurus = mapper.map_to_thesaurus()
         if (mode == "generate"):
-            upload_data(pdf_directory, thesaurus, database)
+            # Files already in the ingestion ledger are skipped, so an interrupted run can be resumed
+            upload_data(
+                pdf_directory, thesaurus, database,
+                workers=int(os.getenv('INGEST_WORKERS', 1)),
+                max_attempts=int(os.getenv('INGEST_MAX_ATTEMPTS', 3)),
+                verify_hashes=os.getenv('INGEST_VERIFY_HASHES', 'false').lower() == 'true',
+                max_files_per_worker=int(os.getenv('INGEST_MAX_FILES_PER_WORKER', 0)) or None,
+                extraction=get_extraction_profile_from_env(),
+                duplicate_threshold=get_duplicate_threshold_from_env(),
+                **get_memory_limits_from_env()
+            )
         elif (mode == "train"):
             # Create a root term
             root_term = thesaurus.get_by_id("1")
@@ -46,33 +69,75 @@ if __name__ == '__main__':
             for child_id in eleven_children:
                 children.append(thesaurus.get_by_id(child_id))
             print("CHILDREN: ", children)
-        
-            for child in children:
-                process = subprocess.Popen([sys.executable, 'src/train_term.py', child.get_id()])
-                process.wait()  # Ensure the process completes before starting the next
-                gc.collect()  # Explicitly collect garbage after each process
-        elif (mode == "regenerate"):
-            all_files = database.get_all_files()
-            summarizeInputCreator = SummarizeInputCreator(database)
-            for file in all_files:
-                file_id = file["file_id"]
-                full_text = file["full_text"]
-
-                if not full_text:  # Ignorar archivos sin texto
-                    print(f"No full_text found for file_id {file_id}")
-                    continue
 
-                # Generar resumen
-                try:
-                    summary = summarizeInputCreator.summarize_text(full_text, 0.25, max_sentences=100, additional_stopwords={"specific", "unnecessary", "technical"})
-                    # Actualizar el resumen en la base de datos
-                    database.update_file_summary(file_id, summary)
-                except Exception as e:
-                    print(f"Error processing file_id {file_id}: {e}")
+            train_strategy = os.getenv('TRAIN_STRATEGY', 'terms')
+            if train_strategy == "queue":
+                # The models of the branch are queued in training_jobs, and trained by this process and the workers of any node
+                max_depth = int(os.getenv('TRAIN_MAX_DEPTH', 1))
+                jobs = get_branch_jobs(
+                    thesaurus, root_term.get_id(), max_depth if max_depth >= 0 else None,
+                    with_dependencies=get_warm_start_from_env().is_enabled()
+                )
+                # The done jobs are queued again when their model is missing or has to be updated (Or all of them with TRAIN_QUEUE_RESET)
+                reset = os.getenv('TRAIN_QUEUE_RESET', 'false').lower() == 'true' or get_reset_term_ids(
+                    jobs, get_models_folders(), get_incremental_training_from_env().enabled
+                )
+                print(f"Queued {TrainingJob(database).enqueue(jobs, reset)} of {len(jobs)} training jobs")
+                run_worker_from_env(database)
+            elif train_strategy == "hierarchy":
+                # The files of the root are tokenized once and every model of the branch trains on a view of them
+                max_depth = int(os.getenv('TRAIN_MAX_DEPTH', 1))
+                trainer = Trainer(
+                    thesaurus, database, sampling=get_training_sampling_from_env(), warm_start=get_warm_start_from_env(),
+                    incremental=get_incremental_training_from_env()
+                )
+                trainer.train_branch(root_term.get_id(), max_depth if max_depth >= 0 else None)
+            else:
+                # The terms are trained in a worker process, recycled after some terms or when its memory grows too much
+                supervisor = TrainingSupervisor(
+                    max_terms_per_worker=int(os.getenv('TRAIN_MAX_TERMS_PER_WORKER', 10)),
+                    recycle_mb=float(os.getenv('TRAIN_RECYCLE_MB', 0)) or None,
+                    **get_memory_limits_from_env()
+                )
+                supervisor.train([child.get_id() for child in children])
+        elif (mode == "regenerate"):
+            # The summaries are generated in worker processes while the next texts are read from the database
+            async_database = AsyncDatabase(db_url, **get_pool_config_from_env())
+            workers = int(os.getenv('REGENERATE_WORKERS', 1))
+            asyncio.run(regenerate_summaries(async_database, workers=workers))
+        elif (mode == "export"):
+            # Snapshot of the corpus to train without a database (TRAINING_SOURCE=corpus)
+            export_corpus(database, thesaurus, os.getenv('CORPUS_PATH', './data/corpus'))
+        elif (mode == "pack"):
+            # Single copy of the vocab, tokenizer and config of the trained models, and their weights memory-mapped
+            models_folder = os.getenv('MODELS_FOLDER', './models/summarize')
+            print(pack_models(models_folder, os.getenv('PACKED_MODELS_FOLDER', models_folder + '-packed'), os.getenv('MODEL_WEIGHTS_DTYPE', 'float16')))
+        elif (mode == "index"):
+            # Rebuild the term -> files table from the keywords table (e.g. after importing a dump)
+            if not TermFile(database, thesaurus).rebuild():
+                print("The term files couldn't be rebuilt, the table was left as it was")
+        elif (mode == "dedupe"):
+            # Near-duplicate detection of the files ingested before it existed (The generate option does it on its own)
+            duplicate_threshold = get_duplicate_threshold_from_env()
+            if duplicate_threshold is None:
+                print("The near-duplicate detection is disabled (NEAR_DUPLICATE_THRESHOLD)")
+            else:
+                print(index_near_duplicates(database, duplicate_threshold))
+        elif (mode == "thesaurus-diff"):
+            # Models made stale by a new version of the thesaurus (Moved aside to train them again with THESAURUS_DIFF_INVALIDATE)
+            diff = diff_thesaurus_files(os.getenv('THESAURUS_OLD_PATH'), "./data/UAT-filtered.json")
+            print({ key: len(term_ids) for key, term_ids in diff.to_dict().items() })
+            print(f"Diff saved in {write_thesaurus_diff(diff, os.getenv('THESAURUS_DIFF_PATH', './logs/thesaurus_diff.json'))}")
+            if os.getenv('THESAURUS_DIFF_INVALIDATE', 'false').lower() == 'true':
+                for models_folder in get_models_folders():
+                    moved = invalidate_models(diff.get_stale_models() + diff.get_obsolete_models(), models_folder)
+                    print(f"{len(moved)} models moved to {models_folder}-stale")
         else:
             print("Invalid mode")
-        
-        connection.close()
     except Exception as e:
         print(f"Database connection failed: {e}")
-        connection.close()
+    finally:
+        if database is not None:
+            database.close()
+        # Timings of the run (Each trained term writes its own ones)
+        print(f"Metrics saved in {write_metrics(mode or 'unknown')}")
@@ -0,0 +1,71 @@
+import numpy as np
+
+# Values of the AAS journals (ApJ, AJ, ApJS) that can't be measured from the document, used as they are
+AAS_METADATA_SIZES = (5.977700233459473, 7.970200061798096, 6.339683532714844)
+AAS_SMALL_REFERENCE_SIZE = 7.044162273406982
+AAS_LINK_COLOR = 255
+
+def get_histogram(values, weights):
+    """{ value: sum of the weights of the value }, sorted by value."""
+    unique_values, inverse = np.unique(values, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=weights, minlength=len(unique_values))
+    return { value.item(): float(total) for value, total in zip(unique_values, totals) }
+
+def get_most_common(histogram, default=None):
+    return max(histogram, key=histogram.get) if histogram else default
+
+class DocumentLayoutProfile:
+    def __init__(self, size_histogram, font_histogram, body_size, body_font_id, text_color, title_size, link_color,
+                 metadata_sizes=AAS_METADATA_SIZES, small_reference_size=AAS_SMALL_REFERENCE_SIZE):
+        """
+        Layout of a document (Sizes, fonts and colors of its template), computed once from all of its spans
+        and used by every cleaning rule of the parser instead of the constants of a single journal.
+
+        :param size_histogram: { size: characters with that size }
+        :param font_histogram: { font id: characters with that font } (Ids of the FontTable of the spans)
+        :param body_size: Size of the text (The one with the most characters)
+        :param body_font_id: Font of the text (The one with the most characters)
+        :param text_color: Color of the text (The one with the most characters)
+        :param title_size: Size of the title (None if it wasn't found)
+        :param link_color: Color of the links (URLs and references)
+        :param metadata_sizes: Sizes of the header, footer and footnotes
+        :param small_reference_size: Size of the references to the footnotes
+        """
+        self.size_histogram = size_histogram
+        self.font_histogram = font_histogram
+        self.body_size = body_size
+        self.body_font_id = body_font_id
+        self.text_color = text_color
+        self.title_size = title_size
+        self.link_color = link_color
+        self.metadata_sizes = tuple(metadata_sizes)
+        self.small_reference_size = small_reference_size
+
+    @classmethod
+    def from_pages(cls, pages):
+        """
+        Computes the profile of the pages of a document (PageSpans, in order) in a single pass over their spans.
+        The title is the bold size of the first page, larger than the text, with the most characters.
+        """
+        texts = [text for page in pages for text in page.texts]
+        if not texts:
+            return cls({}, {}, None, None, 0, None, AAS_LINK_COLOR)
+        spans = np.concatenate([page.spans for page in pages])
+        characters = np.fromiter((len(text) for text in texts), dtype=np.float64, count=len(texts))
+
+        size_histogram = get_histogram(spans["size"], characters)
+        font_histogram = get_histogram(spans["font_id"], characters)
+        body_size = get_most_common(size_histogram)
+        text_color = get_most_common(get_histogram(spans["color"], characters))
+
+        # The links are the URLs in a color different from the text (Without any, the color of the template)
+        links = np.fromiter(("http" in text for text in texts), dtype=bool, count=len(texts))
+        links &= spans["color"] != text_color
+        link_color = get_most_common(get_histogram(spans["color"][links], characters[links]), AAS_LINK_COLOR)
+
+        first_page = pages[0].spans
+        first_characters = characters[:len(first_page)]
+        titles = pages[0].fonts.flags[first_page["font_id"]]["bold_text"] & (first_page["size"] > body_size)
+        title_size = get_most_common(get_histogram(first_page["size"][titles], first_characters[titles]))
+
+        return cls(size_histogram, font_histogram, body_size, get_most_common(font_histogram), text_color, title_size, link_color)
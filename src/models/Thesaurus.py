@@ -4,6 +4,7 @@ class Thesaurus:
     def __init__(self, name):
         self.terms = {}
         self.name = name
+        self.ancestors = {}
 
     # Getters
     def get_by_id(self, term_id):
@@ -43,6 +44,21 @@ class Thesaurus:
             children += self.get_branch_children(child_id)
         return children
 
+    # Get all the ancestors of a term (parents, grandparents, ...). The closure is cached by term
+    def get_ancestors(self, term_id):
+        if term_id in self.ancestors:
+            return self.ancestors[term_id]
+
+        ancestors = set()
+        term = self.get_by_id(term_id)
+        if term is not None:
+            for parent_id in term.get_parents():
+                ancestors.add(parent_id)
+                ancestors |= self.get_ancestors(parent_id)
+
+        self.ancestors[term_id] = frozenset(ancestors)
+        return self.ancestors[term_id]
+
     # Setters
     def add_children_of_term(self, thesaurus, term):
         if len(term.get_children()) != 0:
@@ -53,6 +69,7 @@ class Thesaurus:
 
     def add_term(self, term):
         self.terms[term.get_id()] = term
+        self.ancestors = {}
 
     def print_names_and_ids(self):
         for term_key, term_value in self.terms.items():
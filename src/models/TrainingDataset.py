@@ -0,0 +1,204 @@
+import random
+import zlib
+import numpy as np
+
+class TrainingDataset:
+    def __init__(self, labels, file_ids=None, label_matrix=None, positions=None, label_mask=None):
+        """
+        Training set for a term that only holds the file ids and their categories as a label matrix.
+        The texts are never stored here, they're fetched lazily in chunks when iterating.
+
+        :param labels: Ordered list of categories (term ids). Column i of the matrix represents labels[i]
+        :param file_ids: Array of file ids
+        :param label_matrix: uint8 matrix of shape (files x labels) with 1 where the file has the category
+        :param positions: Optional array with the position of each file in a TokenizedCorpus (A view of an already loaded corpus)
+        :param label_mask: Optional bool matrix (files x labels), False where the category of the file is left out of the training
+        (A subsampled negative). spaCy doesn't compute the loss of the missing categories
+        """
+        self.labels = list(labels)
+        self.file_ids = np.asarray(file_ids if file_ids is not None else [], dtype=str)
+        if label_matrix is None:
+            label_matrix = np.zeros((len(self.file_ids), len(self.labels)), dtype=np.uint8)
+        self.label_matrix = label_matrix
+        self.positions = np.asarray(positions, dtype=np.int64) if positions is not None else None
+        self.label_mask = label_mask
+
+    @classmethod
+    def from_file_ids_by_label(cls, labels, file_ids_by_label):
+        """
+        Builds the dataset with set operations over the file ids of each label.
+
+        :param labels: Ordered list of categories (term ids)
+        :param file_ids_by_label: { label: [file_id, ...] }
+        """
+        label_file_ids = [np.asarray(file_ids_by_label.get(label, []), dtype=str) for label in labels]
+        if label_file_ids:
+            file_ids = np.unique(np.concatenate(label_file_ids))
+        else:
+            file_ids = np.asarray([], dtype=str)
+
+        label_matrix = np.zeros((len(file_ids), len(labels)), dtype=np.uint8)
+        for index, ids in enumerate(label_file_ids):
+            label_matrix[:, index] = np.isin(file_ids, ids)
+
+        return cls(labels, file_ids, label_matrix)
+
+    @classmethod
+    def from_positions_by_label(cls, labels, corpus_file_ids, positions_by_label):
+        """
+        Builds the dataset as a view of a corpus: each label has the positions of its files in the corpus.
+
+        :param labels: Ordered list of categories (term ids)
+        :param corpus_file_ids: Array with the file ids of the corpus
+        :param positions_by_label: { label: array of positions }
+        """
+        label_positions = [np.asarray(positions_by_label.get(label, []), dtype=np.int64) for label in labels]
+        if label_positions:
+            positions = np.unique(np.concatenate(label_positions))
+        else:
+            positions = np.asarray([], dtype=np.int64)
+
+        label_matrix = np.zeros((len(positions), len(labels)), dtype=np.uint8)
+        for index, label_position in enumerate(label_positions):
+            label_matrix[:, index] = np.isin(positions, label_position)
+
+        return cls(labels, np.asarray(corpus_file_ids)[positions], label_matrix, positions)
+
+    # Getters
+    def get_labels(self):
+        return self.labels
+
+    def get_file_ids(self):
+        return self.file_ids
+
+    def get_label_matrix(self):
+        return self.label_matrix
+
+    def get_positions(self):
+        return self.positions
+
+    def get_label_mask(self):
+        return self.label_mask
+
+    def get_size(self):
+        return len(self.file_ids)
+
+    def get_categories(self, position):
+        """ Expands the row of a file to the { category: 0/1 } dictionary that spaCy expects (Without the masked categories) """
+        categories = zip(self.labels, self.label_matrix[position].tolist())
+        if self.label_mask is None:
+            return dict(categories)
+        return { label: value for (label, value), labeled in zip(categories, self.label_mask[position]) if labeled }
+
+    def get_label_statistics(self):
+        """ Returns { category: (positives, positive_rate) } """
+        positives = self.label_matrix.sum(axis=0, dtype=np.int64)
+        rates = positives / max(self.get_size(), 1)
+        return { label: (int(positives[index]), float(rates[index])) for index, label in enumerate(self.labels) }
+
+    def subset(self, positions):
+        """ Returns a new dataset with only the files in the given positions """
+        corpus_positions = self.positions[positions] if self.positions is not None else None
+        label_mask = self.label_mask[positions] if self.label_mask is not None else None
+        return TrainingDataset(self.labels, self.file_ids[positions], self.label_matrix[positions], corpus_positions, label_mask)
+
+    def to_view(self, corpus_file_ids):
+        """ Returns the same dataset as a view of a corpus (Its sorted file ids, as TokenizedCorpus) that has all of its files """
+        positions = np.searchsorted(np.asarray(corpus_file_ids, dtype=str), self.file_ids)
+        return TrainingDataset(self.labels, self.file_ids, self.label_matrix, positions, self.label_mask)
+
+    def split(self, test_size=0.15):
+        """
+        Splits the dataset into train and test datasets using a hash of the file id,
+        so a file always falls on the same side regardless of the order or the size of the dataset.
+        """
+        threshold = int(test_size * 10000)
+        hashes = np.fromiter((zlib.crc32(file_id.encode("utf-8")) % 10000 for file_id in self.file_ids), dtype=np.int64, count=len(self.file_ids))
+        is_test = hashes < threshold
+
+        return self.subset(np.flatnonzero(~is_test)), self.subset(np.flatnonzero(is_test))
+
+    def get_ranks(self, key, positions=None):
+        """ Deterministic random order of the files (crc32 of the key and the file id), the same for a file in any dataset """
+        file_ids = self.file_ids if positions is None else self.file_ids[positions]
+        return np.fromiter((zlib.crc32(f"{key}:{file_id}".encode("utf-8")) for file_id in file_ids), dtype=np.int64, count=len(file_ids))
+
+    def sample(self, max_files_per_label=None, negative_ratio=None, seed=0):
+        """
+        Returns a smaller dataset for the wide terms, where most of the files are negatives for most of the labels.
+
+        The files are grouped by their label bitset (The row of the label matrix) and the groups with the rarest labels
+        are taken first: each group takes the files still needed by the label of the group with the most room left,
+        so the files of a rare label are always kept and a common one stops growing at max_files_per_label.
+        Then each label keeps at most negative_ratio negatives per positive, the rest are masked for that label
+        (Files masked for every label are dropped). The files are taken in a deterministic random order.
+
+        :param max_files_per_label: Positives kept per label (Approximate, a file kept for a label also counts for the others)
+        :param negative_ratio: Negatives kept per positive of each label
+        :param seed: Seed of the order of the files
+        """
+        if self.get_size() == 0:
+            return self
+
+        ranks = self.get_ranks(seed)
+        keep = np.ones(self.get_size(), dtype=bool)
+        if max_files_per_label is not None:
+            keep[:] = False
+            bitsets, groups = np.unique(self.label_matrix, axis=0, return_inverse=True)
+            groups = groups.ravel()
+            positives = self.label_matrix.sum(axis=0, dtype=np.int64)
+            room = np.full(len(self.labels), max_files_per_label, dtype=np.int64)
+            # The groups of the rarest labels first (Files without labels at the end)
+            rarity = [positives[bitset == 1].min() if bitset.any() else np.iinfo(np.int64).max for bitset in bitsets]
+            for group in np.argsort(rarity, kind="stable"):
+                group_labels = bitsets[group] == 1
+                members = np.flatnonzero(groups == group)
+                taken = min(len(members), int(room[group_labels].max())) if group_labels.any() else len(members)
+                if taken <= 0:
+                    continue
+                keep[members[np.argsort(ranks[members], kind="stable")[:taken]]] = True
+                room[group_labels] -= taken
+
+        label_mask = np.broadcast_to(keep[:, np.newaxis], self.label_matrix.shape).copy()
+        if self.label_mask is not None:
+            label_mask &= self.label_mask
+        if negative_ratio is not None:
+            for index, label in enumerate(self.labels):
+                negatives = np.flatnonzero(label_mask[:, index] & (self.label_matrix[:, index] == 0))
+                allowed = int(np.ceil(negative_ratio * np.count_nonzero(label_mask[:, index] & (self.label_matrix[:, index] == 1))))
+                if len(negatives) > allowed:
+                    label_ranks = self.get_ranks(f"{seed}:{label}", negatives)
+                    label_mask[negatives[np.argsort(label_ranks, kind="stable")[allowed:]], index] = False
+
+        kept = np.flatnonzero(label_mask.any(axis=1))
+        sampled = self.subset(kept)
+        sampled.label_mask = None if label_mask[kept].all() else label_mask[kept]
+        return sampled
+
+    def iter_chunks(self, input_creator, chunk_size=256, seed=None):
+        """
+        Yields the dataset in chunks of (texts, categories). Only one chunk of texts is in memory at a time.
+        Files without text are skipped.
+
+        :param input_creator: Input creator used to fetch the texts of each chunk
+        :param chunk_size: Quantity of files fetched on each round-trip
+        :param seed: If set, the files are shuffled (deterministically) before chunking
+        """
+        positions = list(range(len(self.file_ids)))
+        if seed is not None:
+            random.Random(seed).shuffle(positions)
+
+        for chunk_start in range(0, len(positions), chunk_size):
+            chunk_positions = positions[chunk_start:chunk_start + chunk_size]
+            chunk_file_ids = [str(self.file_ids[position]) for position in chunk_positions]
+            texts_by_file_id = input_creator.get_files_data_input(chunk_file_ids)
+
+            texts = []
+            categories = []
+            for position, file_id in zip(chunk_positions, chunk_file_ids):
+                text = texts_by_file_id.get(file_id)
+                if text:
+                    texts.append(text)
+                    categories.append(self.get_categories(position))
+
+            yield texts, categories
@@ -0,0 +1,49 @@
+import os
+import json
+from datetime import datetime
+
+MANIFEST_FILE_NAME = "trained_files.json"
+
+class TrainingManifest:
+    def __init__(self, labels, file_ids, date=None):
+        """
+        Files a model was trained with, saved next to the model so the files added later can be told apart.
+
+        :param labels: Categories (term ids) of the model
+        :param file_ids: Ids of every file of the dataset of the model (Train and test splits, sampled or not)
+        :param date: Date of the training (ISO format)
+        """
+        self.labels = list(labels)
+        self.file_ids = set(file_ids)
+        self.date = date or datetime.now().isoformat()
+
+    @classmethod
+    def from_disk(cls, model_path):
+        """Reads the manifest of the model, or returns None if the model has none (Trained before the manifests)."""
+        path = os.path.join(model_path, MANIFEST_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as file:
+            data = json.load(file)
+        return cls(data["labels"], data["file_ids"], data.get("date"))
+
+    def to_disk(self, model_path):
+        with open(os.path.join(model_path, MANIFEST_FILE_NAME), 'w') as file:
+            json.dump({ "labels": self.labels, "date": self.date, "file_ids": sorted(self.file_ids) }, file)
+
+    def get_labels(self):
+        return self.labels
+
+    def get_file_ids(self):
+        return self.file_ids
+
+    def has_labels(self, labels):
+        return set(self.labels) == set(labels)
+
+    def get_new_positions(self, file_ids):
+        """Positions of the file ids that the model wasn't trained with."""
+        return [position for position, file_id in enumerate(file_ids) if str(file_id) not in self.file_ids]
+
+    def add_file_ids(self, file_ids):
+        self.file_ids.update(str(file_id) for file_id in file_ids)
+        self.date = datetime.now().isoformat()
@@ -0,0 +1,153 @@
+import os
+import time
+import socket
+import logging
+import threading
+
+from TrainingSupervisor import TrainingSupervisor
+from Database.TrainingJob import TrainingJob
+from utils.memory_guard import get_memory_limits_from_env
+
+''' Training worker of the queue of the training_jobs table. Run one or more on every node (python src/training_worker.py):
+    each one claims a job, trains its term in a TrainingSupervisor process (Kept for the next jobs until it's recycled, with the memory limits) while a thread
+    renews the lease of the job, and records the result. If the node dies, the lease expires and another worker trains
+    the term again. The models are written to ./models, that has to be shared by every node (e.g. a network volume).
+'''
+
+log = logging.getLogger('my_logger')
+
+class Heartbeat(threading.Thread):
+    def __init__(self, jobs, term_id, worker_id, seconds):
+        """Renews the lease of the job every few seconds while the term trains."""
+        super().__init__(daemon=True)
+        self.jobs = jobs
+        self.term_id = term_id
+        self.worker_id = worker_id
+        self.seconds = seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.seconds):
+            try:
+                if not self.jobs.heartbeat(self.term_id, self.worker_id):
+                    log.warning(f"The lease of the job of term {self.term_id} was lost, another worker may train it again")
+            except Exception as e:
+                log.warning(f"Heartbeat of the job of term {self.term_id} failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def get_branch_jobs(thesaurus, root_term_id, max_depth=None, with_dependencies=False):
+    """
+    Jobs of the terms with children of the branch, as (term_id, depends_on, priority). The priority is the depth, so the
+    parents are claimed first. With dependencies (Warm start) a term waits for the job of its parent.
+    """
+    jobs = []
+    visited = set()
+    pending = [(root_term_id, None, 0)]
+    while pending:
+        term_id, parent_id, depth = pending.pop()
+        term = thesaurus.get_by_id(term_id)
+        if term_id in visited or term is None or not term.get_children():
+            continue
+        visited.add(term_id)
+        jobs.append((term_id, parent_id if with_dependencies else None, depth))
+
+        if max_depth is None or depth < max_depth:
+            pending.extend((child_id, term_id, depth + 1) for child_id in reversed(term.get_children()))
+
+    return jobs
+
+def get_reset_term_ids(jobs, models_folders, incremental=False):
+    """
+    Terms of the jobs to queue again even if they're done: all of them with incremental training (Their models are updated
+    with the new files), or the ones whose model is missing from any of the models folders (Deleted, or moved aside by the thesaurus diff).
+
+    :param models_folders: Folders of the models of each input creator (See Trainer.get_models_folders)
+    """
+    return {
+        term_id for term_id, _, _ in jobs
+        if incremental or not all(os.path.isdir(os.path.join(models_folder, term_id)) for models_folder in models_folders)
+    }
+
+def get_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def run_worker(jobs, supervisor, worker_id=None, heartbeat_seconds=30, poll_seconds=10, wait=False):
+    """
+    Trains the jobs of the queue until there are none left (Or forever if wait). While the unfinished jobs can't be claimed
+    yet (Running in other workers, or waiting for their dependency), the queue is polled every poll_seconds.
+    The process of the supervisor trains the next jobs too, until it's recycled (After its max terms, or over its memory limit).
+
+    :return: Results of the terms trained by this worker
+    """
+    worker_id = worker_id or get_worker_id()
+    results = []
+    try:
+        while True:
+            term_id = jobs.claim(worker_id)
+            if term_id is None:
+                if not wait and not jobs.has_unfinished():
+                    break
+                time.sleep(poll_seconds)
+                continue
+
+            print(f"Worker {worker_id} claimed the term {term_id}", flush=True)
+            heartbeat = Heartbeat(jobs, term_id, worker_id, heartbeat_seconds)
+            heartbeat.start()
+            try:
+                result = supervisor.train([term_id], stop=False)[0]
+            finally:
+                heartbeat.stop()
+
+            metrics = { key: result.get(key) for key in ("seconds", "rss_start_mb", "rss_end_mb", "peak_rss_mb", "worker_pid") }
+            metrics["node"] = socket.gethostname()
+            if result["status"] == "done":
+                jobs.mark_done(term_id, worker_id, metrics)
+            else:
+                jobs.mark_failed(term_id, worker_id, result["error"] or result["status"], metrics)
+            results.append(result)
+    finally:
+        supervisor.stop_worker()
+
+    print(f"Worker {worker_id} finished, training jobs: {jobs.get_status_counts()}", flush=True)
+    return results
+
+def run_worker_from_env(database, wait=None):
+    """Runs a worker configured from the environment (TRAIN_QUEUE_*, and the TRAIN_* and MEMORY_* variables of the supervisor)."""
+    jobs = TrainingJob(
+        database,
+        lease_seconds=int(os.getenv('TRAIN_QUEUE_LEASE_SECONDS', 300)),
+        max_attempts=int(os.getenv('TRAIN_QUEUE_MAX_ATTEMPTS', 3)),
+    )
+    supervisor = TrainingSupervisor(
+        max_terms_per_worker=int(os.getenv('TRAIN_MAX_TERMS_PER_WORKER', 10)),
+        recycle_mb=float(os.getenv('TRAIN_RECYCLE_MB', 0)) or None,
+        **get_memory_limits_from_env()
+    )
+    if wait is None:
+        wait = os.getenv('TRAIN_QUEUE_WAIT', 'false').lower() == 'true'
+    return run_worker(
+        jobs, supervisor,
+        heartbeat_seconds=int(os.getenv('TRAIN_QUEUE_HEARTBEAT_SECONDS', 30)),
+        poll_seconds=int(os.getenv('TRAIN_QUEUE_POLL_SECONDS', 10)),
+        wait=wait,
+    )
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from Database.Database import Database, get_pool_config_from_env
+    from utils.instrumentation import write_metrics
+
+    load_dotenv()
+    os.makedirs('logs', exist_ok=True)
+    logging.basicConfig(filename='logs/trainer.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    database = Database(os.getenv('DB_URL'), **get_pool_config_from_env())
+    try:
+        run_worker_from_env(database)
+    finally:
+        database.close()
+
+    print(f"Metrics saved in {write_metrics('training-worker')}")
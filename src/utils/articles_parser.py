@@ -1,7 +1,14 @@
 import fitz
 import re
+import numpy as np
 import json
 from sklearn.feature_extraction.text import TfidfVectorizer
+from utils import instrumentation
+from utils.instrumentation import instrumented
+from utils.keywords_extractor import parse_concepts
+from utils.page_spans import FontTable, PageSpans, SpanView
+from utils.pdf_extraction import DEFAULT_EXTRACTION
+from models.DocumentLayoutProfile import DocumentLayoutProfile
 
 equation_fonts = ["TimesLTStd-Roman",
                   "TimesLTStd-BoldItalic",
@@ -20,6 +27,31 @@ equation_fonts = ["TimesLTStd-Roman",
                    "AdvOT564e738a.BI"
                    ]
 
+# Font ids of the spans, shared by all the pages parsed by the process
+fonts = FontTable(equation_fonts)
+
+TABLE_PATTERN = re.compile(r'^Table \d+')
+FIGURE_PATTERN = re.compile(r'^Figure \d+\.')
+OPEN_PARENTHESIS_PATTERN = re.compile(r'\s?\(')
+CLOSE_PARENTHESIS_PATTERN = re.compile(r'\s?\)')
+YEAR_PATTERN = re.compile(r'\d{4}')
+SECTION_PATTERN = re.compile(r'^\d+\.\s')
+SUBSECTION_PATTERN = re.compile(r'^\d+\.\d+\.\s')
+PAGE_NUMBER_PATTERN = re.compile(r'\d+')
+
+HEADER_PATTERN = re.compile(r"The (Astrophysical Journal Supplement Series|Astronomical Journal|Astrophysical Journal Letters|Astrophysical Journal)[^.]*\.")
+WORD_BREAK_PATTERN = re.compile(r'(\w+)-\s+(\w+)')
+TRUNCATION_MARKERS = ["ORCID iDs", "References", "Erratum"]
+LIGATURES = { "ﬁ": "fi", "ﬂ": "fl" }
+# The ligatures and apostrophes that are separated spans ("Uni ﬁ ed", "author ’ s"), tried in this order at each position
+SPECIAL_CHARACTERS_PATTERN = re.compile(
+    r'(?P<join>\S\s[ﬁﬂ]\s\S)' # Single space around: join to the previous and next word
+    r'|(?P<join_previous>\S\s[ﬁﬂ]\s{2,}\S)' # Two spaces after: join to the previous word, keep the next one separated
+    r'|(?P<join_next>\s{2,}[ﬁﬂ]\s\S)' # Two spaces before: join to the next word, keep the previous one separated
+    r'|(?P<apostrophe_s>\S\s’\ss)' # ’ followed by s, converting to 's
+    r'|(?P<apostrophe>\S\s’)' # ’ when it's not followed by s
+)
+
 # TODO: Delete this function
 def save_string_to_file(string, filename):
   """Saves a string to a file.
@@ -36,128 +68,100 @@ def save_string_to_file(string, filename):
   except Exception as e:
     print(f"Error saving string to file: {e}")
     
-# Retrieves the text from a page and returns it filtered by different criteria
-def get_text_from_page(page, remove_abstract):
-    blocks = page.get_text("dict")["blocks"]
-
-    page_spans = []
-    bold_text = []
-    for block in blocks:
-        if "lines" in block:
-            for line in block["lines"]:
-                for span in line["spans"]:
-                    page_spans.append(span)
-                    text = span["text"]
-                    font_name = span["font"]
-
-                    if "Bold" in font_name or ".B" in font_name or "Black" in font_name:
-                        bold_text.append(text)
-    
-    # Guarda los spans en un archivo
-    # objects_string = json.dumps(page_spans, indent=2)
-    # save_string_to_file(objects_string, 'spans1.txt')
+def get_spans_from_page(page, extraction=DEFAULT_EXTRACTION, clip=None):
+    with instrumentation.span("parser.extract_spans"):
+        blocks = extraction.get_blocks(page, clip)
+        # The spans are loaded once in columns (Interned fonts, sizes, colors), the rules only update their keep mask
+        page_spans = PageSpans.from_blocks(blocks, fonts)
+    instrumentation.count("parser.pages")
+    return page_spans
+
+# (top, bottom) of the body of a page: below the header (The first spans, in the metadata sizes, at the top of the page)
+# and above the page number (The last span, at the bottom). None where the page doesn't have them
+def get_body_band(page_spans, profile, page_rect, margin_fraction=0.15):
+    spans = page_spans.spans
+    top = bottom = None
+    header = np.isin(spans["size"], profile.metadata_sizes)
+    header_end = np.argmin(header) if not header.all() else len(header)
+    if header_end and spans["bbox"][:header_end, 3].max() < page_rect.y0 + page_rect.height * margin_fraction:
+        top = float(spans["bbox"][:header_end, 3].max()) + 1
+    if len(spans) and PAGE_NUMBER_PATTERN.match(page_spans.texts[-1]) and spans["bbox"][-1, 1] > page_rect.y1 - page_rect.height * margin_fraction:
+        bottom = float(spans["bbox"][-1, 1]) - 1
+    return top, bottom
+
+# The first two pages are extracted whole: the first one has the title and the concepts, and the second one is the first regular page,
+# where the header and the footer of the document are found. The next pages are only extracted between them
+def get_clipped_spans_from_document(pdf_document, extraction):
+    pages = [get_spans_from_page(pdf_document[page_number], extraction) for page_number in range(min(2, len(pdf_document)))]
+    if len(pages) < 2:
+        return pages
+
+    top, bottom = get_body_band(pages[-1], DocumentLayoutProfile.from_pages(pages), pdf_document[1].rect)
+    for page_number in range(len(pages), len(pdf_document)):
+        page = pdf_document[page_number]
+        clip = fitz.Rect(page.rect.x0, page.rect.y0 if top is None else top, page.rect.x1, page.rect.y1 if bottom is None else bottom)
+        page_spans = get_spans_from_page(page, extraction, clip)
+        page_spans.has_header = top is None
+        page_spans.has_footer = bottom is None
+        pages.append(page_spans)
+    return pages
 
-    keywords = get_keywords_from_text(page_spans)
+# Retrieves the text from a page and returns it filtered by different criteria
+# Without the profile of the document, the page is profiled on its own
+def get_text_from_page(page, remove_abstract, profile=None):
+    page_spans = get_spans_from_page(page)
+    if profile is None:
+        profile = DocumentLayoutProfile.from_pages([page_spans])
+    return get_text_from_page_spans(page_spans, page.number, remove_abstract, profile)
+
+def get_text_from_page_spans(page_spans, page_number, remove_abstract, profile):
+    bold_text = page_spans.get_bold_texts()
+
+    # The concepts are always on the first page
+    concepts = []
+    if page_number == 0:
+        with instrumentation.span("parser.get_concepts_from_text"):
+            concepts = get_concepts_from_text(page_spans.texts)
 
     # First filter using the full span element (more properties)
-    page_spans = clean_spans_from_page(page_spans, remove_abstract)
-    # objects_string2 = json.dumps(page_spans, indent=2)
-    # save_string_to_file(objects_string2, 'spans2.txt')
+    page_spans = clean_spans_from_page(page_spans, remove_abstract, profile)
 
     # The text is reconstructed from the spans without any line breaks
-    text = ""
-    for span in page_spans:
-        text += span["text"] + " "
+    text = "".join(text + " " for text in page_spans.get_texts())
 
-    return text, bold_text, keywords
+    return text, bold_text, concepts
 
-# Retrieve the title form an article
-def get_title_from_file(file_path):
+# Retrieve the title form an article (The first run of spans with the size of the title)
+def get_title_from_file(file_path, extraction=DEFAULT_EXTRACTION):
     pdf_document = fitz.open('data/' + file_path)
-    page = pdf_document[0]
-    blocks = page.get_text("dict")["blocks"]
-    spans = []
-    bold_text = []
-    title = ""
-    for block in blocks:
-        if "lines" in block:
-            for line in block["lines"]:
-                for span in line["spans"]:
-                    spans.append(span)
-                    text = span["text"]
-                    font_name = span["font"]
-
-                    if "Bold" in font_name or ".B" in font_name or "Black" in font_name:
-                        bold_text.append(text)
-
-    i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-
-        for j in range(i, len(spans)):
-            if spans[j]["size"] == 13.947600364685059:
-                start_index = j
-                break
-
-        # Find the ending of the title 
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                if spans[k]["size"] != 13.947600364685059:
-                    end_index = k
-                    break
-
-        # If both elements were found, remove the elements between them
-        if start_index is not None and end_index is not None:
-            for index in range(start_index, end_index):
-                if not index == end_index:
-                    title += spans[index]["text"] + ' '
-                else:
-                    title += spans[index]["text"] + '\n'
-            break
-
+    page_spans = get_spans_from_page(pdf_document[0], extraction)
     pdf_document.close()
-    return title
-
-def get_keywords_from_text(spans):
-    keywords = []
-    i = 0
 
-    while i < len(spans):
-        start_index = None
-        end_index = None
-        # Find an element that matches a "concepts:"
-        for j in range(i, len(spans)):
-            if ("concepts:" in spans[j]['text']):
-                start_index = j
-                break
+    profile = DocumentLayoutProfile.from_pages([page_spans])
+    titles = page_spans.spans["size"] == profile.title_size
+    title_starts = np.flatnonzero(titles)
+    if profile.title_size is None or not len(title_starts):
+        return ""
 
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                if spans[k]["text"] == "1. Introduction":
-                    end_index = k
-                    break
-
-        # If both elements were found, remove the elements between them
-        if start_index is not None and end_index is not None:
-            text = ' '
-            for index in range(start_index, end_index):
-                text += spans[index]["text"] + ' '
-            
-            ids = re.findall(r'\d+', text)
-            keywords = ids
-            break
-        else:
-            i += 1
+    # The title must end before the end of the page
+    start_index = title_starts[0]
+    title_ends = np.flatnonzero(~titles[start_index:])
+    if not len(title_ends):
+        return ""
+    return "".join(text + ' ' for text in page_spans.texts[start_index:start_index + title_ends[0]])
 
-    return keywords
+# Retrieve the (name, id) pairs of the "Unified Astronomy Thesaurus concepts:" list (The names are used to validate the ids)
+def get_concepts_from_text(texts):
+    return parse_concepts(" ".join(texts))
 
 ''' Cleans the text by applying a series of text processing functions 
     Params: The plain text of the full article and an array of bold texts
+    The headers are removed and the tail of the article dropped first, so the next passes work on less text
 '''
+@instrumented("parser.clean_plain_text")
 def clean_plain_text(text, bold_text):
-    text = replace_special_characters(text)
-    text = join_apostrophes(text)
+    text = drop_truncated_tail(text)
+    text = normalize_special_characters(text)
     text = clean_header_from_text(text)
     text = clean_orcidIds_from_text(text)
     text = clean_authors_from_text(text, bold_text)
@@ -166,11 +170,49 @@ def clean_plain_text(text, bold_text):
     text = fix_word_breaks(text)
     return text
 
+# Drops the text after the last marker of the first truncation that will be done (ORCID iDs, or References, or Erratum).
+# The marker is kept (The truncation removes it). The markers inside a header are skipped (The header is removed before the truncations),
+# and nothing is dropped if the authors may be removed up to an "Abstract" after the marker
+@instrumented("parser.drop_truncated_tail")
+def drop_truncated_tail(text):
+    removed_headers = [match.span() for match in HEADER_PATTERN.finditer(text) if not is_concepts_header(match.group(0))]
+    for marker in TRUNCATION_MARKERS:
+        last_occurrence = text.rfind(marker)
+        while last_occurrence != -1 and any(start <= last_occurrence < end for start, end in removed_headers):
+            last_occurrence = text.rfind(marker, 0, last_occurrence)
+
+        if last_occurrence != -1:
+            if text.find("Abstract", last_occurrence) != -1:
+                return text
+            return text[:last_occurrence + len(marker)]
+    return text
+
+def replace_special_characters_match(match):
+    section = match.group(0)
+    kind = match.lastgroup
+    if kind == "join":
+        return section[0] + LIGATURES[section[2]] + section[-1]
+    if kind == "join_previous":
+        return section[0] + LIGATURES[section[2]] + " " + section[-1]
+    if kind == "join_next":
+        return " " + LIGATURES[section[-3]] + section[-1]
+    if kind == "apostrophe_s":
+        return section[0] + "'s"
+    return section[0] + "'"
+
+# Same replacements as replace_special_characters and join_apostrophes, in a single pass.
+# The only difference is with two replacements that overlap (e.g. "a ﬂ ﬁ b"), where the first one from the left is done
+@instrumented("parser.normalize_special_characters")
+def normalize_special_characters(text):
+    return SPECIAL_CHARACTERS_PATTERN.sub(replace_special_characters_match, text)
+
+@instrumented("parser.join_apostrophes")
 def join_apostrophes(text):
     text = re.sub(r'(\S)\s’\ss', r"\1's", text) # Join the word with ’ followed by s, converting to 's
     text = re.sub(r'(\S)\s’', r"\1'", text) # Join the word with ’ when it's not followed by s
     return text
 
+@instrumented("parser.replace_special_characters")
 def replace_special_characters(text):
     # Join to the previous and next word if there's a single space around "ﬁ"
     text = re.sub(r'(\S)\sﬁ\s(\S)', r'\1fi\2', text)
@@ -191,22 +233,22 @@ def replace_special_characters(text):
     text = re.sub(r'(\s{2,})ﬂ\s(\S)', r' fl\2', text)
     return text
 
+# The header of the first page is followed by the concepts, it's kept
+def is_concepts_header(section):
+    if "Astronomy Thesaurus concepts" not in section:
+        return False
+    # Before replacing the special characters, "Unified" may be "Uni ﬁ ed"
+    return "Unified Astronomy Thesaurus concepts" in SPECIAL_CHARACTERS_PATTERN.sub(replace_special_characters_match, section)
+
+def replace_header_match(match):
+    section = match.group(0)
+    return section if is_concepts_header(section) else "."
+
+@instrumented("parser.clean_header_from_text")
 def clean_header_from_text(text):
-    header_pattern = r"The (Astrophysical Journal Supplement Series|Astronomical Journal|Astrophysical Journal Letters|Astrophysical Journal)[^.]*\."
-    matches = re.finditer(header_pattern, text)
-    sections_to_remove = []
-    
-    for match in matches:
-        section = match.group(0)
-        # If the match does NOT contain "Unified Astronomy Thesaurus concepts", add it to remove list
-        if "Unified Astronomy Thesaurus concepts" not in section:
-            sections_to_remove.append(re.escape(section))  # Escape the section for use in the regular expression
-    
-    if sections_to_remove:
-        remove_pattern = "|".join(sections_to_remove)
-        text = re.sub(remove_pattern, ".", text)
-    return text
+    return HEADER_PATTERN.sub(replace_header_match, text)
 
+@instrumented("parser.clean_authors_from_text")
 def clean_authors_from_text(text, bold_texts):
     # Find the index of "Abstract" in bold_texts
     try:
@@ -242,6 +284,7 @@ def clean_authors_from_text(text, bold_texts):
     return result_text
 
 # Removes all content from the last occurrence of 'References' to the end.
+@instrumented("parser.clean_references_from_text")
 def clean_references_from_text(text):
     last_occurrence = text.rfind("References")
     if last_occurrence != -1:
@@ -250,6 +293,7 @@ def clean_references_from_text(text):
         return text
     
 # Removes all content from the last occurrence of 'Erratum' to the end.
+@instrumented("parser.clean_erratum_from_text")
 def clean_erratum_from_text(text):
     last_occurrence = text.rfind("Erratum")
     if last_occurrence != -1:
@@ -258,6 +302,7 @@ def clean_erratum_from_text(text):
         return text
 
 # Removes all content from the last occurrence of 'ORCID iDs' to the end."
+@instrumented("parser.clean_orcidIds_from_text")
 def clean_orcidIds_from_text(text):
     last_occurrence = text.rfind("ORCID iDs")
     if last_occurrence != -1:
@@ -266,456 +311,328 @@ def clean_orcidIds_from_text(text):
         return text
 
 # Fix word breaks when a line finishes with a "-". E.g. "This is a long- " and continues on the next line
+@instrumented("parser.fix_word_breaks")
 def fix_word_breaks(text):
-    fixed_text = re.sub(r'(\w+)-\s+(\w+)', r'\1\2', text)
+    fixed_text = WORD_BREAK_PATTERN.sub(r'\1\2', text)
     return fixed_text
 
 ''' Cleans the text as spans by applying a series of text processing functions 
-    Params: The spans from each page
+    Params: The spans from each page (PageSpans), each function removes spans with its keep mask,
+    and the layout of the document (DocumentLayoutProfile) with the sizes and colors the rules look for
 '''
-def clean_spans_from_page(spans, remove_abstract):
-    spans = clean_tables_from_spans(spans)
-    spans = clean_urls_from_spans(spans)
-    spans = clean_equations_from_spans(spans)
-    spans = clean_years_from_spans(spans)
-    spans = clean_example_years_from_spans(spans)
-    spans = clean_parenthesis_with_years_from_spans(spans)
-    spans = clean_small_references_from_spans(spans)
+@instrumented("parser.clean_spans_from_page")
+def clean_spans_from_page(spans, remove_abstract, profile):
+    spans = clean_tables_from_spans(spans, profile)
+    spans = clean_urls_from_spans(spans, profile)
+    spans = clean_equations_from_spans(spans, profile)
+    spans = clean_years_from_spans(spans, profile)
+    spans = clean_example_years_from_spans(spans, profile)
+    spans = clean_parenthesis_with_years_from_spans(spans, profile)
+    spans = clean_small_references_from_spans(spans, profile)
     if (remove_abstract):
-        spans = clean_authors_and_abstract_from_spans(spans)
-    spans = clean_metadata_from_spans(spans)
-    spans = clean_titles_from_spans(spans)
-    spans = clean_parenthesis_with_references_from_spans(spans)
-    spans = clean_symbols_from_spans(spans)
-    spans = clean_orcids_from_spans(spans)
-    spans = clean_page_number_from_spans(spans)
+        spans = clean_authors_and_abstract_from_spans(spans, profile)
+    spans = clean_metadata_from_spans(spans, profile)
+    spans = clean_titles_from_spans(spans, profile)
+    spans = clean_parenthesis_with_references_from_spans(spans, profile)
+    spans = clean_symbols_from_spans(spans, profile)
+    spans = clean_orcids_from_spans(spans, profile)
+    spans = clean_page_number_from_spans(spans, profile)
     
     return spans
 
 # Removes the tables from the text (Between "Table _number_" and "Note.")
 # TODO: Improve the table detection if Note. is not present (Using position?)
-def clean_tables_from_spans(spans):
-    # We have to iterate through the spans to find the start and end of the tables
-    i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-
-        # Find an element that matches "Table _number_"
-        for j in range(i, len(spans)):
-            if re.match(r'^Table \d+', spans[j]['text']) and ".B" in spans[j]["font"]:
-                start_index = j
-                break
-
-        # Find an element that matches "Note. (This usually indicates the end of the table)"
-        if start_index is not None:        
-            for k in range(start_index + 1, len(spans)):
-                if (('References.' in spans[k]['text'] or 'Note.' in spans[k]['text'] or 'Notes.' in spans[k]['text']) and ".B" in spans[j]["font"]):
-                    #End table with Note or references
-                    end_index = k + 1
-                    break
-                if re.match(r'^Table \d+', spans[k]['text']) and ".B" in spans[k]["font"]:
-                    # Another table
-                    end_index = k - 1
-                    break
-
-                if re.match(r'^Figure \d+\.', spans[k]['text']) and ".B" in spans[k]["font"]:
-                    # A figure
-                    end_index = k
-                    break
-            
-                if ('The Astrophysical' in spans[k]['text'] or 'The Astronomical' in spans[k]['text']):
-                    # A figure
-                    end_index = k
-                    for index in range(1, 10):
-                        # Check if we reached the end of the document
-                        if (k + index >= len(spans)):
-                            end_index = k + index - 1
-                            break
-                        if ('et al' in spans[k+index]['text']):
-                            end_index = k + index
-                            break
-                    break
+@instrumented("parser.clean_tables_from_spans")
+def clean_tables_from_spans(spans, profile):
+    view = SpanView(spans)
+    # Find the elements that match "Table _number_", and the ones that can end a table
+    tables = view.match(TABLE_PATTERN) & view.flags["bold"]
+    notes = view.contains('References.', 'Note.', 'Notes.')
+    figures = view.match(FIGURE_PATTERN) & view.flags["bold"]
+    headers = view.contains('The Astrophysical', 'The Astronomical')
+    table_starts = np.flatnonzero(tables)
+    table_ends = np.flatnonzero(notes | tables | figures | headers)
 
-
-        # If both elements were found, remove the elements between them
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
-        else:
-            i += 1
-        
-    return spans
-
-def clean_urls_from_spans(spans):
-    # We have to iterate through the spans to find the start and end of the links
     i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-        should_skip = False
-        text_color = 0
-
-        # Find an element that matches a URL
-        for j in range(i, len(spans)):
-            if "http" in spans[j]["text"]:
-                start_index = j
-                text_color = spans[j]["color"]
-                break
-
-        # Find the ending of the URL 
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                if spans[k]['color'] != text_color:
-                    end_index = k
-                    break
+    while True:
+        start_index = view.find(table_starts, i)
+        if start_index is None:
+            break
 
-        if end_index and start_index and (end_index - start_index) >= 8 and text_color == 0 :
-            should_skip = True
+        end_index = None
+        k = view.find(table_ends, start_index + 1)
+        if k is not None:
+            if notes[k]:
+                #End table with Note or references
+                end_index = k + 1
+            elif tables[k]:
+                # Another table
+                end_index = k - 1
+            elif figures[k]:
+                # A figure
+                end_index = k
+            else:
+                # The header of the page, with the authors ("et al") in the next lines
+                end_index = k
+                for index in range(1, 10):
+                    # Check if we reached the end of the document
+                    if (k + index >= len(view)):
+                        end_index = k + index - 1
+                        break
+                    if ('et al' in view.texts[k + index]):
+                        end_index = k + index
+                        break
 
-        if should_skip:
-            i = end_index
-            start_index = None
-            end_index = None
         # If both elements were found, remove the elements between them
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
+        if end_index is not None and end_index > start_index:
+            view.remove(start_index, end_index)
+            i = end_index
         else:
-            i += 1
+            i = start_index + 1
+        
+    return view.apply()
 
-    return spans
+@instrumented("parser.clean_urls_from_spans")
+def clean_urls_from_spans(spans, profile):
+    view = SpanView(spans)
+    url_starts = np.flatnonzero(view.contains("http"))
+    # The URL ends where the color changes
+    color_changes = np.flatnonzero(view.colors[1:] != view.colors[:-1]) + 1
 
-def clean_equations_from_spans(spans):
-    # We have to iterate through the spans to find the start and end of the equations
     i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-
-        # Find an element that matches an equation (It has a different font)
-        # If it's only one line, it's not an equation
-        for j in range(i, len(spans)):
-            if spans[j]["font"] in equation_fonts:
-                start_index = j
-                break
-
-        # Find the ending of the equation 
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                if spans[k]["font"] not in equation_fonts:
-                    end_index = k
-                    if (end_index - start_index) < 2:
-                        start_index = None
-                        end_index = None
-                    break
+    while True:
+        start_index = view.find(url_starts, i)
+        if start_index is None:
+            break
+        text_color = view.colors[start_index]
+        end_index = view.find(color_changes, start_index + 1)
 
+        # Long black texts are not links (Unless they are at the start of the page)
+        if end_index is not None and not view.is_page_start(start_index) and (end_index - start_index) >= 8 and text_color == profile.text_color:
+            i = end_index + 1
         # If both elements were found, remove the elements between them
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
+        elif end_index is not None:
+            view.remove(start_index, end_index)
+            i = end_index
         else:
-            i += 1
-
-    return spans
+            i = start_index + 1
+
+    return view.apply()
+
+@instrumented("parser.clean_equations_from_spans")
+def clean_equations_from_spans(spans, profile):
+    view = SpanView(spans)
+    # An equation is a run of spans with the fonts of the equations
+    # If it's only one line, it's not an equation. If it reaches the end of the page it's kept
+    equations = view.flags["equation"]
+    run_starts = np.flatnonzero(equations & ~np.concatenate([[False], equations[:-1]]))
+    run_ends = np.flatnonzero(~equations)
+
+    for start_index in run_starts:
+        end_index = view.find(run_ends, start_index)
+        if end_index is not None and (end_index - start_index) >= 2:
+            view.remove(start_index, end_index)
+
+    return view.apply()
+
+@instrumented("parser.clean_years_from_spans")
+def clean_years_from_spans(spans, profile):
+    view = SpanView(spans)
+    # Find the elements that match a "( ", followed by a year and a ")"
+    opens = view.match(OPEN_PARENTHESIS_PATTERN)
+    years = view.match(YEAR_PATTERN)
+    closes = view.match(CLOSE_PARENTHESIS_PATTERN)
+    year_starts = np.flatnonzero(opens[:-2] & years[1:-1] & closes[2:])
 
-def clean_years_from_spans(spans):
-    # We have to iterate through the spans to find the start and end of the years
     i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-        should_skip = False
-        # Find an element that matches a "( "
-        for j in range(i, len(spans)):
-            if (re.match(r'\s?\(', spans[j]['text']) and re.match(r'\d{4}', spans[j+1]['text']) and re.match(r'\s?\)', spans[j+2]['text'])):
-                if (spans[j]['color'] == 255):
-                    should_skip = True
-                
-                start_index = j
-                end_index = j + 3
-                break
-
-        if should_skip:
-            i = end_index
-            continue
-            
-        # If both elements were found, remove the elements between them
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
-        else:
-            i += 1
+    while True:
+        start_index = view.find(year_starts, i)
+        if start_index is None:
+            break
+        # The years in the color of the links are links to the references, they are kept
+        if view.colors[start_index] != profile.link_color:
+            view.remove(start_index, start_index + 3)
+        i = start_index + 3
 
-    return spans
+    return view.apply()
 
 # Removes examples years in parenthesis like (e.g. Author 2019). BUG: If the first span is ") (" it will not be removed
-def clean_example_years_from_spans(spans):
-    # We have to iterate through the spans to find the start and end of the years
-    i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-        # Find an element that matches a "( "
-        for j in range(i, len(spans)):
-            words = ["e.g.", "e.g.,"]
-            if(re.match(r'\s?\(', spans[j]['text']) and any(words in spans[j+1]['text'] for words in words)):
-                start_index = j
-                break
-
+@instrumented("parser.clean_example_years_from_spans")
+def clean_example_years_from_spans(spans, profile):
+    view = SpanView(spans)
+    # Find the elements that match a "( " followed by "e.g."
+    opens = view.match(OPEN_PARENTHESIS_PATTERN)
+    examples = view.contains("e.g.", "e.g.,")
+    example_starts = np.flatnonzero(opens[:-1] & examples[1:])
+    closes = np.flatnonzero(np.fromiter((text == ")" for text in view.texts), dtype=bool, count=len(view)))
 
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                if spans[k]["text"] == ")":
-                    end_index = k + 1
-                    break
+    i = 0
+    while True:
+        start_index = view.find(example_starts, i)
+        if start_index is None:
+            break
+        k = view.find(closes, start_index)
 
         # If both elements were found, remove the elements between them
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
+        if k is not None:
+            view.remove(start_index, k + 1)
+            i = k + 1
         else:
-            i += 1
+            i = start_index + 1
 
-    return spans
+    return view.apply()
 
-def clean_parenthesis_with_years_from_spans(spans):
-    i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-        should_skip = False
-        for j in range(i, len(spans)):
-            if "(" in spans[j]["text"] and spans[j]["color"] == 0:
-                start_index = j
-                break
+@instrumented("parser.clean_parenthesis_with_years_from_spans")
+def clean_parenthesis_with_years_from_spans(spans, profile):
+    view = SpanView(spans)
+    parenthesis_starts = np.flatnonzero(view.contains("(") & (view.colors == profile.text_color))
+    closes = np.flatnonzero(view.contains(")"))
 
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                if ")" in spans[k]['text']:
-                    end_index = k + 1
-                    if re.search(r'\d{4}', spans[k - 1]['text']):
-                        break
-                    else:
-                        should_skip = True
-                        break
+    i = 0
+    while True:
+        start_index = view.find(parenthesis_starts, i)
+        if start_index is None:
+            break
+        k = view.find(closes, start_index)
+        if k is None:
+            i = start_index + 1
+            continue
 
-        if end_index and start_index and (end_index - start_index) >= 30:
+        end_index = k + 1
+        # Only the parenthesis that end with a year are removed
+        previous_text = view.texts[k - 1] if k > start_index else view.get_text(k, -1)
+        should_skip = not YEAR_PATTERN.search(previous_text)
+        if not view.is_page_start(start_index) and (end_index - start_index) >= 30:
             should_skip = True
 
         if should_skip:
-            i = end_index
-            start_index = None
-            end_index = None
-
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
-        else:
-            i += 1
-    return spans
-
-def clean_small_references_from_spans(spans):
-    i = 0
-    while i < len(spans):
-        start_index = None
-        for j in range(i, len(spans)):
-            if spans[j].get('size') == 7.044162273406982 and spans[j].get('color') == 255:
-                start_index = j
-                break
-
-        if start_index is not None:
-            del spans[start_index:start_index + 1]
-            i = start_index 
+            i = end_index + 1
         else:
-            i += 1
+            view.remove(start_index, end_index)
+            i = end_index
+    return view.apply()
 
-    return spans
+@instrumented("parser.clean_small_references_from_spans")
+def clean_small_references_from_spans(spans, profile):
+    view = SpanView(spans)
+    view.remove_mask((view.sizes == profile.small_reference_size) & (view.colors == profile.link_color))
+    return view.apply()
 
 # Cleans small text like header and footer (e.g. Original content..., Published by..., The Astrophysical Journal...)
-def clean_metadata_from_spans(spans):
-    i = 0
-    while i < len(spans):
-        start_index = None
-        for j in range(i, len(spans)):
-            allowed_sizes = [5.977700233459473, 7.970200061798096, 6.339683532714844]
-            if spans[j].get('size') in allowed_sizes:
-                start_index = j
-                break
+@instrumented("parser.clean_metadata_from_spans")
+def clean_metadata_from_spans(spans, profile):
+    view = SpanView(spans)
+    small = np.isin(view.sizes, profile.metadata_sizes)
+    run_starts = np.flatnonzero(small & ~np.concatenate([[False], small[:-1]]))
+    run_ends = np.flatnonzero(~small)
+
+    for start_index in run_starts:
+        # Check if the next element is not a small text. If it's the last one, it's removed too (End of page)
+        end_index = view.find(run_ends, start_index)
+        if end_index is None or end_index == len(view) - 1:
+            view.remove(start_index, len(view))
+            break
+        view.remove(start_index, end_index)
 
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                 # Reached End of page
-                 if (k + 1) == len(spans):
-                    end_index = k + 1
-                    break
-                 # Check if the next element is not a small text
-                 disallowed_sizes = [5.977700233459473, 7.970200061798096, 6.339683532714844]
-                 if spans[k].get('size') not in disallowed_sizes:
-                    # print("REMOVED: ", spans[k]['text'], flush=True)
-                    end_index = k
-                    break
-
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
-        else:
-            i += 1
-
-    return spans
+    return view.apply()
 
 # Cleans everything between title and text (Abstract, Keywords, Authors). Adds an enter after the title
-def clean_authors_and_abstract_from_spans(spans):
+@instrumented("parser.clean_authors_and_abstract_from_spans")
+def clean_authors_and_abstract_from_spans(spans, profile):
+    view = SpanView(spans)
+    # Find the end of the title text (The last bold span with the size of the title)
+    title_ends = np.flatnonzero((view.sizes[:-1] == profile.title_size) & view.flags["bold"][:-1] & ~view.flags["bold"][1:])
+    introductions = np.flatnonzero(view.contains("1. Introduction"))
+
     i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-        # Find the end of the title text
-        for j in range(i, len(spans)):
-            if (spans[j].get('size') == 13.947600364685059 and ".B" in spans[j]["font"] and ".B" not in spans[j + 1]["font"]):                
-                start_index = j + 1
-                break
-            # If the abstract occupies more than one page, we need to check for "Introduction" and remove everything until there
-            if "1. Introduction" in spans[j]['text']:
-                start_index = 0
-                end_index = j + 1
-                del spans[start_index:end_index]
-                return spans
-
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                if "1. Introduction" in spans[k]['text']:
-                    end_index = k + 1
-                    break
+    while True:
+        title_end = view.find(title_ends, i)
+        introduction = view.find(introductions, i)
+        # If the abstract occupies more than one page, we need to check for "Introduction" and remove everything until there
+        if introduction is not None and (title_end is None or introduction < title_end):
+            view.remove(0, introduction + 1)
+            break
+        if title_end is None:
+            break
 
+        start_index = title_end + 1
+        k = view.find(introductions, start_index)
         # If the abstract occupies more than one page, we need to remove everything until the end of the page from the title
-        if end_index is None:
-            end_index = len(spans)
-
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            
-            # Create line break span
-            empty_span = {
-                "text": "\n",
-                "size": 13.947600364685059,
-                "font": "TimesLTStd-Roman",
-                "color": 0
-            }
-            spans.insert(start_index, empty_span)
-
-            i = start_index
-        else:
-            i += 1
-    return spans
+        end_index = k + 1 if k is not None else len(view)
 
-# Cleans titles and subtitles from the text (Sections, subsections)
-def clean_titles_from_spans(spans):
-    i = 0
-    while i < len(spans):
-        start_index = None
-        # Find the end of the title text
-        for j in range(i, len(spans)):
-            # Find "1. Introduction" in bold or "1.1. Introduction" in italic
-            if ((re.match(r'^\d+\.\s', spans[j]['text']) and ".B" in spans[j]["font"]) or
-                ("Appendix" in spans[j]['text'] and ".B" in spans[j]["font"]) or
-                (re.match(r'^\d+\.\d+\.\s', spans[j]['text']) and ".I" in spans[j]["font"])):
-                start_index = j
-                break
+        # The line break takes the place of the last removed span, so the spans after it are the next ones in the view
+        view.remove(start_index, end_index - 1)
+        view.replace(end_index - 1, "\n", profile.title_size, profile.body_font_id, profile.text_color)
+        i = end_index
+    return view.apply()
 
-        if start_index is not None:
-            del spans[start_index:start_index + 1]
-            i = start_index 
-        else:
-            i += 1
-
-    return spans
+# Cleans titles and subtitles from the text (Sections, subsections)
+@instrumented("parser.clean_titles_from_spans")
+def clean_titles_from_spans(spans, profile):
+    view = SpanView(spans)
+    # Find "1. Introduction" in bold or "1.1. Introduction" in italic
+    view.remove_mask(
+        (view.match(SECTION_PATTERN) & view.flags["bold"]) |
+        (view.contains("Appendix") & view.flags["bold"]) |
+        (view.match(SUBSECTION_PATTERN) & view.flags["italic"])
+    )
+    return view.apply()
 
 # Cleans parenthesis with references from the text like "(see Figure 5)"
-def clean_parenthesis_with_references_from_spans(spans):
-    i = 0
-    while i < len(spans):
-        start_index = None
-        end_index = None
-        # Find the start of parenthesis and the word "see "
-        for j in range(i, len(spans) - 1):
-            words = ["see", "Figure", "Figures", "Table", "Section"]
-            if ("(" in spans[j]["text"] and any(word in spans[j + 1]["text"] for word in words)):
-                start_index = j
-                break
-
-        if start_index is not None:
-            for k in range(start_index, len(spans)):
-                # Find the end of the parenthesis. If there's another parenthesis inside, skip it. E.g. (see Figure 5(a), left)
-                if ")" in spans[k]["text"] and "(" not in spans[k - 2]["text"]:
-                    end_index = k + 1
-                    break
+@instrumented("parser.clean_parenthesis_with_references_from_spans")
+def clean_parenthesis_with_references_from_spans(spans, profile):
+    view = SpanView(spans)
+    # Find the start of parenthesis and the word "see "
+    opens = view.contains("(")
+    references = view.contains("see", "Figure", "Figures", "Table", "Section")
+    reference_starts = np.flatnonzero(opens[:-1] & references[1:])
+    closes = np.flatnonzero(view.contains(")"))
 
-        if start_index is not None and end_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
-        else:
-            i += 1
-    return spans
-
-# Cleans symbols like (Greater-than or equal to) and (Less-than or equal to) that are not displayed correctly
-def clean_symbols_from_spans(spans):
     i = 0
-    while i < len(spans):
-        start_index = None
-        # Find the end of the title text
-        for j in range(i, len(spans)):
-            # Find weird simbols like (Greater-than or equal to) and (Less-than or equal to)
-            symbols = ["\uf088", "\uf089", "\u0084", "\u0085", "\uf0d1"]
-            if (any(symbol in spans[j]['text'] for symbol in symbols)):
-                start_index = j
-                break
-
-        if start_index is not None:
-            del spans[start_index:start_index + 1]
-            i = start_index 
-        else:
-            i += 1
-
-    return spans
+    while True:
+        start_index = view.find(reference_starts, i)
+        if start_index is None:
+            break
 
-# Clean the ORCID iDs from the text (Probably in last page). From the start of the ORCID iDs to the end of the page
-def clean_orcids_from_spans(spans):
-    i = 0
-    while i < len(spans):
-        start_index = None
+        # Find the end of the parenthesis. If there's another parenthesis inside, skip it. E.g. (see Figure 5(a), left)
         end_index = None
-        # Find the start of parenthesis and the word "see "
-        for j in range(i, len(spans)):
-            if ("ORCID iDs" in spans[j]["text"] and ".B" in spans[j]["font"]):
-                start_index = j
-                end_index = len(spans)
+        for k in closes[np.searchsorted(closes, start_index):]:
+            previous_text = view.texts[k - 2] if k - 2 >= start_index else view.get_text(k, -2)
+            if "(" not in previous_text:
+                end_index = k + 1
                 break
 
-        if start_index is not None:
-            del spans[start_index:end_index]
-            i = start_index
+        if end_index is not None:
+            view.remove(start_index, end_index)
+            i = end_index
         else:
-            i += 1
-    return spans
+            i = start_index + 1
+    return view.apply()
 
-# If the last span is a number, it's probably a page number. Remove it
-def clean_page_number_from_spans(spans):
-    i = 0
-    while i < len(spans):
-        start_index = None
-        for j in range(i, len(spans)):
-            if (re.match(r'\d+', spans[j]['text']) and j == len(spans) - 1):
-                start_index = j
-                break
-
-        if start_index is not None:
-            del spans[start_index:start_index + 1]
-            i = start_index 
-        else:
-            i += 1
+# Cleans symbols like (Greater-than or equal to) and (Less-than or equal to) that are not displayed correctly
+@instrumented("parser.clean_symbols_from_spans")
+def clean_symbols_from_spans(spans, profile):
+    view = SpanView(spans)
+    # Find weird simbols like (Greater-than or equal to) and (Less-than or equal to)
+    view.remove_mask(view.contains("\uf088", "\uf089", "\u0084", "\u0085", "\uf0d1"))
+    return view.apply()
 
-    return spans
+# Clean the ORCID iDs from the text (Probably in last page). From the start of the ORCID iDs to the end of the page
+@instrumented("parser.clean_orcids_from_spans")
+def clean_orcids_from_spans(spans, profile):
+    view = SpanView(spans)
+    start_index = view.find(np.flatnonzero(view.contains("ORCID iDs") & view.flags["bold"]), 0)
+    if start_index is not None:
+        view.remove(start_index, len(view))
+    return view.apply()
+
+# If the last span is a number, it's probably a page number. Remove it (Unless the footer wasn't extracted)
+@instrumented("parser.clean_page_number_from_spans")
+def clean_page_number_from_spans(spans, profile):
+    view = SpanView(spans)
+    if spans.has_footer and len(view) and PAGE_NUMBER_PATTERN.match(view.texts[-1]):
+        view.remove(len(view) - 1, len(view))
+    return view.apply()
 
 '''
 Cleans summarized text by applying a series of text processing functions 
@@ -730,21 +647,31 @@ def clean_parentesis_from_text(text):
     return text
 
 # Retrieve the full text from an article removing the unnecessary information
-def get_full_text_from_file(file_path, remove_abstract=True):
-    pdf_document = fitz.open('data/' + file_path)
-    full_text = ""
+def get_full_text_from_file(file_path, remove_abstract=True, extraction=DEFAULT_EXTRACTION):
+    with instrumentation.span("parser.open_pdf"):
+        pdf_document = fitz.open('data/' + file_path)
+    instrumentation.count("parser.files")
+    # The spans of every page are loaded first, so the layout of the document is known before cleaning them
+    if extraction.clip_margins:
+        pages = get_clipped_spans_from_document(pdf_document, extraction)
+    else:
+        pages = [get_spans_from_page(page, extraction) for page in pdf_document]
+    pdf_document.close()
+    with instrumentation.span("parser.layout_profile"):
+        profile = DocumentLayoutProfile.from_pages(pages)
+
+    page_texts = []
     bold_text = []
-    keywords = []
-    for page_number in range(len(pdf_document)):
-        # Numero de pagina - 1 que el pdf
-        page = pdf_document[page_number]
-        text, bold_text_from_page, keywords_by_page = get_text_from_page(page, remove_abstract)
+    concepts = []
+    for page_number, page_spans in enumerate(pages):
+        text, bold_text_from_page, concepts_by_page = get_text_from_page_spans(page_spans, page_number, remove_abstract, profile)
         # ctrl+shift+p: toggle word wrap para evitar scroll
-        bold_text = bold_text + bold_text_from_page
-        keywords = keywords + keywords_by_page
-        full_text += text + ""
+        bold_text.extend(bold_text_from_page)
+        concepts.extend(concepts_by_page)
+        page_texts.append(text)
 
-    pdf_document.close()
+    # The pages are joined once (The replacements may join words of different pages)
+    full_text = "".join(page_texts)
     # save_string_to_file(full_text, 'text1.txt')
 
     # Second filter using the only the text
@@ -752,11 +679,11 @@ def get_full_text_from_file(file_path, remove_abstract=True):
     full_text = clean_plain_text(full_text, bold_text)
     # save_string_to_file(full_text, 'text2.txt')
 
-    return full_text, keywords
+    return full_text, concepts
 
-# Retrieve the abstract from an article
-def get_abstract_from_file(file_path, get_title=False):
-    full_text, keywords = get_full_text_from_file(file_path, False)
+# Retrieve the abstract from an article, and the (name, id) pairs of its concepts
+def get_abstract_from_file(file_path, get_title=False, extraction=DEFAULT_EXTRACTION):
+    full_text, concepts = get_full_text_from_file(file_path, False, extraction)
     regex_pattern = r'Abstract([\s\S]*?)Unified Astronomy Thesaurus concepts:'
     extracted_text = ''
     match = re.search(regex_pattern, full_text)
@@ -767,9 +694,9 @@ def get_abstract_from_file(file_path, get_title=False):
     extracted_text = extracted_text.replace('\n', ' ').strip()
 
     if get_title:
-        extracted_text = get_title_from_file(file_path) + extracted_text
+        extracted_text = get_title_from_file(file_path, extraction) + extracted_text
     
-    return extracted_text, keywords
+    return extracted_text, concepts
 
 # Retrieve the top 50 words from an article based on TF-IDF
 # keywords_by_word is a list of words that will be given a higher TF-IDF value, [] if not used
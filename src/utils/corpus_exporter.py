@@ -0,0 +1,78 @@
+import os
+import json
+import logging
+from datetime import datetime, timezone
+import pyarrow as pa
+from sqlalchemy import select
+
+from Database.DatabaseModels import KeywordModel, TermFileModel, TEXT_MODELS
+
+# Logging, change log level if needed
+logging.basicConfig(filename='logs/corpus_export.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger('my_logger')
+
+TEXT_SCHEMA = pa.schema([("file_id", pa.string()), ("text", pa.large_string()), ("length", pa.int32()), ("hash", pa.string())])
+KEYWORDS_SCHEMA = pa.schema([("keyword_id", pa.int32()), ("file_id", pa.string()), ("order", pa.int32())])
+TERM_FILES_SCHEMA = pa.schema([("term_id", pa.int32()), ("file_id", pa.string())])
+CLOSURE_SCHEMA = pa.schema([("term_id", pa.int32()), ("ancestor_id", pa.int32())])
+
+def iter_query_in_chunks(database, query, chunk_size):
+    """Runs the query with a server side cursor and yields the rows as lists of dictionaries, chunk_size rows at a time."""
+    result = database.query(query.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield [row._asdict() for row in partition]
+
+def write_arrow_file(path, schema, chunks):
+    """
+    Writes the chunks as record batches of an uncompressed Arrow IPC file (So it can be memory-mapped when reading).
+    Only one chunk is in memory at a time. Returns the quantity of rows written.
+    """
+    rows = 0
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for chunk in chunks:
+                writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+                rows += len(chunk)
+    return rows
+
+def get_closure_rows(thesaurus):
+    rows = []
+    for term_id in thesaurus.get_terms().keys():
+        for ancestor_id in thesaurus.get_ancestors(term_id):
+            rows.append({ "term_id": int(term_id), "ancestor_id": int(ancestor_id) })
+    return [rows]
+
+def export_corpus(database, thesaurus, folder, chunk_size=1000):
+    """
+    Snapshots the texts, keywords and term -> files tables, together with the thesaurus closure (term -> ancestors),
+    into Arrow files that can be used to train without a database (See Corpus/ArrowCorpusSource.py).
+
+    :param database: Database to export
+    :param thesaurus: Thesaurus used for the closure
+    :param folder: Output folder
+    :param chunk_size: Quantity of rows read from the database at a time
+    """
+    os.makedirs(folder, exist_ok=True)
+    counts = {}
+
+    for projection, text_model in TEXT_MODELS.items():
+        query = select(text_model.file_id, text_model.text, text_model.length, text_model.hash).order_by(text_model.file_id)
+        file_name = f"files_{projection}.arrow"
+        counts[file_name] = write_arrow_file(os.path.join(folder, file_name), TEXT_SCHEMA, iter_query_in_chunks(database, query, chunk_size))
+        log.info(f"Exported {counts[file_name]} rows to {file_name}")
+
+    query = select(KeywordModel.keyword_id, KeywordModel.file_id, KeywordModel.order).where(KeywordModel.file_id.is_not(None))
+    counts["keywords.arrow"] = write_arrow_file(os.path.join(folder, "keywords.arrow"), KEYWORDS_SCHEMA, iter_query_in_chunks(database, query, chunk_size))
+
+    # Sorted by term, so the files of a term can be found with a binary search
+    query = select(TermFileModel.term_id, TermFileModel.file_id).order_by(TermFileModel.term_id, TermFileModel.file_id)
+    counts["term_files.arrow"] = write_arrow_file(os.path.join(folder, "term_files.arrow"), TERM_FILES_SCHEMA, iter_query_in_chunks(database, query, chunk_size))
+
+    counts["thesaurus_closure.arrow"] = write_arrow_file(os.path.join(folder, "thesaurus_closure.arrow"), CLOSURE_SCHEMA, get_closure_rows(thesaurus))
+
+    manifest = { "exported_at": datetime.now(timezone.utc).isoformat(), "rows": counts }
+    with open(os.path.join(folder, "manifest.json"), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+    log.info(f"Corpus exported to {folder}: {counts}")
+    return manifest
@@ -0,0 +1,64 @@
+import logging
+from sqlalchemy import select
+
+from Database.DatabaseModels import FileSignatureModel, TEXT_MODELS
+from Database.FileSignature import FileSignature
+from Database.TermFile import TermFile
+from utils.near_duplicates import MinHasher, DEFAULT_THRESHOLD
+
+# Logging, change log level if needed
+logging.basicConfig(filename='logs/file_generation.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger('my_logger')
+
+def iter_unsigned_texts(database, chunk_size):
+    """Yields the full texts of the files without a signature as lists of (file_id, text), by file_id."""
+    text_model = TEXT_MODELS["full_text"]
+    last_file_id = None
+    while True:
+        query = (
+            select(text_model.file_id, text_model.text)
+            .outerjoin(FileSignatureModel, FileSignatureModel.file_id == text_model.file_id)
+            .where(FileSignatureModel.file_id.is_(None))
+            .order_by(text_model.file_id).limit(chunk_size)
+        )
+        if last_file_id is not None:
+            query = query.where(text_model.file_id > last_file_id)
+
+        results = list(database.query(query))
+        if not results:
+            break
+        yield results
+        last_file_id = results[-1][0]
+
+def index_near_duplicates(database, threshold=DEFAULT_THRESHOLD, chunk_size=100):
+    """
+    Signs the files ingested without a signature (e.g. before the near-duplicate detection existed), in file_id order,
+    so the first file of a group of near-duplicates is kept. The near-duplicates are removed from term_files.
+    The texts too short to be signed are skipped (They stay without a signature).
+
+    :return: Quantity of files signed, skipped and of near-duplicates found
+    """
+    min_hasher = MinHasher()
+    file_signature_db = FileSignature(database)
+    term_file_db = TermFile(database)
+    signed = 0
+    skipped = 0
+    duplicates = 0
+    for files in iter_unsigned_texts(database, chunk_size):
+        for file_id, full_text in files:
+            signature = min_hasher.get_signature(full_text)
+            if signature is None:
+                skipped += 1
+                continue
+
+            duplicate_of, similarity = file_signature_db.find_duplicate(file_id, signature, threshold)
+            file_signature_db.add(file_id, signature, duplicate_of, similarity)
+            signed += 1
+            if duplicate_of is not None:
+                term_file_db.add_file(file_id, [])
+                duplicates += 1
+                log.info(f"File {file_id} is a near-duplicate of {duplicate_of} (Similarity {similarity:.2f})")
+
+        print(f"Signed {signed} files, {skipped} skipped, {duplicates} near-duplicates", flush=True)
+
+    return { "signed": signed, "skipped": skipped, "near_duplicates": duplicates }
@@ -0,0 +1,49 @@
+import os
+import math
+import numpy as np
+
+''' Incremental training of the models that already exist. The manifest saved next to each model (TrainingManifest)
+    has the files it was trained with: a model is only updated when its train split has files that aren't there,
+    and it's resumed (nlp.resume_training) on the new files plus a rehearsal sample of the old ones, so it learns
+    the new files without forgetting the rest. The models without new files are left untouched.
+'''
+
+class IncrementalTraining:
+    def __init__(self, enabled=False, rehearsal_ratio=1.0, epochs=5, seed=0):
+        """
+        :param enabled: Update the existing models (Otherwise a model that exists is skipped)
+        :param rehearsal_ratio: Old files trained again per new file
+        :param epochs: Epochs of the update
+        :param seed: Seed of the order of the old files (The same seed gives the same rehearsal sample)
+        """
+        self.enabled = enabled
+        self.rehearsal_ratio = rehearsal_ratio
+        self.epochs = epochs
+        self.seed = seed
+
+    def get_new_positions(self, manifest, train_data):
+        return np.asarray(manifest.get_new_positions(train_data.get_file_ids()), dtype=np.int64)
+
+    def get_update_data(self, manifest, train_data):
+        """
+        Dataset of the update: the files of the train split that the model wasn't trained with, and a sample of the others.
+
+        :return: (update dataset, quantity of new files)
+        """
+        new_positions = self.get_new_positions(manifest, train_data)
+        old_positions = np.setdiff1d(np.arange(train_data.get_size()), new_positions)
+        rehearsal_size = min(math.ceil(self.rehearsal_ratio * len(new_positions)), len(old_positions))
+
+        ranks = train_data.get_ranks(f"rehearsal:{self.seed}", old_positions)
+        rehearsal_positions = old_positions[np.argsort(ranks, kind="stable")[:rehearsal_size]]
+        return train_data.subset(np.sort(np.concatenate([new_positions, rehearsal_positions]))), len(new_positions)
+
+NO_INCREMENTAL = IncrementalTraining()
+
+def get_incremental_training_from_env():
+    """Reads the incremental training from the environment (TRAIN_INCREMENTAL, TRAIN_REHEARSAL_RATIO, TRAIN_INCREMENTAL_EPOCHS)."""
+    return IncrementalTraining(
+        enabled=os.getenv('TRAIN_INCREMENTAL', 'false').lower() == 'true',
+        rehearsal_ratio=float(os.getenv('TRAIN_REHEARSAL_RATIO', 1.0)),
+        epochs=int(os.getenv('TRAIN_INCREMENTAL_EPOCHS', 5)),
+    )
@@ -0,0 +1,185 @@
+import os
+import csv
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+''' Lightweight instrumentation of the pipelines (generate, regenerate, train).
+    span("stage") measures a block, count("name") increments a counter, and write_metrics() saves
+    the aggregates of the run as JSON and CSV in logs/metrics.
+
+    Stages can also be profiled by setting the environment variables:
+    - PROFILE_STAGES: Comma separated stages (e.g. "training.update,parser.extract_spans")
+    - PROFILER: "cprofile" (default) or "pyinstrument"
+'''
+
+METRICS_PATH = 'logs/metrics'
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # { stage: [count, total_seconds, min_seconds, max_seconds] }
+        self.spans = {}
+        self.counters = {}
+
+    def reset_after_fork(self):
+        # A forked worker starts with empty metrics (The parent ones would be counted twice when merged)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def record(self, stage, elapsed):
+        with self.lock:
+            stats = self.spans.get(stage)
+            if stats is None:
+                self.spans[stage] = [1, elapsed, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = min(stats[2], elapsed)
+                stats[3] = max(stats[3], elapsed)
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def pop_snapshot(self):
+        """Returns the metrics recorded so far and resets them (Used to send the metrics of a worker process to the parent)."""
+        with self.lock:
+            snapshot = { "spans": self.spans, "counters": self.counters }
+            self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        with self.lock:
+            for stage, (count, total, minimum, maximum) in snapshot["spans"].items():
+                stats = self.spans.get(stage)
+                if stats is None:
+                    self.spans[stage] = [count, total, minimum, maximum]
+                else:
+                    self.spans[stage] = [stats[0] + count, stats[1] + total, min(stats[2], minimum), max(stats[3], maximum)]
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_span_rows(self):
+        with self.lock:
+            return [
+                { "stage": stage, "count": count, "total_seconds": total, "mean_seconds": total / count, "min_seconds": minimum, "max_seconds": maximum }
+                for stage, (count, total, minimum, maximum) in sorted(self.spans.items(), key=lambda item: -item[1][1])
+            ]
+
+    def get_counters(self):
+        with self.lock:
+            return dict(self.counters)
+
+class StageProfiler:
+    def __init__(self, stages, profiler_name):
+        """Profiles the blocks of the given stages. The profile of a stage accumulates all of its blocks."""
+        self.stages = stages
+        self.profiler_name = profiler_name
+        self.profilers = {}
+        # Stage profiled by each thread, if any
+        self.active = threading.local()
+
+    def is_profiled(self, stage):
+        # Profilers can't be nested or shared between threads, only the main thread is profiled,
+        # and a stage inside another profiled stage is only measured (It's in the profile of the outer one)
+        return (
+            stage in self.stages and threading.current_thread() is threading.main_thread()
+            and getattr(self.active, "stage", None) is None
+        )
+
+    @contextmanager
+    def profile(self, stage):
+        self.active.stage = stage
+        try:
+            with self.run_profiler(stage):
+                yield
+        finally:
+            self.active.stage = None
+
+    @contextmanager
+    def run_profiler(self, stage):
+        if self.profiler_name == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = self.profilers.setdefault(stage, Profiler())
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+        else:
+            profiler = self.profilers.setdefault(stage, cProfile.Profile())
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+
+    def write(self, path_prefix):
+        for stage, profiler in self.profilers.items():
+            if self.profiler_name == "pyinstrument":
+                with open(f"{path_prefix}-{stage}.html", 'w') as file:
+                    file.write(profiler.output_html())
+            else:
+                profiler.dump_stats(f"{path_prefix}-{stage}.prof")
+
+metrics = Metrics()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=metrics.reset_after_fork)
+profiler = StageProfiler(
+    { stage.strip() for stage in os.getenv('PROFILE_STAGES', '').split(',') if stage.strip() },
+    os.getenv('PROFILER', 'cprofile')
+)
+
+@contextmanager
+def span(stage):
+    """Measures the time of the block and adds it to the stage."""
+    start = time.perf_counter()
+    try:
+        if profiler.is_profiled(stage):
+            with profiler.profile(stage):
+                yield
+        else:
+            yield
+    finally:
+        metrics.record(stage, time.perf_counter() - start)
+
+def count(name, value=1):
+    metrics.increment(name, value)
+
+def instrumented(stage):
+    """Decorator that measures every call of the function as the stage."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def write_metrics(run_name, folder=METRICS_PATH):
+    """
+    Saves the metrics of the run as <run_name>-<timestamp>.json and .csv (And the profiles of the profiled stages).
+    Returns the path of the JSON file.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path_prefix = os.path.join(folder, f"{run_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    span_rows = metrics.get_span_rows()
+
+    with open(f"{path_prefix}.json", 'w') as file:
+        json.dump({ "run": run_name, "spans": span_rows, "counters": metrics.get_counters() }, file, indent=2)
+
+    with open(f"{path_prefix}.csv", 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=["stage", "count", "total_seconds", "mean_seconds", "min_seconds", "max_seconds"])
+        writer.writeheader()
+        writer.writerows(span_rows)
+
+    profiler.write(path_prefix)
+    return f"{path_prefix}.json"
@@ -0,0 +1,100 @@
+import re
+import fitz
+
+from utils.pdf_extraction import DEFAULT_EXTRACTION
+
+''' Extraction of the UAT concepts of an article. The first page has a list like:
+    "Unified Astronomy Thesaurus concepts: Galaxy evolution (594); Quasars (1319)"
+    Only the "Name (id)" pairs that follow the heading (Within a window of characters) are read,
+    so stray numbers of the page (Footnotes, licences, years) are not taken as ids.
+'''
+
+# Start of the list. The "fi" may be a ligature or a separated span, so only the end of the heading is matched
+CONCEPTS_START_PATTERN = re.compile(r'Thesaurus\s+concepts\s*:')
+# "Name (id)" pair. The name may have balanced parentheses ("Mercury (planet)", "B(e) stars", "(433) Eros"),
+# so the pair ends at the first "(digits)" that isn't part of the name
+CONCEPT_PATTERN = r'((?:[^;()]|\([^()]*\)){1,120}?)\s*\(\s*(\d{1,6})\s*\)'
+# First pair of the list, and the next ones (Separated by ";")
+FIRST_CONCEPT_PATTERN = re.compile(r'\s*' + CONCEPT_PATTERN)
+NEXT_CONCEPT_PATTERN = re.compile(r'\s*;\s*' + CONCEPT_PATTERN)
+
+DEFAULT_WINDOW = 1500
+
+def parse_concepts(text, window=DEFAULT_WINDOW):
+    """
+    Parses the "Name (id)" pairs of the concepts list in the text.
+
+    :param window: Characters after the heading where the list is searched
+    :return: List of (name, id), in the order of the article
+    """
+    start_match = CONCEPTS_START_PATTERN.search(text)
+    if start_match is None:
+        return []
+
+    list_text = text[start_match.end():start_match.end() + window]
+    concepts = []
+    match = FIRST_CONCEPT_PATTERN.match(list_text)
+    while match is not None:
+        concepts.append((" ".join(match.group(1).split()), match.group(2)))
+        match = NEXT_CONCEPT_PATTERN.match(list_text, match.end())
+
+    return concepts
+
+def parse_concepts_from_spans(spans, window=DEFAULT_WINDOW):
+    """Same as parse_concepts, with the spans of a page (PyMuPDF dict format)."""
+    return parse_concepts(" ".join(span["text"] for span in spans), window)
+
+class KeywordsExtractor:
+    def __init__(self, thesaurus=None, window=DEFAULT_WINDOW, pages=1, extraction=DEFAULT_EXTRACTION):
+        """
+        Extracts the concept ids of the articles. With a thesaurus, only the ids of the thesaurus are returned
+        (An unknown id is looked up by the name of the concept).
+
+        :param window: Characters after the heading where the list is searched
+        :param pages: First pages of the PDF where the heading is searched
+        :param extraction: ExtractionProfile of the pages (Its keywords mode)
+        """
+        self.window = window
+        self.pages = pages
+        self.extraction = extraction
+        self.valid_ids = None
+        self.ids_by_name = {}
+        if thesaurus is not None:
+            self.valid_ids = set(thesaurus.get_terms().keys())
+            self.ids_by_name = { term.get_name().lower(): term_id for term_id, term in thesaurus.get_terms().items() }
+
+    def validate(self, concepts):
+        """Returns the ids of the (name, id) pairs found in the thesaurus, without duplicates."""
+        return self.validate_with_unknown(concepts)[0]
+
+    def validate_with_unknown(self, concepts):
+        """Same as validate, also returns the (name, id) pairs not found in the thesaurus (Neither by id nor by name)."""
+        ids = []
+        unknown_concepts = []
+        for name, concept_id in concepts:
+            valid_id = concept_id
+            if self.valid_ids is not None and concept_id not in self.valid_ids:
+                valid_id = self.ids_by_name.get(name.lower())
+            if valid_id is None:
+                unknown_concepts.append((name, concept_id))
+            elif valid_id not in ids:
+                ids.append(valid_id)
+        return ids, unknown_concepts
+
+    def extract_from_text(self, text):
+        return self.validate(parse_concepts(text, self.window))
+
+    def extract_from_spans(self, spans):
+        return self.validate(parse_concepts_from_spans(spans, self.window))
+
+    def extract_from_file(self, file_path):
+        """Opens the PDF and extracts the ids from its first pages (Stops at the first page with the list)."""
+        pdf_document = fitz.open(file_path)
+        try:
+            for page_number in range(min(self.pages, pdf_document.page_count)):
+                concepts = parse_concepts(self.extraction.get_keywords_text(pdf_document[page_number]), self.window)
+                if concepts:
+                    return self.validate(concepts)
+        finally:
+            pdf_document.close()
+        return []
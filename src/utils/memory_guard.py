@@ -0,0 +1,101 @@
+import gc
+import os
+import json
+import logging
+import threading
+import psutil
+
+log = logging.getLogger('my_logger')
+
+def get_rss_mb(pid=None, include_children=False):
+    """Resident memory (MB) of a process (The current one by default), optionally with all its children."""
+    process = psutil.Process(pid)
+    rss = process.memory_info().rss
+    if include_children:
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                continue
+    return rss / (1024 * 1024)
+
+def get_memory_limits_from_env():
+    """Reads the memory limits from the environment (MEMORY_SOFT_LIMIT_MB, MEMORY_HARD_LIMIT_MB, MEMORY_SAMPLE_SECONDS). 0 disables a limit."""
+    return {
+        "soft_limit_mb": float(os.getenv('MEMORY_SOFT_LIMIT_MB', 0)) or None,
+        "hard_limit_mb": float(os.getenv('MEMORY_HARD_LIMIT_MB', 0)) or None,
+        "sample_seconds": float(os.getenv('MEMORY_SAMPLE_SECONDS', 5)),
+    }
+
+def write_memory_report(entry, report_path='logs/memory_report.jsonl'):
+    """Appends an entry (e.g. the memory of a trained term) to the memory report, one JSON per line."""
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'a') as file:
+        file.write(json.dumps(entry) + "\n")
+
+class MemoryMonitor:
+    def __init__(self, soft_limit_mb=None, hard_limit_mb=None, sample_seconds=5, pid=None, include_children=False):
+        """
+        Samples the RSS of a process in a background thread and keeps its peak.
+        Over the soft limit a warning is logged (And the garbage is collected, if it's the current process).
+        Over the hard limit, hard_limit_exceeded is set so the owner can stop (A thread can't stop the process by itself).
+
+        :param pid: Process to sample (The current one by default)
+        :param include_children: Add the memory of the children (e.g. a pool of workers)
+        """
+        self.soft_limit_mb = soft_limit_mb
+        self.hard_limit_mb = hard_limit_mb
+        self.sample_seconds = sample_seconds
+        self.pid = pid
+        self.include_children = include_children
+        self.peak_mb = 0
+        self.hard_limit_exceeded = False
+        self.soft_limit_exceeded = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        rss_mb = get_rss_mb(self.pid, self.include_children)
+        self.peak_mb = max(self.peak_mb, rss_mb)
+
+        if self.soft_limit_mb and rss_mb >= self.soft_limit_mb:
+            if not self.soft_limit_exceeded:
+                log.warning(f"Memory over the soft limit: {rss_mb:.0f} MB of {self.soft_limit_mb:.0f} MB")
+            self.soft_limit_exceeded = True
+            if self.pid is None or self.pid == os.getpid():
+                gc.collect()
+        else:
+            self.soft_limit_exceeded = False
+
+        if self.hard_limit_mb and rss_mb >= self.hard_limit_mb and not self.hard_limit_exceeded:
+            log.error(f"Memory over the hard limit: {rss_mb:.0f} MB of {self.hard_limit_mb:.0f} MB")
+            self.hard_limit_exceeded = True
+
+        return rss_mb
+
+    def reset_peak(self):
+        self.peak_mb = get_rss_mb(self.pid, self.include_children)
+
+    def run(self):
+        while not self.stop_event.wait(self.sample_seconds):
+            try:
+                self.sample()
+            except psutil.NoSuchProcess:
+                break
+
+    def start(self):
+        self.sample()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
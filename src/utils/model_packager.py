@@ -0,0 +1,193 @@
+import os
+import hashlib
+import numpy as np
+import srsly
+import spacy
+from spacy.util import load_model_from_config
+from thinc.api import Config
+
+''' Packaging of the trained models of a folder (One spaCy pipeline per term, saved with nlp.to_disk).
+    Every pipeline has its own copy of the vocab, the tokenizer and the config, and its weights in float32.
+    The package keeps a single copy of them (The vocab has the strings of every model), and the weights of each model
+    in a .npy file that is memory-mapped when the model is loaded:
+
+    package/
+        manifest.json           Models of the package, with their config, tokenizer and components
+        vocab/                  Vocab shared by every model
+        shared/                 Configs and tokenizers, saved once by content
+        {term_id}/meta.json
+        {term_id}/{component}/cfg, model, weights.npy, weights.json
+'''
+
+WEIGHT_DTYPES = ("float32", "float16", "int8")
+
+def get_folder_size(folder):
+    """Size in bytes of the files of a folder (Recursively)."""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(folder) for name in names
+    )
+
+def get_model_folders(models_folder):
+    """Term ids of the models in the folder (Folders with a pipeline saved by spaCy)."""
+    return sorted(
+        name for name in os.listdir(models_folder)
+        if os.path.isfile(os.path.join(models_folder, name, "config.cfg"))
+    )
+
+def write_shared(output_folder, data, extension):
+    """Saves the data in the shared folder under its hash (Only once) and returns its path, relative to the package."""
+    relative_path = os.path.join("shared", hashlib.sha256(data).hexdigest()[:16] + extension)
+    path = os.path.join(output_folder, relative_path)
+    if not os.path.exists(path):
+        with open(path, 'wb') as file:
+            file.write(data)
+    return relative_path
+
+def encode_weights(array, dtype):
+    """Returns (flat encoded weights, scale). The int8 weights are symmetric and scaled per array."""
+    array = np.asarray(array, dtype=np.float32).ravel()
+    if dtype == "int8":
+        scale = float(np.abs(array).max()) / 127 if array.size else 0.0
+        if scale == 0.0:
+            return np.zeros(array.size, dtype=np.int8), 1.0
+        return np.clip(np.rint(array / scale), -127, 127).astype(np.int8), scale
+    return array.astype(dtype), 1.0
+
+def pack_component(component_folder, output_folder, dtype):
+    """
+    Splits the thinc model of a component in its structure (The msgpack without the params)
+    and its params (A single flat array in weights.npy, weights.json has where each one is).
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    with open(os.path.join(component_folder, "cfg"), 'rb') as file:
+        cfg = file.read()
+    with open(os.path.join(output_folder, "cfg"), 'wb') as file:
+        file.write(cfg)
+
+    with open(os.path.join(component_folder, "model"), 'rb') as file:
+        msg = srsly.msgpack_loads(file.read())
+
+    chunks = []
+    index = []
+    offset = 0
+    for node_index, params in enumerate(msg["params"]):
+        for name, value in params.items():
+            if value is None:
+                continue
+            weights, scale = encode_weights(value, dtype)
+            index.append({ "node": node_index, "name": name, "shape": list(np.shape(value)), "offset": offset, "size": weights.size, "scale": scale })
+            chunks.append(weights)
+            offset += weights.size
+            params[name] = None
+
+    weights = np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+    np.save(os.path.join(output_folder, "weights.npy"), weights)
+    srsly.write_json(os.path.join(output_folder, "weights.json"), { "dtype": dtype, "params": index })
+    with open(os.path.join(output_folder, "model"), 'wb') as file:
+        file.write(srsly.msgpack_dumps(msg))
+
+def pack_models(models_folder, output_folder, dtype="float16"):
+    """
+    Packs the models of the folder (e.g. ./models/summarize) in the output folder.
+
+    :param dtype: Type of the saved weights. float32 keeps the same predictions and loads without copying them,
+    float16 halves their size and int8 takes a quarter (Check the accuracy with the model_packing benchmark)
+    :return: Summary with the size (MB) of the models before and after
+    """
+    if dtype not in WEIGHT_DTYPES:
+        raise ValueError(f"Invalid weights type {dtype}, it must be one of {WEIGHT_DTYPES}")
+
+    term_ids = get_model_folders(models_folder)
+    os.makedirs(os.path.join(output_folder, "shared"), exist_ok=True)
+
+    vocab = None
+    manifest = { "dtype": dtype, "lang": None, "models": {} }
+    for term_id in term_ids:
+        model_folder = os.path.join(models_folder, term_id)
+
+        # The strings of every model are added to a single vocab
+        meta = srsly.read_json(os.path.join(model_folder, "meta.json"))
+        if vocab is None:
+            manifest["lang"] = meta["lang"]
+            vocab = spacy.blank(meta["lang"]).vocab.from_disk(os.path.join(model_folder, "vocab"))
+        else:
+            for string in srsly.read_json(os.path.join(model_folder, "vocab", "strings.json")):
+                vocab.strings.add(string)
+
+        with open(os.path.join(model_folder, "config.cfg"), 'rb') as file:
+            config_path = write_shared(output_folder, file.read(), ".cfg")
+        with open(os.path.join(model_folder, "tokenizer"), 'rb') as file:
+            tokenizer_path = write_shared(output_folder, file.read(), ".tokenizer")
+
+        os.makedirs(os.path.join(output_folder, term_id), exist_ok=True)
+        srsly.write_json(os.path.join(output_folder, term_id, "meta.json"), meta)
+        for component in meta["components"]:
+            pack_component(os.path.join(model_folder, component), os.path.join(output_folder, term_id, component), dtype)
+
+        manifest["models"][term_id] = { "config": config_path, "tokenizer": tokenizer_path, "components": meta["components"] }
+
+    if vocab is not None:
+        vocab.to_disk(os.path.join(output_folder, "vocab"))
+    srsly.write_json(os.path.join(output_folder, "manifest.json"), manifest)
+
+    return {
+        "models": len(term_ids),
+        "dtype": dtype,
+        "size_before_mb": get_folder_size(models_folder) / (1024 * 1024),
+        "size_after_mb": get_folder_size(output_folder) / (1024 * 1024),
+    }
+
+class PackedModels:
+    def __init__(self, packed_folder):
+        """
+        Loads the models of a package (See pack_models). The vocab, configs and tokenizers are read once for all of them,
+        and the weights are memory-mapped (float32 weights are used as they are, the others are converted when loaded).
+        """
+        self.packed_folder = packed_folder
+        self.manifest = srsly.read_json(os.path.join(packed_folder, "manifest.json"))
+        # The vocab of the language computes the attributes of the words (Norm, prefix, suffix, shape) used by the models
+        self.vocab = spacy.blank(self.manifest.get("lang", "en")).vocab.from_disk(os.path.join(packed_folder, "vocab"))
+        self.shared = {}
+
+    def get_term_ids(self):
+        return list(self.manifest["models"].keys())
+
+    def has_model(self, term_id):
+        return term_id in self.manifest["models"]
+
+    def read_shared(self, relative_path):
+        if relative_path not in self.shared:
+            with open(os.path.join(self.packed_folder, relative_path), 'rb') as file:
+                self.shared[relative_path] = file.read()
+        return self.shared[relative_path]
+
+    def load_component(self, pipe, component_folder):
+        pipe.cfg.update(srsly.read_json(os.path.join(component_folder, "cfg")))
+        with open(os.path.join(component_folder, "model"), 'rb') as file:
+            pipe.model.from_bytes(file.read())
+
+        weights_index = srsly.read_json(os.path.join(component_folder, "weights.json"))
+        # Copy-on-write mapping: thinc needs writable arrays, but the pages are only read from the file when used
+        weights = np.load(os.path.join(component_folder, "weights.npy"), mmap_mode='c')
+        nodes = list(pipe.model.walk())
+        for param in weights_index["params"]:
+            value = weights[param["offset"]:param["offset"] + param["size"]].reshape(param["shape"])
+            if weights_index["dtype"] == "int8":
+                value = value.astype(np.float32) * np.float32(param["scale"])
+            elif weights_index["dtype"] != "float32":
+                value = value.astype(np.float32)
+            nodes[param["node"]].set_param(param["name"], value)
+
+    def load(self, term_id):
+        """Returns the spaCy pipeline of the term (It uses the shared vocab, so it can't be trained further)."""
+        entry = self.manifest["models"][term_id]
+        model_folder = os.path.join(self.packed_folder, term_id)
+
+        config = Config().from_str(self.read_shared(entry["config"]).decode("utf-8"))
+        nlp = load_model_from_config(config, vocab=self.vocab, meta=srsly.read_json(os.path.join(model_folder, "meta.json")))
+        nlp.tokenizer.from_bytes(self.read_shared(entry["tokenizer"]), exclude=["vocab"])
+        for component in entry["components"]:
+            self.load_component(nlp.get_pipe(component), os.path.join(model_folder, component))
+
+        return nlp
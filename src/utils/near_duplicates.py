@@ -0,0 +1,89 @@
+import os
+import re
+import zlib
+import hashlib
+import numpy as np
+
+''' Near-duplicate detection of the articles (Preprint and final versions, the same PDF twice with different names).
+    Each full text gets a MinHash signature of its word shingles: the Jaccard similarity of the shingles of two texts
+    is estimated as the fraction of equal values of their signatures. The signature is split in bands, and two texts
+    that share the hash of a band are candidates (LSH), so a new text is only compared with a few others.
+    With 32 bands of 4 rows, texts with a similarity of 0.7 are candidates with a probability > 0.999,
+    and unrelated articles (Similarity < 0.1) with < 0.004.
+    The texts with few shingles (A failed extraction, an empty page) aren't signed: their signatures would be equal
+    or almost equal to each other, so they would be taken as near-duplicates of each other.
+'''
+
+NUM_PERMUTATIONS = 128
+BANDS = 32
+SHINGLE_SIZE = 5
+# Texts with fewer shingles (~50 words) have no signature
+MIN_SHINGLES = 50
+# Changing 1 of 40 words of a text gives a similarity of ~0.78 (Each word is in 5 shingles)
+DEFAULT_THRESHOLD = 0.7
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+WORD_PATTERN = re.compile(r'\w+')
+
+class MinHasher:
+    def __init__(self, num_permutations=NUM_PERMUTATIONS, shingle_size=SHINGLE_SIZE, min_shingles=MIN_SHINGLES, seed=1, chunk_size=4096):
+        """
+        :param num_permutations: Values of each signature (Must be a multiple of the bands)
+        :param shingle_size: Words of each shingle
+        :param min_shingles: Texts with fewer distinct shingles aren't signed
+        :param seed: Seed of the permutations (The signatures are only comparable with the same seed)
+        :param chunk_size: Shingles hashed at a time (Bounds the memory of the permutations matrix)
+        """
+        generator = np.random.RandomState(seed)
+        # a * hash + b fits in 64 bits (The hashes are 32 bits), the modulo makes them universal hashes
+        self.a = generator.randint(1, MAX_HASH, num_permutations, dtype=np.uint64)
+        self.b = generator.randint(0, MAX_HASH, num_permutations, dtype=np.uint64)
+        self.num_permutations = num_permutations
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+        self.chunk_size = chunk_size
+
+    def get_shingle_hashes(self, text):
+        """crc32 of each shingle (Lowercase words), the same in every process."""
+        words = WORD_PATTERN.findall(text.lower())
+        if len(words) <= self.shingle_size:
+            shingles = [" ".join(words)] if words else []
+        else:
+            shingles = (" ".join(words[index:index + self.shingle_size]) for index in range(len(words) - self.shingle_size + 1))
+        return np.unique(np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64))
+
+    def get_signature(self, text):
+        """MinHash signature of the text (uint32 array), or None if the text has fewer than min_shingles shingles."""
+        hashes = self.get_shingle_hashes(text or "")
+        if len(hashes) < max(self.min_shingles, 1):
+            return None
+
+        signature = np.full(self.num_permutations, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), self.chunk_size):
+            chunk = hashes[start:start + self.chunk_size, np.newaxis]
+            permuted = (chunk * self.a + self.b) % np.uint64(MERSENNE_PRIME) & np.uint64(MAX_HASH)
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+def get_duplicate_threshold_from_env():
+    """Reads the threshold from the environment (NEAR_DUPLICATE_THRESHOLD). None if it's empty or 0 (The detection is disabled)."""
+    threshold = os.getenv('NEAR_DUPLICATE_THRESHOLD', str(DEFAULT_THRESHOLD)).strip()
+    return (float(threshold) or None) if threshold else None
+
+def get_similarity(signature, other_signature):
+    """Estimated Jaccard similarity of the shingles of two texts."""
+    return float(np.mean(signature == other_signature))
+
+def get_band_hashes(signature, bands=BANDS):
+    """Hash of each band of the signature, as signed 64 bits integers (So they can be saved as BIGINT)."""
+    return [
+        int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "big", signed=True)
+        for band in np.asarray(signature, dtype=np.uint32).reshape(bands, -1)
+    ]
+
+def signature_to_bytes(signature):
+    return np.asarray(signature, dtype=np.uint32).tobytes()
+
+def signature_from_bytes(data):
+    return np.frombuffer(data, dtype=np.uint32)
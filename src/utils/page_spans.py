@@ -0,0 +1,153 @@
+import numpy as np
+
+''' Columnar representation of the spans of a page, used by the cleaning rules of the parser.
+    The texts are a list and the rest of the properties a NumPy structured array (The font as an interned id),
+    with a keep mask instead of deleting the spans. Each rule works on a SpanView: the spans kept when it starts,
+    with its properties as arrays, so the rules find their matches with masks instead of looping over dicts.
+'''
+
+SPAN_DTYPE = np.dtype([
+    ("font_id", np.int32),
+    ("size", np.float64), # Compared with the exact sizes of the journals, so it's not reduced
+    ("color", np.int32),
+    ("bbox", np.float32, 4),
+])
+
+FONT_FLAGS_DTYPE = np.dtype([
+    ("bold", bool), # ".B" in the name, as the rules check it
+    ("italic", bool), # ".I" in the name
+    ("bold_text", bool), # Any bold font ("Bold", ".B" or "Black"), for the bold texts of the article
+    ("equation", bool),
+])
+
+class FontTable:
+    def __init__(self, equation_fonts):
+        """Interned font names, with the flags used by the rules computed once for each font."""
+        self.equation_fonts = set(equation_fonts)
+        self.ids = {}
+        self.flags = np.zeros(0, dtype=FONT_FLAGS_DTYPE)
+
+    def get_id(self, font_name):
+        font_id = self.ids.get(font_name)
+        if font_id is None:
+            font_id = len(self.ids)
+            self.ids[font_name] = font_id
+            flags = np.array([(
+                ".B" in font_name,
+                ".I" in font_name,
+                "Bold" in font_name or ".B" in font_name or "Black" in font_name,
+                font_name in self.equation_fonts,
+            )], dtype=FONT_FLAGS_DTYPE)
+            self.flags = np.concatenate([self.flags, flags])
+        return font_id
+
+class PageSpans:
+    def __init__(self, texts, spans, fonts):
+        """
+        :param texts: Text of each span
+        :param spans: Structured array (SPAN_DTYPE) with the rest of the properties of each span
+        :param fonts: FontTable of the font ids
+        """
+        self.texts = texts
+        self.spans = spans
+        self.fonts = fonts
+        self.keep = np.ones(len(texts), dtype=bool)
+        # False when the header or the footer of the page weren't extracted (See ExtractionProfile.clip_margins)
+        self.has_header = True
+        self.has_footer = True
+
+    @classmethod
+    def from_blocks(cls, blocks, fonts):
+        """Loads the spans of the blocks of a page (page.get_text("dict")["blocks"])."""
+        texts = []
+        rows = []
+        for block in blocks:
+            for line in block.get("lines", ()):
+                for span in line["spans"]:
+                    texts.append(span["text"])
+                    rows.append((fonts.get_id(span["font"]), span["size"], span["color"], span["bbox"]))
+        return cls(texts, np.array(rows, dtype=SPAN_DTYPE), fonts)
+
+    def __len__(self):
+        return int(self.keep.sum())
+
+    def get_font_flags(self):
+        return self.fonts.flags[self.spans["font_id"]]
+
+    def get_bold_texts(self):
+        """Texts of all the spans (Kept or not) with a bold font."""
+        return [self.texts[index] for index in np.flatnonzero(self.get_font_flags()["bold_text"])]
+
+    def get_texts(self):
+        """Texts of the kept spans."""
+        return [self.texts[index] for index in np.flatnonzero(self.keep)]
+
+    def replace(self, index, text, size, font_id, color):
+        self.texts[index] = text
+        self.spans[index] = (font_id, size, color, (0, 0, 0, 0))
+
+class SpanView:
+    def __init__(self, page_spans):
+        """
+        The spans kept when a rule starts. The rules remove ranges of the view (The positions are the ones of the view)
+        and apply them to the page at the end. As the rules move forward, the spans after the current one are never removed,
+        so the next spans of a position are the next positions of the view (get_text looks behind over the removed ones).
+        """
+        self.page_spans = page_spans
+        self.indexes = np.flatnonzero(page_spans.keep)
+        self.texts = [page_spans.texts[index] for index in self.indexes]
+        spans = page_spans.spans[self.indexes]
+        self.sizes = spans["size"]
+        self.colors = spans["color"]
+        self.flags = page_spans.fonts.flags[spans["font_id"]]
+        self.removed = np.zeros(len(self.indexes), dtype=bool)
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def match(self, pattern):
+        """Mask of the texts that match the compiled pattern (At the start)."""
+        return np.fromiter((pattern.match(text) is not None for text in self.texts), dtype=bool, count=len(self.texts))
+
+    def search(self, pattern):
+        return np.fromiter((pattern.search(text) is not None for text in self.texts), dtype=bool, count=len(self.texts))
+
+    def contains(self, *substrings):
+        """Mask of the texts that contain any of the substrings."""
+        return np.fromiter((any(substring in text for substring in substrings) for text in self.texts), dtype=bool, count=len(self.texts))
+
+    def find(self, positions, start):
+        """First of the positions (Sorted) from start, or None."""
+        index = np.searchsorted(positions, start)
+        return int(positions[index]) if index < len(positions) else None
+
+    def get_index(self, position):
+        """Index of the position in the spans that are left (As in a list where the removed spans were deleted)."""
+        return position - int(self.removed[:position].sum())
+
+    def is_page_start(self, position):
+        """Whether the position is the first span left in the page (Never when the header of the page wasn't extracted)."""
+        return self.page_spans.has_header and self.get_index(position) == 0
+
+    def get_text(self, position, offset):
+        """Text of the span offset places away from the position, in the spans that are left (Negative indexes wrap around as in a list)."""
+        left = np.flatnonzero(~self.removed)
+        index = self.get_index(position) + offset
+        if -len(left) <= index < len(left):
+            return self.texts[left[index]]
+        return None
+
+    def remove(self, start, end):
+        self.removed[start:end] = True
+
+    def remove_mask(self, mask):
+        self.removed |= mask
+
+    def replace(self, position, text, size, font_id, color):
+        self.texts[position] = text
+        self.page_spans.replace(self.indexes[position], text, size, font_id, color)
+
+    def apply(self):
+        """Removes the spans from the page and returns it."""
+        self.page_spans.keep[self.indexes[self.removed]] = False
+        return self.page_spans
@@ -0,0 +1,46 @@
+import os
+import fitz
+
+''' Options of the extraction of the pages with MuPDF (page.get_text).
+    By default "dict" also extracts the images of the page (Decoded and returned as blocks that the parser skips),
+    the text flags of the profile leave them out. With clip_margins, the pages are only extracted inside the body area
+    of the document, so the header and the footer (Removed later by the cleaning rules) are not extracted.
+'''
+
+# The flags of "dict" without TEXT_PRESERVE_IMAGES. The ligatures and whitespace are kept, the parser relies on them
+TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+KEYWORDS_MODES = ("text", "blocks")
+
+class ExtractionProfile:
+    def __init__(self, flags=TEXT_FLAGS, clip_margins=False, keywords_mode="text"):
+        """
+        :param flags: MuPDF text flags of the extraction (fitz.TEXTFLAGS_DICT to extract the images as before)
+        :param clip_margins: Extract the pages after the second one only inside the body area learned from the second one.
+        The rules that end at the header of the page (Tables) or remove the footer (Page numbers) may remove less text
+        :param keywords_mode: Mode of get_text for the pages that are only read for their concepts (KeywordsExtractor)
+        """
+        if keywords_mode not in KEYWORDS_MODES:
+            raise ValueError(f"Invalid keywords mode {keywords_mode}, it must be one of {KEYWORDS_MODES}")
+        self.flags = flags
+        self.clip_margins = clip_margins
+        self.keywords_mode = keywords_mode
+
+    def get_blocks(self, page, clip=None):
+        return page.get_text("dict", flags=self.flags, clip=clip)["blocks"]
+
+    def get_keywords_text(self, page):
+        """Text of a page where only the concepts are searched."""
+        if self.keywords_mode == "blocks":
+            return "\n".join(block[4] for block in page.get_text("blocks", flags=self.flags))
+        return page.get_text("text", flags=self.flags)
+
+DEFAULT_EXTRACTION = ExtractionProfile()
+
+def get_extraction_profile_from_env():
+    """Reads the extraction profile from the environment (PDF_EXTRACT_IMAGES, PDF_CLIP_MARGINS, PDF_KEYWORDS_MODE)."""
+    extract_images = os.getenv('PDF_EXTRACT_IMAGES', 'false').lower() == 'true'
+    return ExtractionProfile(
+        flags=fitz.TEXTFLAGS_DICT if extract_images else TEXT_FLAGS,
+        clip_margins=os.getenv('PDF_CLIP_MARGINS', 'false').lower() == 'true',
+        keywords_mode=os.getenv('PDF_KEYWORDS_MODE', 'text'),
+    )
@@ -2,14 +2,29 @@ import fitz
 import re
 import json
 import os
+import time
+import hashlib
 import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from datetime import timedelta
 
 from Database.File import File
 from Database.Keyword import Keyword
+from Database.TermFile import TermFile
+from Database.IngestionLedger import IngestionLedger
+from Database.FileSignature import FileSignature
+from utils import instrumentation
 from utils.articles_parser import get_abstract_from_file, get_full_text_from_file
+from utils.keywords_extractor import KeywordsExtractor
+from utils.pdf_extraction import DEFAULT_EXTRACTION
+from utils.near_duplicates import MinHasher, DEFAULT_THRESHOLD
+from utils.memory_guard import MemoryMonitor
 
 PDFS_PATH = './PDFs'
 
+# Same permutations in every worker, so the signatures can be compared
+min_hasher = MinHasher()
+
 # Logging, change log level if needed
 logging.basicConfig(filename='logs/file_generation.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 log = logging.getLogger('my_logger')
@@ -21,9 +36,57 @@ def count_files(pdf_directory):
             count += 1
     return count
 
-def upload_data(pdf_directory, thesaurus, database):
+def hash_file(file_path):
+    """sha256 of the file content (Read in blocks, PDFs can be big)."""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def parse_file(pdf_directory, filename, extraction=DEFAULT_EXTRACTION):
+    """
+    Runs in a worker process. Gets the necessary information from the PDF file.
+    Returns (content_hash, abstract, full_text, concepts, signature, metrics), the metrics of the worker are aggregated in the run.
+    """
+    file_path = os.path.join("PDFs", filename)
+    content_hash = hash_file(os.path.join(pdf_directory, filename))
+    full_text, _ = get_full_text_from_file(file_path, extraction=extraction)
+    abstract, concepts = get_abstract_from_file(file_path, True, extraction)
+    with instrumentation.span("parser.minhash"):
+        signature = min_hasher.get_signature(full_text)
+    return content_hash, abstract, full_text, concepts, signature, instrumentation.metrics.pop_snapshot()
+
+def log_progress(processed, total, start_time):
+    elapsed = time.perf_counter() - start_time
+    files_per_second = processed / elapsed if elapsed > 0 else 0
+    eta = (total - processed) / files_per_second if files_per_second > 0 else 0
+    message = f"Processed {processed} of {total} files ({files_per_second:.2f} files/s, ETA {timedelta(seconds=int(eta))})"
+    print(message, flush=True)
+    log.info(message)
+
+def upload_data(pdf_directory, thesaurus, database, workers=1, max_attempts=3, verify_hashes=False, max_files_per_worker=None,
+                soft_limit_mb=None, hard_limit_mb=None, sample_seconds=5, extraction=DEFAULT_EXTRACTION, duplicate_threshold=DEFAULT_THRESHOLD):
+    """
+    Parses the PDFs and saves their texts and keywords in the database. Every file is recorded in the ingestion ledger,
+    so a new run skips the files already done and retries the failed ones (Up to max_attempts).
+
+    :param workers: Quantity of processes parsing PDFs (The database is only written by this process)
+    :param verify_hashes: Also process again the done files whose PDF changed (Reads every PDF to hash it)
+    :param max_files_per_worker: Each worker is replaced by a new one after parsing this quantity of files
+    :param soft_limit_mb: A warning is logged when the RSS of the process and its workers reaches it
+    :param hard_limit_mb: No more files are parsed when the RSS reaches it, the run stops with a MemoryError
+    (The files in flight are saved, so the next run resumes from there)
+    :param extraction: ExtractionProfile of the pages (Flags of MuPDF and clipping of the margins)
+    :param duplicate_threshold: Files whose full text has this similarity with a file ingested before are saved as its near-duplicates,
+    and not rolled up to the terms (So they're not used for training). None disables the detection
+    """
     file_db = File(database)
     keyword_db = Keyword(database)
+    term_file_db = TermFile(database, thesaurus)
+    ledger = IngestionLedger(database)
+    file_signature_db = FileSignature(database)
+    keywords_extractor = KeywordsExtractor(thesaurus)
 
     root_term = thesaurus.get_by_id("1")
     root_term_children = root_term.get_children()
@@ -39,50 +102,91 @@ def upload_data(pdf_directory, thesaurus, database):
             log.error(f"Error processing children of {children_id}: {e}")
             continue
 
-    file_count = count_files(pdf_directory)
-    log.info(f"Saving in db with {file_count} files.")
+    filenames = { filename.replace(".pdf", ""): filename for filename in os.listdir(pdf_directory) if filename.endswith(".pdf") }
+    content_hashes = None
+    if verify_hashes:
+        content_hashes = { file_id: hash_file(os.path.join(pdf_directory, filename)) for file_id, filename in filenames.items() }
 
-    count = 0
-    for filename in os.listdir(pdf_directory):
-        if (count % 50 == 0):
-            log.info(f"Processing file {count} of {file_count}")
+    pending_file_ids = ledger.get_pending(sorted(filenames.keys()), max_attempts, content_hashes)
+    file_count = len(pending_file_ids)
+    log.info(f"Saving in db with {file_count} files ({len(filenames) - file_count} skipped by the ingestion ledger).")
+    print(f"Files to process: {file_count} of {len(filenames)}", flush=True)
 
-        if filename.endswith(".pdf"):
-            try:
-                file_id = filename.replace(".pdf", "")
-                pdf_file_path = os.path.join(pdf_directory, filename)
-                file_path = os.path.join("PDFs", filename)
-
-                # Open the PDF file
-                pdf_document = fitz.open(pdf_file_path)
-                print("Processing file ID:", filename)
-                log.info(f"Processing file ID: {filename}")
-
-                # Get the necessary information from the PDF file
-                try:
-                    full_text = get_full_text_from_file(file_path)
-                    abstract, keywords = get_abstract_from_file(file_path, True)
-                except Exception as e:
-                    log.error(f"Error processing file {filename}: {e}")
-                    print("Error processing file", filename, e)
-                    continue
-
-                result = file_db.add(file_id=file_id, abstract=abstract, full_text=full_text)
-                if result != False:
-                    for keyword in keywords:
-                        if keyword in root_term_children or keyword in root_term_grandchildren:
-                            keyword_db.add(file_id=file_id, keyword_id=keyword, order=1)
-                        else:
-                            keyword_db.add(file_id=file_id, keyword_id=keyword, order=2)
-
-                pdf_document.close()
-                count += 1
-
-            except Exception as e:
-                # Guardar el nombre del archivo que generó el error junto con el error en el log
-                log.error(f"Error processing file {filename}: {e}")
+    def save_file(file_id, parse_future):
+        try:
+            content_hash, abstract, full_text, concepts, signature, worker_metrics = parse_future.result()
+            instrumentation.metrics.merge(worker_metrics)
+        except Exception as e:
+            log.error(f"Error processing file {filenames[file_id]}: {e}")
+            print("Error processing file", filenames[file_id], e)
+            ledger.mark_failed(file_id, None, e)
+            return
+
+        # Only the ids of the thesaurus are saved (An unknown id is looked up by the name of the concept)
+        keywords, unknown_concepts = keywords_extractor.validate_with_unknown(concepts)
+        if unknown_concepts:
+            log.warning(f"Keywords of file {file_id} not found in the thesaurus: {unknown_concepts}")
+
+        if not file_db.add(file_id=file_id, abstract=abstract, full_text=full_text):
+            ledger.mark_failed(file_id, content_hash, "Error adding file")
+            return
+
+        # A text too short to be signed isn't compared (Nor indexed)
+        duplicate_of = None
+        if duplicate_threshold is not None and signature is not None:
+            duplicate_of, similarity = file_signature_db.find_duplicate(file_id, signature, duplicate_threshold)
+            file_signature_db.add(file_id, signature, duplicate_of, similarity)
+            if duplicate_of is not None:
+                instrumentation.count("ingest.near_duplicates")
+                log.info(f"File {file_id} is a near-duplicate of {duplicate_of} (Similarity {similarity:.2f}), it won't be used for training")
+        else:
+            # The signature of a previous ingest would keep the file (Or its duplicates) out of training
+            _, original_id = file_signature_db.remove(file_id)
+            if original_id is not None:
+                log.info(f"File {original_id} isn't a near-duplicate anymore, {file_id} has no signature")
+                term_file_db.add_file(original_id, keyword_db.get_keyword_ids_by_file_id(original_id))
+
+        keyword_orders = [
+            (keyword, 1 if keyword in root_term_children or keyword in root_term_grandchildren else 2)
+            for keyword in keywords
+        ]
+        # Roll up the file to all the ancestors of its keywords (A near-duplicate isn't rolled up)
+        if keyword_db.set_by_file_id(file_id, keyword_orders) and term_file_db.add_file(file_id, keywords if duplicate_of is None else []):
+            ledger.mark_done(file_id, content_hash)
+        else:
+            ledger.mark_failed(file_id, content_hash, "Error adding keywords")
+
+    start_time = time.perf_counter()
+    processed = 0
+    monitor = MemoryMonitor(soft_limit_mb, hard_limit_mb, sample_seconds, include_children=True)
+    with monitor, ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=max_files_per_worker) as executor:
+        # At most two files per worker are parsed ahead, so the parsed texts in memory stay bounded
+        in_flight = {}
+        for file_id in pending_file_ids:
+            if monitor.hard_limit_exceeded:
+                break
+            in_flight[executor.submit(parse_file, pdf_directory, filenames[file_id], extraction)] = file_id
+            if len(in_flight) < workers * 2:
                 continue
 
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for parse_future in done:
+                save_file(in_flight.pop(parse_future), parse_future)
+                processed += 1
+                if processed % 50 == 0:
+                    log_progress(processed, file_count, start_time)
+
+        for parse_future in as_completed(list(in_flight)):
+            save_file(in_flight.pop(parse_future), parse_future)
+            processed += 1
+            if processed % 50 == 0:
+                log_progress(processed, file_count, start_time)
+
+    log_progress(processed, file_count, start_time)
+    log.info(f"Peak RSS of the ingestion (With the workers): {monitor.peak_mb:.0f} MB")
+    if monitor.hard_limit_exceeded:
+        raise MemoryError(f"Memory over the hard limit of {hard_limit_mb} MB, run the generate mode again to resume")
+
     # Iterates over all the keywords_ids of the thesaurus and if does not exist, saves the keywords with empty documents
     try:
         all_keywords_id = list(thesaurus.get_terms().keys())
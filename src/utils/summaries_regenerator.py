@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from Database.AsyncFile import AsyncFile
+from utils import instrumentation
+
+# Logging, change log level if needed
+logging.basicConfig(filename='logs/file_generation.log', level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+log = logging.getLogger('my_logger')
+
+# Summarizer of each worker process (spaCy models can't be shared between processes)
+summarizer = None
+
+def init_summarizer():
+    global summarizer
+    from InputCreators.SummarizeInputCreator import SummarizeInputCreator
+    summarizer = SummarizeInputCreator()
+
+def summarize_files(files):
+    """
+    Runs in a worker process. Returns ({ file_id: summary }, metrics) for the files that could be summarized,
+    the metrics of the worker are sent back to be aggregated in the run.
+    """
+    summaries = {}
+    for file_id, full_text in files:
+        try:
+            summaries[file_id] = summarizer.summarize_text(full_text, 0.25, max_sentences=100, additional_stopwords={"specific", "unnecessary", "technical"})
+        except Exception as e:
+            print(f"Error processing file_id {file_id}: {e}")
+    return summaries, instrumentation.metrics.pop_snapshot()
+
+async def save_summaries(file_db, summaries_future):
+    summaries, worker_metrics = await summaries_future
+    instrumentation.metrics.merge(worker_metrics)
+    instrumentation.count("summarization.files", len(summaries))
+    if await file_db.update_summaries(summaries):
+        log.info(f"Updated summarized_text for {len(summaries)} files")
+
+async def regenerate_summaries(database, workers=1, chunk_size=10):
+    """
+    Regenerates the summarized_text of every file (Except the near-duplicates, they're not used for training).
+    The full texts are read in chunks while the previous chunks are being summarized in the worker processes,
+    and the summaries are written back in bulk.
+
+    :param database: AsyncDatabase
+    :param workers: Quantity of processes summarizing texts
+    :param chunk_size: Quantity of files sent to a worker at a time
+    The database is closed when the regeneration finishes.
+    """
+    file_db = AsyncFile(database)
+    loop = asyncio.get_running_loop()
+    pending = set()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_summarizer) as executor:
+        async for files in file_db.iter_texts_in_chunks("full_text", chunk_size, skip_duplicates=True):
+            files_with_text = []
+            for file_id, full_text in files:
+                if not full_text:  # Ignorar archivos sin texto
+                    print(f"No full_text found for file_id {file_id}")
+                    continue
+                files_with_text.append((file_id, full_text))
+
+            summaries_future = loop.run_in_executor(executor, summarize_files, files_with_text)
+            pending.add(asyncio.ensure_future(save_summaries(file_db, summaries_future)))
+
+            # Keep at most two chunks per worker in flight, so the texts read ahead stay bounded
+            if len(pending) >= workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+
+        await asyncio.gather(*pending)
+
+    await database.close()
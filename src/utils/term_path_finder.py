@@ -1,9 +1,7 @@
-import gc
 import sys
 from UATMapper import UATMapper
 
 if __name__ == '__main__':
-    gc.set_debug(gc.DEBUG_SAVEALL)
 
     # This term (modified a bit on the json) has 11 children that covers the whole thesaurus
     mapper = UATMapper("./data/UAT-filtered.json")
@@ -0,0 +1,144 @@
+import os
+import json
+import shutil
+import logging
+
+from UATMapper import UATMapper
+
+''' Differences between two versions of the thesaurus, and the models they make stale.
+    The model of a term classifies into its children (narrower), and the files of a child are the ones with a keyword
+    that is the child or one of its descendants (The keywords are rolled up to their ancestors through broader).
+    So a model is stale when its children changed, or when the terms under one of its children changed
+    (A term added, removed or moved under it). Every other model is trained with the same labels and files.
+'''
+
+log = logging.getLogger('my_logger')
+
+def get_narrower_by_broader(thesaurus):
+    """{ term_id: [term ids that have it as a parent] }, the inverse of the broader links (The ones the roll-up follows)."""
+    narrower = {}
+    for term in thesaurus.get_terms().values():
+        for parent_id in term.get_parents():
+            narrower.setdefault(parent_id, []).append(term.get_id())
+    return narrower
+
+def get_rolled_up_terms(narrower, term_id):
+    """The term and every term under it, the keywords whose files are rolled up to the term."""
+    terms = { term_id }
+    pending = [term_id]
+    while pending:
+        for child_id in narrower.get(pending.pop(), []):
+            if child_id not in terms:
+                terms.add(child_id)
+                pending.append(child_id)
+    return terms
+
+class ThesaurusDiff:
+    def __init__(self, old_thesaurus, new_thesaurus):
+        """
+        Compares two versions of the thesaurus.
+
+        added / removed: Term ids only in the new / old version
+        moved: Terms of both versions whose parents (broader) changed
+        children_changed: Terms of both versions whose children (narrower) changed
+        """
+        self.old_thesaurus = old_thesaurus
+        self.new_thesaurus = new_thesaurus
+        old_ids = set(old_thesaurus.get_terms())
+        new_ids = set(new_thesaurus.get_terms())
+        common_ids = old_ids & new_ids
+
+        self.added = sorted(new_ids - old_ids)
+        self.removed = sorted(old_ids - new_ids)
+        self.moved = sorted(
+            term_id for term_id in common_ids
+            if set(old_thesaurus.get_by_id(term_id).get_parents()) != set(new_thesaurus.get_by_id(term_id).get_parents())
+        )
+        self.children_changed = sorted(
+            term_id for term_id in common_ids
+            if set(old_thesaurus.get_by_id(term_id).get_children()) != set(new_thesaurus.get_by_id(term_id).get_children())
+        )
+        self.rolled_up_changed = self.get_rolled_up_changed()
+
+    def get_rolled_up_changed(self):
+        """
+        Terms whose rolled up terms changed (So their files change). Only the ancestors of the added, removed and moved terms
+        (In either version) can change, and only those are compared.
+        """
+        old_narrower = get_narrower_by_broader(self.old_thesaurus)
+        new_narrower = get_narrower_by_broader(self.new_thesaurus)
+
+        candidates = set()
+        for term_id in set(self.added) | set(self.removed) | set(self.moved):
+            candidates |= { term_id } | self.old_thesaurus.get_ancestors(term_id) | self.new_thesaurus.get_ancestors(term_id)
+
+        return {
+            term_id for term_id in candidates
+            if get_rolled_up_terms(old_narrower, term_id) != get_rolled_up_terms(new_narrower, term_id)
+        }
+
+    def get_stale_models(self):
+        """Terms of the new version whose model has to be trained again (Its labels or the files of one of them changed)."""
+        stale = set()
+        for term_id, term in self.new_thesaurus.get_terms().items():
+            children = term.get_children()
+            if not children:
+                continue
+            old_term = self.old_thesaurus.get_by_id(term_id)
+            if old_term is None or set(old_term.get_children()) != set(children):
+                stale.add(term_id)
+            elif any(child_id in self.rolled_up_changed for child_id in children):
+                stale.add(term_id)
+
+        return sorted(stale)
+
+    def get_obsolete_models(self):
+        """Terms whose model isn't needed anymore (Removed, or without children in the new version)."""
+        return sorted(
+            term_id for term_id, term in self.old_thesaurus.get_terms().items()
+            if term.get_children() and not (self.new_thesaurus.get_by_id(term_id) and self.new_thesaurus.get_by_id(term_id).get_children())
+        )
+
+    def to_dict(self):
+        return {
+            "added": self.added,
+            "removed": self.removed,
+            "moved": self.moved,
+            "children_changed": self.children_changed,
+            "stale_models": self.get_stale_models(),
+            "obsolete_models": self.get_obsolete_models(),
+        }
+
+def diff_thesaurus_files(old_path, new_path):
+    """Diff of two UAT json files."""
+    return ThesaurusDiff(UATMapper(old_path).map_to_thesaurus(), UATMapper(new_path).map_to_thesaurus())
+
+def invalidate_models(term_ids, models_folder, stale_folder=None):
+    """
+    Moves the models of the terms to the stale folder (models_folder + '-stale' by default), so the training,
+    that skips the models that exist, trains them again. A previous stale copy of a model is replaced.
+
+    :return: Term ids of the models moved
+    """
+    stale_folder = stale_folder or models_folder.rstrip("/") + "-stale"
+    moved = []
+    for term_id in term_ids:
+        model_path = os.path.join(models_folder, term_id)
+        if not os.path.isdir(model_path):
+            continue
+
+        stale_path = os.path.join(stale_folder, term_id)
+        if os.path.exists(stale_path):
+            shutil.rmtree(stale_path)
+        os.makedirs(stale_folder, exist_ok=True)
+        shutil.move(model_path, stale_path)
+        moved.append(term_id)
+        log.info(f"Model {model_path} moved to {stale_path}")
+
+    return moved
+
+def write_thesaurus_diff(diff, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(diff.to_dict(), file, indent=2)
+    return path
@@ -0,0 +1,47 @@
+import os
+import logging
+
+''' Sampling of the training files of each term. The wide terms (The root has the whole corpus) have many more files
+    than a model needs, and most of them are negatives for most of the children: the positives of each child are
+    capped and the negatives of each child are subsampled (See TrainingDataset.sample). Only the train split is sampled,
+    the test split keeps every file, so the recall of each child is measured on the real distribution.
+'''
+
+log = logging.getLogger('my_logger')
+
+class TrainingSampling:
+    def __init__(self, max_files_per_label=None, negative_ratio=None, min_files=0, seed=0):
+        """
+        :param max_files_per_label: Positives kept per child (None keeps all of them)
+        :param negative_ratio: Negatives kept per positive of each child (None keeps all of them)
+        :param min_files: Terms with fewer training files are not sampled
+        :param seed: Seed of the order of the files (The same seed gives the same files)
+        """
+        self.max_files_per_label = max_files_per_label
+        self.negative_ratio = negative_ratio
+        self.min_files = min_files
+        self.seed = seed
+
+    def is_enabled(self):
+        return self.max_files_per_label is not None or self.negative_ratio is not None
+
+    def apply(self, term_id, train_data):
+        """Returns the sampled train split of the term (The same dataset if sampling is disabled or the term is small)."""
+        if not self.is_enabled() or train_data.get_size() < self.min_files:
+            return train_data
+
+        sampled = train_data.sample(self.max_files_per_label, self.negative_ratio, self.seed)
+        log.info(f"Term {term_id}: sampled {sampled.get_size()} of {train_data.get_size()} training files")
+        print(f"Sampled {sampled.get_size()} of {train_data.get_size()} training files for the term {term_id}", flush=True)
+        return sampled
+
+NO_SAMPLING = TrainingSampling()
+
+def get_training_sampling_from_env():
+    """Reads the sampling from the environment (TRAIN_MAX_FILES_PER_LABEL, TRAIN_NEGATIVE_RATIO, TRAIN_SAMPLING_MIN_FILES, TRAIN_SAMPLING_SEED)."""
+    return TrainingSampling(
+        max_files_per_label=int(os.getenv('TRAIN_MAX_FILES_PER_LABEL', 0)) or None,
+        negative_ratio=float(os.getenv('TRAIN_NEGATIVE_RATIO', 0)) or None,
+        min_files=int(os.getenv('TRAIN_SAMPLING_MIN_FILES', 0)),
+        seed=int(os.getenv('TRAIN_SAMPLING_SEED', 0)),
+    )
@@ -0,0 +1,103 @@
+import os
+import logging
+import spacy
+
+''' Warm start of the models of the children terms. The model of a parent term was trained on a superset of the files
+    of its children, so its tok2vec (The encoder of the textcat ensemble) is a better start than random weights.
+    The tok2vec of the new model is copied from the saved parent model, and it's either frozen or fine-tuned with a
+    lower learning rate. The rest of the model (The bag of words and the output layer) depends on the labels,
+    so it's trained from scratch.
+'''
+
+WARM_START_MODES = ("off", "freeze", "finetune")
+TEXTCAT_PIPE = "textcat_multilabel"
+
+log = logging.getLogger('my_logger')
+
+class ScaledLayersOptimizer:
+    def __init__(self, optimizer, node_ids, lr_scale):
+        """
+        Optimizer that updates the parameters of some layers with a scaled learning rate (0 freezes them).
+        The rest of the parameters and the attributes (learn_rate, step_schedules...) are the ones of the optimizer.
+
+        :param node_ids: Ids of the thinc nodes of the layers (The optimizer keys are (node id, parameter name))
+        """
+        self.optimizer = optimizer
+        self.node_ids = set(node_ids)
+        self.lr_scale = lr_scale
+
+    def __call__(self, key, weights, gradient, *, lr_scale=1.0):
+        if key[0] not in self.node_ids:
+            return self.optimizer(key, weights, gradient, lr_scale=lr_scale)
+        if self.lr_scale == 0:
+            gradient *= 0
+            return weights, gradient
+        return self.optimizer(key, weights, gradient, lr_scale=lr_scale * self.lr_scale)
+
+    def __getattr__(self, name):
+        return getattr(self.optimizer, name)
+
+def get_tok2vec(nlp):
+    """The tok2vec of the textcat of the pipeline, or None if its architecture doesn't have one."""
+    textcat = nlp.get_pipe(TEXTCAT_PIPE)
+    return textcat.model.get_ref("tok2vec") if textcat.model.has_ref("tok2vec") else None
+
+class WarmStart:
+    def __init__(self, mode="off", lr_scale=0.1, epochs=None):
+        """
+        :param mode: off (Random weights), freeze (The parent tok2vec isn't trained) or finetune (Trained with lr_scale)
+        :param lr_scale: Scale of the learning rate of the parent tok2vec when fine-tuning
+        :param epochs: Epochs of the warm-started models (None trains the same epochs as the rest)
+        """
+        if mode not in WARM_START_MODES:
+            raise ValueError(f"Invalid warm start mode {mode}, it must be one of {WARM_START_MODES}")
+        self.mode = mode
+        self.lr_scale = lr_scale
+        self.epochs = epochs
+
+    def is_enabled(self):
+        return self.mode != "off"
+
+    def get_parent_model_path(self, thesaurus, term_id, folder_name):
+        """Path of the saved model of a parent of the term (The first one trained, a term can have several parents)."""
+        if not self.is_enabled():
+            return None
+
+        for parent_id in thesaurus.get_by_id(term_id).get_parents():
+            model_path = f"./models/{folder_name}/{parent_id}"
+            if os.path.exists(model_path):
+                return model_path
+
+        return None
+
+    def apply(self, nlp, parent_model_path, optimizer):
+        """
+        Copies the tok2vec of the parent model into the initialized pipeline.
+
+        :return: The optimizer of the training (Wrapped to freeze or slow down the tok2vec)
+        """
+        tok2vec = get_tok2vec(nlp)
+        parent_tok2vec = get_tok2vec(spacy.load(parent_model_path)) if tok2vec is not None else None
+        if parent_tok2vec is None:
+            log.warning(f"The model at {parent_model_path} can't be used to warm start, the architecture has no tok2vec")
+            return optimizer
+
+        try:
+            tok2vec.from_bytes(parent_tok2vec.to_bytes())
+        except ValueError as e:
+            log.warning(f"The model at {parent_model_path} can't be used to warm start: {e}")
+            return optimizer
+
+        log.info(f"Warm started from {parent_model_path} ({self.mode})")
+        lr_scale = 0 if self.mode == "freeze" else self.lr_scale
+        return ScaledLayersOptimizer(optimizer, [node.id for node in tok2vec.walk()], lr_scale)
+
+NO_WARM_START = WarmStart()
+
+def get_warm_start_from_env():
+    """Reads the warm start from the environment (TRAIN_WARM_START, TRAIN_WARM_START_LR_SCALE, TRAIN_WARM_START_EPOCHS)."""
+    return WarmStart(
+        mode=os.getenv('TRAIN_WARM_START', 'off'),
+        lr_scale=float(os.getenv('TRAIN_WARM_START_LR_SCALE', 0.1)),
+        epochs=int(os.getenv('TRAIN_WARM_START_EPOCHS', 0)) or None,
+    )
@@ -0,0 +1,470 @@
+import re
+
+''' The span cleaning rules of the parser before the columnar rewrite (utils.page_spans), kept as they were
+    as the reference of the differential tests. Each rule works on a list of span dicts and deletes slices of it.
+'''
+
+equation_fonts = ["TimesLTStd-Roman",
+                  "TimesLTStd-BoldItalic",
+                   "STIXTwoMath", 
+                   "TimesLTStd-Italic", 
+                   "EuclidSymbol", 
+                   "AdvTTec1d2308.I+03", 
+                   "STIXGeneral-Regular", 
+                   "EuclidSymbol-Italic",
+                   "AdvTTab7e17fd+22",
+                   "EuclidMathTwo",
+                   "EuclidMathOne",
+                   "EuclidExtra",
+                   "EuclidSymbol-BoldItalic",
+                   "AdvOTb4af3d5d.I",
+                   "AdvOT564e738a.BI"
+                   ]
+
+''' Cleans the text as spans by applying a series of text processing functions 
+    Params: The spans from each page
+'''
+def clean_spans_from_page(spans, remove_abstract):
+    spans = clean_tables_from_spans(spans)
+    spans = clean_urls_from_spans(spans)
+    spans = clean_equations_from_spans(spans)
+    spans = clean_years_from_spans(spans)
+    spans = clean_example_years_from_spans(spans)
+    spans = clean_parenthesis_with_years_from_spans(spans)
+    spans = clean_small_references_from_spans(spans)
+    if (remove_abstract):
+        spans = clean_authors_and_abstract_from_spans(spans)
+    spans = clean_metadata_from_spans(spans)
+    spans = clean_titles_from_spans(spans)
+    spans = clean_parenthesis_with_references_from_spans(spans)
+    spans = clean_symbols_from_spans(spans)
+    spans = clean_orcids_from_spans(spans)
+    spans = clean_page_number_from_spans(spans)
+    
+    return spans
+
+# Removes the tables from the text (Between "Table _number_" and "Note.")
+# TODO: Improve the table detection if Note. is not present (Using position?)
+def clean_tables_from_spans(spans):
+    # We have to iterate through the spans to find the start and end of the tables
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+
+        # Find an element that matches "Table _number_"
+        for j in range(i, len(spans)):
+            if re.match(r'^Table \d+', spans[j]['text']) and ".B" in spans[j]["font"]:
+                start_index = j
+                break
+
+        # Find an element that matches "Note. (This usually indicates the end of the table)"
+        if start_index is not None:        
+            for k in range(start_index + 1, len(spans)):
+                if (('References.' in spans[k]['text'] or 'Note.' in spans[k]['text'] or 'Notes.' in spans[k]['text']) and ".B" in spans[j]["font"]):
+                    #End table with Note or references
+                    end_index = k + 1
+                    break
+                if re.match(r'^Table \d+', spans[k]['text']) and ".B" in spans[k]["font"]:
+                    # Another table
+                    end_index = k - 1
+                    break
+
+                if re.match(r'^Figure \d+\.', spans[k]['text']) and ".B" in spans[k]["font"]:
+                    # A figure
+                    end_index = k
+                    break
+            
+                if ('The Astrophysical' in spans[k]['text'] or 'The Astronomical' in spans[k]['text']):
+                    # A figure
+                    end_index = k
+                    for index in range(1, 10):
+                        # Check if we reached the end of the document
+                        if (k + index >= len(spans)):
+                            end_index = k + index - 1
+                            break
+                        if ('et al' in spans[k+index]['text']):
+                            end_index = k + index
+                            break
+                    break
+
+
+        # If both elements were found, remove the elements between them
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+        
+    return spans
+
+def clean_urls_from_spans(spans):
+    # We have to iterate through the spans to find the start and end of the links
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+        should_skip = False
+        text_color = 0
+
+        # Find an element that matches a URL
+        for j in range(i, len(spans)):
+            if "http" in spans[j]["text"]:
+                start_index = j
+                text_color = spans[j]["color"]
+                break
+
+        # Find the ending of the URL 
+        if start_index is not None:
+            for k in range(start_index, len(spans)):
+                if spans[k]['color'] != text_color:
+                    end_index = k
+                    break
+
+        if end_index and start_index and (end_index - start_index) >= 8 and text_color == 0 :
+            should_skip = True
+
+        if should_skip:
+            i = end_index
+            start_index = None
+            end_index = None
+        # If both elements were found, remove the elements between them
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+
+    return spans
+
+def clean_equations_from_spans(spans):
+    # We have to iterate through the spans to find the start and end of the equations
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+
+        # Find an element that matches an equation (It has a different font)
+        # If it's only one line, it's not an equation
+        for j in range(i, len(spans)):
+            if spans[j]["font"] in equation_fonts:
+                start_index = j
+                break
+
+        # Find the ending of the equation 
+        if start_index is not None:
+            for k in range(start_index, len(spans)):
+                if spans[k]["font"] not in equation_fonts:
+                    end_index = k
+                    if (end_index - start_index) < 2:
+                        start_index = None
+                        end_index = None
+                    break
+
+        # If both elements were found, remove the elements between them
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+
+    return spans
+
+def clean_years_from_spans(spans):
+    # We have to iterate through the spans to find the start and end of the years
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+        should_skip = False
+        # Find an element that matches a "( "
+        for j in range(i, len(spans)):
+            if (re.match(r'\s?\(', spans[j]['text']) and re.match(r'\d{4}', spans[j+1]['text']) and re.match(r'\s?\)', spans[j+2]['text'])):
+                if (spans[j]['color'] == 255):
+                    should_skip = True
+                
+                start_index = j
+                end_index = j + 3
+                break
+
+        if should_skip:
+            i = end_index
+            continue
+            
+        # If both elements were found, remove the elements between them
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+
+    return spans
+
+# Removes examples years in parenthesis like (e.g. Author 2019). BUG: If the first span is ") (" it will not be removed
+def clean_example_years_from_spans(spans):
+    # We have to iterate through the spans to find the start and end of the years
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+        # Find an element that matches a "( "
+        for j in range(i, len(spans)):
+            words = ["e.g.", "e.g.,"]
+            if(re.match(r'\s?\(', spans[j]['text']) and any(words in spans[j+1]['text'] for words in words)):
+                start_index = j
+                break
+
+
+        if start_index is not None:
+            for k in range(start_index, len(spans)):
+                if spans[k]["text"] == ")":
+                    end_index = k + 1
+                    break
+
+        # If both elements were found, remove the elements between them
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+
+    return spans
+
+def clean_parenthesis_with_years_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+        should_skip = False
+        for j in range(i, len(spans)):
+            if "(" in spans[j]["text"] and spans[j]["color"] == 0:
+                start_index = j
+                break
+
+        if start_index is not None:
+            for k in range(start_index, len(spans)):
+                if ")" in spans[k]['text']:
+                    end_index = k + 1
+                    if re.search(r'\d{4}', spans[k - 1]['text']):
+                        break
+                    else:
+                        should_skip = True
+                        break
+
+        if end_index and start_index and (end_index - start_index) >= 30:
+            should_skip = True
+
+        if should_skip:
+            i = end_index
+            start_index = None
+            end_index = None
+
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+    return spans
+
+def clean_small_references_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        for j in range(i, len(spans)):
+            if spans[j].get('size') == 7.044162273406982 and spans[j].get('color') == 255:
+                start_index = j
+                break
+
+        if start_index is not None:
+            del spans[start_index:start_index + 1]
+            i = start_index 
+        else:
+            i += 1
+
+    return spans
+
+# Cleans small text like header and footer (e.g. Original content..., Published by..., The Astrophysical Journal...)
+def clean_metadata_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        for j in range(i, len(spans)):
+            allowed_sizes = [5.977700233459473, 7.970200061798096, 6.339683532714844]
+            if spans[j].get('size') in allowed_sizes:
+                start_index = j
+                break
+
+        if start_index is not None:
+            for k in range(start_index, len(spans)):
+                 # Reached End of page
+                 if (k + 1) == len(spans):
+                    end_index = k + 1
+                    break
+                 # Check if the next element is not a small text
+                 disallowed_sizes = [5.977700233459473, 7.970200061798096, 6.339683532714844]
+                 if spans[k].get('size') not in disallowed_sizes:
+                    # print("REMOVED: ", spans[k]['text'], flush=True)
+                    end_index = k
+                    break
+
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+
+    return spans
+
+# Cleans everything between title and text (Abstract, Keywords, Authors). Adds an enter after the title
+def clean_authors_and_abstract_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+        # Find the end of the title text
+        for j in range(i, len(spans)):
+            if (spans[j].get('size') == 13.947600364685059 and ".B" in spans[j]["font"] and ".B" not in spans[j + 1]["font"]):                
+                start_index = j + 1
+                break
+            # If the abstract occupies more than one page, we need to check for "Introduction" and remove everything until there
+            if "1. Introduction" in spans[j]['text']:
+                start_index = 0
+                end_index = j + 1
+                del spans[start_index:end_index]
+                return spans
+
+        if start_index is not None:
+            for k in range(start_index, len(spans)):
+                if "1. Introduction" in spans[k]['text']:
+                    end_index = k + 1
+                    break
+
+        # If the abstract occupies more than one page, we need to remove everything until the end of the page from the title
+        if end_index is None:
+            end_index = len(spans)
+
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            
+            # Create line break span
+            empty_span = {
+                "text": "\n",
+                "size": 13.947600364685059,
+                "font": "TimesLTStd-Roman",
+                "color": 0
+            }
+            spans.insert(start_index, empty_span)
+
+            i = start_index
+        else:
+            i += 1
+    return spans
+
+# Cleans titles and subtitles from the text (Sections, subsections)
+def clean_titles_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        # Find the end of the title text
+        for j in range(i, len(spans)):
+            # Find "1. Introduction" in bold or "1.1. Introduction" in italic
+            if ((re.match(r'^\d+\.\s', spans[j]['text']) and ".B" in spans[j]["font"]) or
+                ("Appendix" in spans[j]['text'] and ".B" in spans[j]["font"]) or
+                (re.match(r'^\d+\.\d+\.\s', spans[j]['text']) and ".I" in spans[j]["font"])):
+                start_index = j
+                break
+
+        if start_index is not None:
+            del spans[start_index:start_index + 1]
+            i = start_index 
+        else:
+            i += 1
+
+    return spans
+
+# Cleans parenthesis with references from the text like "(see Figure 5)"
+def clean_parenthesis_with_references_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+        # Find the start of parenthesis and the word "see "
+        for j in range(i, len(spans) - 1):
+            words = ["see", "Figure", "Figures", "Table", "Section"]
+            if ("(" in spans[j]["text"] and any(word in spans[j + 1]["text"] for word in words)):
+                start_index = j
+                break
+
+        if start_index is not None:
+            for k in range(start_index, len(spans)):
+                # Find the end of the parenthesis. If there's another parenthesis inside, skip it. E.g. (see Figure 5(a), left)
+                if ")" in spans[k]["text"] and "(" not in spans[k - 2]["text"]:
+                    end_index = k + 1
+                    break
+
+        if start_index is not None and end_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+    return spans
+
+# Cleans symbols like (Greater-than or equal to) and (Less-than or equal to) that are not displayed correctly
+def clean_symbols_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        # Find the end of the title text
+        for j in range(i, len(spans)):
+            # Find weird simbols like (Greater-than or equal to) and (Less-than or equal to)
+            symbols = ["\uf088", "\uf089", "\u0084", "\u0085", "\uf0d1"]
+            if (any(symbol in spans[j]['text'] for symbol in symbols)):
+                start_index = j
+                break
+
+        if start_index is not None:
+            del spans[start_index:start_index + 1]
+            i = start_index 
+        else:
+            i += 1
+
+    return spans
+
+# Clean the ORCID iDs from the text (Probably in last page). From the start of the ORCID iDs to the end of the page
+def clean_orcids_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        end_index = None
+        # Find the start of parenthesis and the word "see "
+        for j in range(i, len(spans)):
+            if ("ORCID iDs" in spans[j]["text"] and ".B" in spans[j]["font"]):
+                start_index = j
+                end_index = len(spans)
+                break
+
+        if start_index is not None:
+            del spans[start_index:end_index]
+            i = start_index
+        else:
+            i += 1
+    return spans
+
+# If the last span is a number, it's probably a page number. Remove it
+def clean_page_number_from_spans(spans):
+    i = 0
+    while i < len(spans):
+        start_index = None
+        for j in range(i, len(spans)):
+            if (re.match(r'\d+', spans[j]['text']) and j == len(spans) - 1):
+                start_index = j
+                break
+
+        if start_index is not None:
+            del spans[start_index:start_index + 1]
+            i = start_index 
+        else:
+            i += 1
+
+    return spans
+
@@ -0,0 +1,199 @@
+import os
+import sys
+import copy
+import random
+import signal
+
+import numpy as np
+import pytest
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_PATH, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import legacy_span_rules
+from utils import articles_parser
+from utils.page_spans import FontTable, PageSpans, SpanView
+from models.DocumentLayoutProfile import DocumentLayoutProfile, AAS_METADATA_SIZES, AAS_SMALL_REFERENCE_SIZE, AAS_LINK_COLOR
+
+''' Differential tests of the span cleaning rules: the columnar rules (PageSpans / SpanView) against the list-based ones
+    they replaced (legacy_span_rules), on random pages made of the texts, fonts, sizes and colors the rules look for.
+    The pages where a legacy rule raised an IndexError or never ended are only checked to be cleaned without errors:
+    the columnar rules take the neighbour out of the page as no match there.
+'''
+
+PAGES_PER_RULE = 400
+SEED = 41
+# Seconds a legacy rule can run on a page before it's taken as an endless loop
+LEGACY_TIMEOUT = 1
+
+TITLE_SIZE = 13.947600364685059
+BODY_SIZE = 9.962599754333496
+BODY_FONT = "TimesLTStd-Roman"
+
+TEXTS = [
+    "Table 1", "Table 2", "Note.", "Notes.", "References.", "Figure 3.", "Figure", "Figures", "Table", "Section",
+    "The Astrophysical Journal, 900:1", "The Astronomical Journal", "Author et al", "http://doi.org/10.3847", "https://iopscience",
+    "(", " (", ")", " )", "(see", "see", "e.g.", "e.g.,", "2019", "2021a", "Smith", "1. Introduction", "2. Methods", "2.1. Data",
+    "Appendix", "ORCID iDs", "Abstract", "", "\u0084", "12", "7", "galaxies", "the", "of", "stars (", ") and", "5(a", "left",
+]
+FONTS = ["Times.B", "Times.I", "Times", BODY_FONT, "STIXTwoMath", "EuclidSymbol", "AdvOT564e738a.BI", "Helvetica-Black"]
+SIZES = [BODY_SIZE, TITLE_SIZE, AAS_SMALL_REFERENCE_SIZE] + list(AAS_METADATA_SIZES)
+COLORS = [0, 0, 0, AAS_LINK_COLOR, 16711680]
+
+fonts = FontTable(articles_parser.equation_fonts)
+profile = DocumentLayoutProfile({}, {}, BODY_SIZE, fonts.get_id(BODY_FONT), 0, TITLE_SIZE, AAS_LINK_COLOR)
+font_names = {}
+
+RULES = [
+    "clean_tables_from_spans",
+    "clean_urls_from_spans",
+    "clean_equations_from_spans",
+    "clean_years_from_spans",
+    "clean_example_years_from_spans",
+    "clean_parenthesis_with_years_from_spans",
+    "clean_small_references_from_spans",
+    "clean_authors_and_abstract_from_spans",
+    "clean_metadata_from_spans",
+    "clean_titles_from_spans",
+    "clean_parenthesis_with_references_from_spans",
+    "clean_symbols_from_spans",
+    "clean_orcids_from_spans",
+    "clean_page_number_from_spans",
+]
+
+class LegacyTimeout(Exception):
+    pass
+
+def get_random_page(generator, max_spans=40):
+    return [
+        {
+            "text": generator.choice(TEXTS),
+            "font": generator.choice(FONTS),
+            "size": generator.choice(SIZES),
+            "color": generator.choice(COLORS),
+            "bbox": (0.0, 0.0, 1.0, 1.0),
+        }
+        for _ in range(generator.randint(0, max_spans))
+    ]
+
+def to_page_spans(spans):
+    return PageSpans.from_blocks([{ "lines": [{ "spans": spans }] }], fonts)
+
+def get_font_name(font_id):
+    if font_id not in font_names:
+        font_names.update({ value: key for key, value in fonts.ids.items() })
+    return font_names[font_id]
+
+def get_kept_spans(page_spans):
+    """(text, font, size, color) of the kept spans, as the legacy rules leave them."""
+    return [
+        (page_spans.texts[index], get_font_name(int(page_spans.spans["font_id"][index])), float(page_spans.spans["size"][index]), int(page_spans.spans["color"][index]))
+        for index in np.flatnonzero(page_spans.keep)
+    ]
+
+def get_legacy_spans(spans):
+    return [(span["text"], span["font"], float(span["size"]), int(span["color"])) for span in spans]
+
+def run_legacy(function, spans):
+    """Runs a legacy rule, returns None if it raised an IndexError or didn't end."""
+    def on_timeout(signum, frame):
+        raise LegacyTimeout()
+
+    previous_handler = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, LEGACY_TIMEOUT)
+    try:
+        return function(copy.deepcopy(spans))
+    except (IndexError, LegacyTimeout):
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+@pytest.mark.parametrize("rule", RULES)
+def test_rule_matches_legacy_rule(rule):
+    generator = random.Random(f"{SEED}:{rule}")
+    compared = 0
+    for _ in range(PAGES_PER_RULE):
+        spans = get_random_page(generator)
+        page_spans = getattr(articles_parser, rule)(to_page_spans(spans), profile)
+        expected = run_legacy(getattr(legacy_span_rules, rule), spans)
+        if expected is not None:
+            assert get_kept_spans(page_spans) == get_legacy_spans(expected), [span["text"] for span in spans]
+            compared += 1
+
+    # Most of the pages are compared (Only a few reach the cases the legacy rules didn't handle)
+    assert compared > PAGES_PER_RULE // 2
+
+@pytest.mark.parametrize("remove_abstract", [True, False])
+def test_page_cleaning_matches_legacy_cleaning(remove_abstract):
+    generator = random.Random(f"{SEED}:page:{remove_abstract}")
+    for _ in range(PAGES_PER_RULE):
+        spans = get_random_page(generator, 80)
+        page_spans = articles_parser.clean_spans_from_page(to_page_spans(spans), remove_abstract, profile)
+        expected = run_legacy(lambda spans: legacy_span_rules.clean_spans_from_page(spans, remove_abstract), spans)
+        if expected is not None:
+            assert get_kept_spans(page_spans) == get_legacy_spans(expected), [span["text"] for span in spans]
+
+def get_span(text, font="Times", size=BODY_SIZE, color=0):
+    return { "text": text, "font": font, "size": size, "color": color, "bbox": (0.0, 0.0, 1.0, 1.0) }
+
+def test_keep_mask():
+    page_spans = to_page_spans([get_span("a"), get_span("Bold", "Times.B"), get_span("b"), get_span("c")])
+    view = SpanView(page_spans)
+    view.remove(1, 3)
+    view.apply()
+
+    assert page_spans.keep.tolist() == [True, False, False, True]
+    assert len(page_spans) == 2
+    assert page_spans.get_texts() == ["a", "c"]
+    # The bold texts are the ones of the whole page, removed or not
+    assert page_spans.get_bold_texts() == ["Bold"]
+
+    # A new view only has the kept spans, and looks behind over the removed ones
+    view = SpanView(page_spans)
+    assert view.texts == ["a", "c"]
+    view.remove(0, 1)
+    assert view.get_index(1) == 0
+    assert view.is_page_start(1)
+    assert view.get_text(1, -1) == "c"
+    assert view.get_text(1, 1) is None
+    view.apply()
+    assert page_spans.get_texts() == ["c"]
+
+def test_page_start_without_header():
+    page_spans = to_page_spans([get_span("a")])
+    page_spans.has_header = False
+    assert not SpanView(page_spans).is_page_start(0)
+
+def clean(rule, spans):
+    return [text for text, _, _, _ in get_kept_spans(getattr(articles_parser, rule)(to_page_spans(spans), profile))]
+
+def test_year_at_the_end_of_the_page():
+    # The legacy rule read past the last span
+    spans = [get_span("text"), get_span("("), get_span("2019")]
+    assert run_legacy(legacy_span_rules.clean_years_from_spans, spans) is None
+    assert clean("clean_years_from_spans", spans) == ["text", "(", "2019"]
+
+def test_example_at_the_end_of_the_page():
+    spans = [get_span("text"), get_span("(")]
+    assert run_legacy(legacy_span_rules.clean_example_years_from_spans, spans) is None
+    assert clean("clean_example_years_from_spans", spans) == ["text", "("]
+
+def test_title_at_the_end_of_the_page():
+    spans = [get_span("text"), get_span("Title", "Times.B", TITLE_SIZE)]
+    assert run_legacy(legacy_span_rules.clean_authors_and_abstract_from_spans, spans) is None
+    assert clean("clean_authors_and_abstract_from_spans", spans) == ["text", "Title"]
+
+def test_adjacent_tables():
+    # The legacy rule removed an empty range and started again from the same table forever
+    spans = [get_span("Table 1", "Times.B"), get_span("Table 2", "Times.B"), get_span("row"), get_span("Note.")]
+    assert run_legacy(legacy_span_rules.clean_tables_from_spans, spans) is None
+    assert clean("clean_tables_from_spans", spans) == ["Table 1"]
+
+def test_reference_parenthesis_looks_behind_the_start():
+    # The span two places before the ")" is taken from the spans left, wrapping around as the list did
+    for last_text, expected in [("text", ["text"]), ("text (", ["(", "see)", "text ("])]:
+        spans = [get_span("("), get_span("see)"), get_span(last_text)]
+        assert clean("clean_parenthesis_with_references_from_spans", spans) == expected
+        assert get_legacy_spans(run_legacy(legacy_span_rules.clean_parenthesis_with_references_from_spans, spans)) == get_legacy_spans([get_span(text) for text in expected])
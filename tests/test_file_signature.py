@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_PATH, 'src'))
+
+from Database.Database import Database
+from Database.DatabaseModels import Base
+from Database.File import File
+from Database.FileSignature import FileSignature
+from utils.near_duplicates import MinHasher
+
+TEXT = " ".join(f"word{index}" for index in range(200))
+
+@pytest.fixture
+def file_signature_db(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'signatures.db'}")
+    Base.metadata.create_all(database.get_engine())
+    file_db = File(database)
+    for file_id in ("a", "b", "c"):
+        file_db.add(file_id=file_id, abstract=None, full_text=None)
+    yield FileSignature(database)
+    database.close()
+
+def add(file_signature_db, file_id, signature):
+    duplicate_of, similarity = file_signature_db.find_duplicate(file_id, signature)
+    assert file_signature_db.add(file_id, signature, duplicate_of, similarity)
+    return duplicate_of
+
+def test_removed_file_is_replaced_by_its_first_duplicate(file_signature_db):
+    signature = MinHasher().get_signature(TEXT)
+    assert [add(file_signature_db, file_id, signature) for file_id in ("a", "b", "c")] == [None, "a", "a"]
+
+    assert file_signature_db.remove("a") == (True, "b")
+    assert set(file_signature_db.get_duplicates()) == { "c" }
+    assert file_signature_db.get_duplicates()["c"][0] == "b"
+    # The new original is in the LSH index
+    assert file_signature_db.find_duplicate("a", signature)[0] == "b"
+    assert file_signature_db.remove("a") == (True, None)
+
+def test_duplicates_of_a_new_duplicate_point_to_its_original(file_signature_db):
+    signature = MinHasher().get_signature(TEXT)
+    add(file_signature_db, "b", signature)
+    add(file_signature_db, "c", signature)
+    # An original with the same text (e.g. its text changed since it was signed)
+    file_signature_db.add("a", signature)
+
+    # b is ingested again and becomes a duplicate of a
+    assert add(file_signature_db, "b", signature) == "a"
+    assert { file_id: duplicate_of for file_id, (duplicate_of, _) in file_signature_db.get_duplicates().items() } == { "b": "a", "c": "a" }
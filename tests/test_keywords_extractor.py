@@ -0,0 +1,36 @@
+import os
+import sys
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_PATH, 'src'))
+
+from UATMapper import UATMapper
+from utils.keywords_extractor import KeywordsExtractor, parse_concepts
+
+# Real UAT concepts whose names have parentheses
+PARENTHESIZED_CONCEPTS = [
+    ("Mercury (planet)", "1024"),
+    ("Earth (planet)", "439"),
+    ("B(e) stars", "2104"),
+    ("Natural satellites (Solar system)", "1089"),
+    ("Recombination (cosmology)", "1365"),
+]
+
+def get_concepts_text(concepts):
+    return "Unified Astronomy Thesaurus concepts: " + "; ".join(f"{name} ({concept_id})" for name, concept_id in concepts)
+
+def test_parse_parenthesized_names():
+    text = get_concepts_text([("Quasars", "1319")] + PARENTHESIZED_CONCEPTS + [("Galaxy evolution", "594")])
+    assert parse_concepts(text) == [("Quasars", "1319")] + PARENTHESIZED_CONCEPTS + [("Galaxy evolution", "594")]
+
+def test_parse_list_starting_with_parenthesized_name():
+    assert parse_concepts(get_concepts_text(PARENTHESIZED_CONCEPTS[2:])) == PARENTHESIZED_CONCEPTS[2:]
+
+def test_parse_stops_at_the_end_of_the_list():
+    text = get_concepts_text(PARENTHESIZED_CONCEPTS[:2]) + " Original content from this work may be used (2021). 1. Introduction"
+    assert parse_concepts(text) == PARENTHESIZED_CONCEPTS[:2]
+
+def test_validate_looks_up_unknown_ids_by_name():
+    extractor = KeywordsExtractor(UATMapper(os.path.join(ROOT_PATH, 'data', 'UAT-filtered.json')).map_to_thesaurus())
+    assert extractor.validate([("Mercury (planet)", "999999"), ("B(e) stars", "2104"), ("Unknown concept", "999998")]) == ["1024", "2104"]
+    assert extractor.validate_with_unknown([("Quasars", "1319"), ("Unknown concept", "999998"), ("Quasars", "1319")]) == (["1319"], [("Unknown concept", "999998")])